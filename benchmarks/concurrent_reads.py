@@ -0,0 +1,88 @@
+"""Read throughput of snapshot queries with 1 to N reader threads.
+
+Every reader repeatedly counts the rows matching a range predicate while
+one writer keeps appending, changing and deleting rows. Readers work on
+snapshots, so they are never blocked by the writer and the writer never
+waits for them. The writer still slows down as readers are added: its
+first change of a column after a snapshot copies the column, see
+`Table._own`.
+
+    python -m benchmarks.concurrent_reads --rows 200000 --seconds 2
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from models.column import IntCol, RealCol
+from models.query import col
+from models.table import Table
+
+
+def build_table(rows: int) -> Table:
+    table = Table("bench")
+    table.add_column(IntCol("amount"))
+    table.add_column(RealCol("price"))
+    table.add_rows([i, i / 2] for i in range(rows))
+    return table
+
+
+def run(table: Table, readers: int, seconds: float) -> dict[str, float]:
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+
+    def read(number: int) -> None:
+        query = table.select(["amount"], where=col("amount") < table.rows_count // 2)
+        while not stop.is_set():
+            query.count()
+            reads[number] += 1
+
+    def write() -> None:
+        i = 0
+        while not stop.is_set():
+            table.add_row({"amount": i, "price": 1.0})
+            table.change_row(i % 1000, {"price": 2.0})
+            table.delete_row(table.rows_count - 1)
+            writes[0] += 3
+            i += 1
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "readers": readers,
+        "queries_per_second": sum(reads) / seconds,
+        "writes_per_second": writes[0] / seconds,
+    }
+
+
+def main() -> list[dict[str, float]]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--max-readers", type=int, default=8)
+    arguments = parser.parse_args()
+
+    table = build_table(arguments.rows)
+    results = []
+    readers = 1
+    while readers <= arguments.max_readers:
+        result = run(table, readers, arguments.seconds)
+        print(
+            f"{readers:>2} readers: {result['queries_per_second']:8.1f} queries/s, "
+            f"{result['writes_per_second']:8.1f} writes/s"
+        )
+        results.append(result)
+        readers *= 2
+    return results
+
+
+if __name__ == "__main__":
+    main()
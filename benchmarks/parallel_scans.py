@@ -0,0 +1,91 @@
+"""Speedup of table scans and aggregates split over worker processes.
+
+Times a filtered count and a grouped aggregate over the same table with
+parallelism 1, 2, 4 and so on up to the number of cores, and reports the
+speedup over the single process run. Columns reach the workers through
+shared memory, so the speedup stays close to linear until the cores or
+the memory bandwidth run out.
+
+    python -m benchmarks.parallel_scans --rows 10000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from array import array
+
+from models.column import IntCol, RealCol
+from models.query import col
+from models.table import Table
+
+
+def build_table(rows: int) -> Table:
+    table = Table("bench")
+    table.add_column(IntCol("amount"))
+    table.add_column(IntCol("group"))
+    table.add_column(RealCol("price"))
+    table.add_columnar(
+        {
+            "amount": array("q", range(rows)),
+            "group": array("q", (i % 16 for i in range(rows))),
+            "price": array("d", (i / 2 for i in range(rows))),
+        }
+    )
+    return table
+
+
+def best_time(function, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(table: Table, parallelism: int, repeat: int) -> dict[str, float]:
+    where = col("amount") < table.rows_count // 2
+
+    def scan() -> None:
+        table.select(["amount"], where=where, parallelism=parallelism).count()
+
+    def aggregate() -> None:
+        table.aggregate(["group"], {"price": ["sum", "max"]}, parallelism=parallelism)
+
+    # the first run starts the worker processes
+    scan()
+    return {
+        "parallelism": parallelism,
+        "scan_seconds": best_time(scan, repeat),
+        "aggregate_seconds": best_time(aggregate, repeat),
+    }
+
+
+def main() -> list[dict[str, float]]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-parallelism", type=int, default=os.cpu_count() or 1)
+    arguments = parser.parse_args()
+
+    table = build_table(arguments.rows)
+    results = []
+    parallelism = 1
+    while parallelism <= arguments.max_parallelism:
+        result = run(table, parallelism, arguments.repeat)
+        base = results[0] if results else result
+        result["scan_speedup"] = base["scan_seconds"] / result["scan_seconds"]
+        result["aggregate_speedup"] = base["aggregate_seconds"] / result["aggregate_seconds"]
+        print(
+            f"{parallelism:>2} processes: scan {result['scan_seconds']:7.3f}s "
+            f"(x{result['scan_speedup']:.2f}), aggregate {result['aggregate_seconds']:7.3f}s "
+            f"(x{result['aggregate_speedup']:.2f})"
+        )
+        results.append(result)
+        parallelism *= 2
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Benchmark suite of the table and DB manager operations.
+
+Every case runs against a synthetic table holding every column type, with
+a narrow schema (one column of each type) or a wide one (several of each),
+at each of the requested sizes. A case times its operation call by call
+and reports the throughput, latency percentiles and the peak resident set
+size of the process that ran it. Each case runs in a fresh process, so the
+peak RSS is its own and one case cannot warm up the next.
+
+Data is generated from a fixed seed, so runs are comparable. Results are
+written as JSON, and a previous results file can be given to compare with:
+
+    python -m benchmarks.suite --sizes 10k 1m --output results.json
+    python -m benchmarks.suite --sizes 10k --compare results.json
+
+Concurrency and parallelism have their own benchmarks, `concurrent_reads`
+and `parallel_scans`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable
+
+from interval import Interval
+
+from models.column import COLUMN_CLASSES
+from models.database import Database
+from models.db_manager import DBManager
+from models.storage import micros_to_time
+from models.table import Table
+
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SCHEMAS = {"narrow": 1, "wide": 4}
+SEED = 20240101
+MICROSECONDS_PER_DAY = 24 * 3600 * 10 ** 6
+
+
+def parse_size(text: str) -> int:
+    """Row count written as in `SIZES` or as a plain number."""
+    rows = SIZES.get(text.lower()) or int(text)
+    # the cases run on half of the rows, at least one of them
+    if rows < 2:
+        raise argparse.ArgumentTypeError(f"Tables need at least 2 rows, got {rows}!")
+    return rows
+
+
+def positive(text: str) -> int:
+    number = int(text)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Expected a positive number, got {number}!")
+    return number
+
+
+def generate(column_type: str, rows: int, rng: random.Random) -> Any:
+    """`rows` values of a column of `column_type`, columnar."""
+    if column_type == "int":
+        return array("q", (rng.randrange(-10 ** 9, 10 ** 9) for _ in range(rows)))
+    if column_type == "real":
+        return array("d", (rng.uniform(-1e6, 1e6) for _ in range(rows)))
+    if column_type == "char":
+        return [chr(rng.randrange(97, 123)) for _ in range(rows)]
+    if column_type == "string":
+        return [f"value {rng.randrange(10 ** 6)}" * rng.randrange(1, 4) for _ in range(rows)]
+    if column_type == "time":
+        return [micros_to_time(rng.randrange(MICROSECONDS_PER_DAY)) for _ in range(rows)]
+    starts = (rng.randrange(MICROSECONDS_PER_DAY // 2) for _ in range(rows))
+    return [
+        Interval(
+            micros_to_time(start),
+            micros_to_time(start + rng.randrange(MICROSECONDS_PER_DAY // 2)),
+        )
+        for start in starts
+    ]
+
+
+def build_table(rows: int, schema: str, name: str = "bench") -> Table:
+    rng = random.Random(SEED)
+    table = Table(name)
+    for copy in range(SCHEMAS[schema]):
+        for column_type, column_class in COLUMN_CLASSES.items():
+            table.add_column(column_class(f"{column_type.replace(' ', '_')}_{copy}"))
+    table.add_columnar(
+        {column.name: generate(column.type, rows, rng) for column in table._columns}
+    )
+    return table
+
+
+def sample_row(table: Table, rng: random.Random) -> dict[str, Any]:
+    return {column.name: generate(column.type, 1, rng)[0] for column in table._columns}
+
+
+# Every case takes the table, the number of operations, a random source and
+# a scratch directory, and returns the operation to time, which is called
+# with the number of the call.
+
+
+def case_add_row(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    rows = [sample_row(table, rng) for _ in range(ops)]
+    return lambda call: table.add_row(rows[call])
+
+
+def case_change_row(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    indexes = [rng.randrange(table.rows_count) for _ in range(ops)]
+    rows = [sample_row(table, rng) for _ in range(ops)]
+    return lambda call: table.change_row(indexes[call], rows[call])
+
+
+def case_change_columns(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    orders = []
+    for _ in range(ops):
+        order = list(range(table.columns_count))
+        rng.shuffle(order)
+        orders.append(order)
+    return lambda call: table.change_columns(orders[call])
+
+
+def case_delete_row(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    indexes = [rng.randrange(table.rows_count - ops) for _ in range(ops)]
+    return lambda call: table.delete_row(indexes[call])
+
+
+def case_str(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    return lambda call: str(table)
+
+
+def case_render_page(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    offsets = [rng.randrange(table.rows_count) for _ in range(ops)]
+    return lambda call: table.render(offsets[call], 50)
+
+
+def _manager(table: Table) -> DBManager:
+    manager = DBManager(Database("bench"))
+    manager.db.tables[table.name] = table
+    return manager
+
+
+def case_save_database(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    manager = _manager(table)
+    # a fresh file each time, so every save writes the whole DB
+    return lambda call: manager.save_database(os.path.join(directory, f"{call}.cdb"))
+
+
+def case_open_database(
+    table: Table, ops: int, rng: random.Random, directory: str
+) -> Callable[[int], Any]:
+    path = _manager(table).save_database(os.path.join(directory, "bench.cdb"))
+    return lambda call: DBManager().open_database(path)
+
+
+# name: (case, operations per run, largest table it runs on)
+CASES: dict[str, tuple[Callable, int, int]] = {
+    "add_row": (case_add_row, 1000, SIZES["10m"]),
+    "change_row": (case_change_row, 1000, SIZES["10m"]),
+    "change_columns": (case_change_columns, 100, SIZES["10m"]),
+    "delete_row": (case_delete_row, 1000, SIZES["10m"]),
+    # formats every row, so it only runs on the smaller tables
+    "str": (case_str, 3, SIZES["1m"]),
+    "render_page": (case_render_page, 100, SIZES["10m"]),
+    "save_database": (case_save_database, 3, SIZES["10m"]),
+    "open_database": (case_open_database, 10, SIZES["10m"]),
+}
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_case(name: str, rows: int, schema: str, ops: int) -> dict[str, Any]:
+    """Time `ops` calls of a case on a freshly built table."""
+    if ops < 1:
+        raise ValueError(f"A case needs at least one operation, got {ops}!")
+    case = CASES[name][0]
+    table = build_table(rows, schema)
+    latencies = []
+    with tempfile.TemporaryDirectory() as directory:
+        operation = case(table, ops, random.Random(SEED), directory)
+        start = time.perf_counter()
+        for call in range(ops):
+            call_start = time.perf_counter()
+            operation(call)
+            latencies.append(time.perf_counter() - call_start)
+        seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "case": name,
+        "rows": rows,
+        "schema": schema,
+        "columns": table.columns_count,
+        "ops": ops,
+        "seconds": seconds,
+        "ops_per_second": ops / seconds,
+        "latency_seconds": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+        },
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def run_isolated(name: str, rows: int, schema: str, ops: int) -> dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(run_case, name, rows, schema, ops).result()
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": SEED,
+    }
+
+
+def compare(results: list[dict], previous: list[dict]) -> list[str]:
+    """Lines comparing the throughput of the cases run in both results."""
+    previous_by_key = {(r["case"], r["rows"], r["schema"]): r for r in previous}
+    lines = []
+    for result in results:
+        before = previous_by_key.get((result["case"], result["rows"], result["schema"]))
+        if before is not None:
+            ratio = result["ops_per_second"] / before["ops_per_second"]
+            lines.append(
+                f"{result['case']:>15} {result['rows']:>10} {result['schema']:>6}: "
+                f"{ratio:6.2f}x the throughput of the previous run"
+            )
+    return lines
+
+
+def main() -> dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", type=parse_size, default=list(SIZES.values()),
+        help="e.g. 10k 1m 10m 5000",
+    )
+    parser.add_argument("--schemas", nargs="+", default=list(SCHEMAS), choices=list(SCHEMAS))
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument(
+        "--ops", type=positive, help="operations per case instead of the defaults"
+    )
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="results file of a previous run")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="run every case in this process, which then share the peak RSS",
+    )
+    arguments = parser.parse_args()
+
+    run = run_case if arguments.in_process else run_isolated
+    report = {"environment": environment(), "results": []}
+    results = report["results"]
+    for rows in arguments.sizes:
+        for schema in arguments.schemas:
+            for name in arguments.cases:
+                _, default_ops, max_rows = CASES[name]
+                if rows > max_rows:
+                    continue
+                result = run(name, rows, schema, min(arguments.ops or default_ops, rows // 2))
+                print(
+                    f"{name:>15} {rows:>10} {schema:>6}: {result['ops_per_second']:12.1f} ops/s, "
+                    f"p99 {result['latency_seconds']['p99'] * 1000:9.3f} ms, "
+                    f"peak RSS {result['peak_rss_kb'] / 1024:8.1f} MiB"
+                )
+                results.append(result)
+
+    with open(arguments.output, "w") as file:
+        json.dump(report, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            previous = json.load(file)["results"]
+        print("\n".join(compare(results, previous)))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,9 @@ if __name__ == "__main__":
     db_manager.add_column("test_table", IntCol("amount"))
     db_manager.add_row("test_table", {"amount": 20})
     print(db_manager.get_table("test_table"))
-    db_manager.save_database("test_db1.pickle")
+    db_manager.save_database("test_db1.cdb")
 
     # open
     db_manager = DBManager()
-    db_manager.open_database("test_db1.pickle")
+    db_manager.open_database("test_db1.cdb")
     print(db_manager.get_table("test_table"))
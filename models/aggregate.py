@@ -0,0 +1,284 @@
+"""Group-by aggregation over the column buffers of a table.
+
+Rows are read a chunk at a time in their stored form (see
+`ColumnBuffer.scan`). Each chunk is split by group key and every group's
+values are folded into running totals, so one pass over the table needs
+memory for the groups only, not for the rows. Keys and results are decoded
+once, when the groups are complete. The totals of separate parts of the
+rows merge, so the parts can be folded by worker processes in parallel.
+
+Dictionary-encoded string columns are grouped by their codes, which are
+turned back into the strings once per group.
+
+Time columns can be grouped by buckets, e.g. `("time", "hour")` groups rows
+by the hour they fall into, keyed by its start.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Iterable, Sequence
+
+from . import parallel
+from .query import Expr, ResultSet, index_candidates
+from .storage import MICROSECONDS_PER_SECOND, DictionaryBuffer
+
+if TYPE_CHECKING:
+    from .table import Table
+
+
+AGGREGATES = ["count", "sum", "min", "max", "mean", "duration"]
+TIME_BUCKETS = {
+    "second": MICROSECONDS_PER_SECOND,
+    "minute": 60 * MICROSECONDS_PER_SECOND,
+    "hour": 3600 * MICROSECONDS_PER_SECOND,
+}
+NUMERIC_TYPES = {"int", "real"}
+CHUNK_SIZE = 65536
+
+
+class _Totals:
+    """Running totals of one column in one group."""
+
+    __slots__ = ("count", "total", "low", "high")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.low = None
+        self.high = None
+
+    def add(self, values: list, measures: list | None) -> None:
+        self.count += len(values)
+        if measures is not None:
+            self.total += sum(measures)
+        low, high = min(values), max(values)
+        if self.low is None or low < self.low:
+            self.low = low
+        if self.high is None or high > self.high:
+            self.high = high
+
+    def merge(self, other: _Totals) -> None:
+        """Add the totals of the same column in another part of the rows."""
+        self.count += other.count
+        self.total += other.total
+        if other.low is not None and (self.low is None or other.low < self.low):
+            self.low = other.low
+        if other.high is not None and (self.high is None or other.high > self.high):
+            self.high = other.high
+
+
+def aggregate(
+    table: Table,
+    group_by: list[str | Sequence[str]] | None = None,
+    aggs: dict[str, list[str]] | None = None,
+    where: Expr | None = None,
+    parallelism: int = 1,
+) -> list[list[Any]]:
+    """Rows of the group values followed by the aggregates, ordered by group.
+
+    Aggregates follow the order of `aggs` and of each of its lists. With
+    `parallelism` above 1, a table scan is split over that many worker
+    processes, see `models.parallel`.
+    """
+    parallel.check_parallelism(parallelism)
+    table = table.snapshot()
+    group_by = group_by or []
+    aggs = aggs or {}
+    keys = [_key_spec(table, item) for item in group_by]
+    columns = [(table._get_column_position(name), names) for name, names in aggs.items()]
+    for position, names in columns:
+        _check_aggregates(table, position, names)
+
+    if parallelism > 1 and (where is None or index_candidates(table, where) is None):
+        column_names = [
+            *(item if isinstance(item, str) else item[0] for item in group_by),
+            *aggs,
+            *(where.column_names() if where is not None else ()),
+        ]
+        groups: dict[Any, list[_Totals]] = {}
+        partials = parallel.map_partitions(
+            table, column_names, _fold_partition, (group_by, aggs, where), parallelism
+        )
+        for partial in partials:
+            for key, totals in partial.items():
+                merged = groups.get(key)
+                if merged is None:
+                    groups[key] = totals
+                    continue
+                for total, other in zip(merged, totals):
+                    total.merge(other)
+    else:
+        groups = _fold_partition(table, group_by, aggs, where, 0, table._rows_count)
+
+    if not keys and not groups:
+        # an empty table still has its one group
+        groups[()] = [_Totals() for _ in columns]
+    return [
+        [
+            *(_decode_key(table, spec, part) for spec, part in zip(keys, key)),
+            *(
+                _result(table, position, name, total)
+                for (position, names), total in zip(columns, groups[key])
+                for name in names
+            ),
+        ]
+        for key in sorted(groups)
+    ]
+
+
+def _fold_partition(
+    table: Table,
+    group_by: list[str | Sequence[str]],
+    aggs: dict[str, list[str]],
+    where: Expr | None,
+    start: int,
+    stop: int,
+) -> dict[Any, list[_Totals]]:
+    """Totals of every group among the ids from `start` to `stop`."""
+    keys = [_key_spec(table, item) for item in group_by]
+    columns = [(table._get_column_position(name), names) for name, names in aggs.items()]
+    if where is None:
+        chunks = table._live_chunks(CHUNK_SIZE, start, stop)
+    else:
+        chunks = ResultSet(table, [], where)._matching_positions(table, start, stop)
+    return _fold(table, keys, columns, chunks)
+
+
+def _fold(
+    table: Table,
+    keys: list[tuple[int, int | None]],
+    columns: list[tuple[int, list[str]]],
+    chunks: Iterable[Sequence[int]],
+) -> dict[Any, list[_Totals]]:
+    """Totals of the aggregated columns per group key over the rows of `chunks`."""
+    groups: dict[Any, list[_Totals]] = {}
+    for rows in chunks:
+        if not rows:
+            continue
+        positions_by_key = _split(table, keys, rows)
+        values = [_scan(table._buffers[position], rows) for position, _ in columns]
+        measures = [
+            _measures(table, position, column)
+            for (position, _), column in zip(columns, values)
+        ]
+        for key, positions in positions_by_key.items():
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = [_Totals() for _ in columns]
+            for total, column, measure in zip(totals, values, measures):
+                if positions is None:
+                    total.add(list(column), measure)
+                    continue
+                total.add(
+                    [column[position] for position in positions],
+                    None if measure is None else [measure[position] for position in positions],
+                )
+    dictionaries = [_dictionary(table._buffers[position]) for position, _ in keys]
+    if any(dictionary is not None for dictionary in dictionaries):
+        groups = {
+            tuple(
+                part if dictionary is None else dictionary[part]
+                for dictionary, part in zip(dictionaries, key)
+            ): totals
+            for key, totals in groups.items()
+        }
+    return groups
+
+
+def _key_spec(table: Table, item: str | Sequence[str]) -> tuple[int, int | None]:
+    """Column position of a group key and its time bucket in microseconds."""
+    if isinstance(item, str):
+        return table._get_column_position(item), None
+    name, bucket = item
+    position = table._get_column_position(name)
+    if table._columns[position].type != "time":
+        raise ValueError(f"Column '{name}' is not a time column and cannot be bucketed!")
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f"Time bucket should be one of {list(TIME_BUCKETS)}, got '{bucket}'!")
+    return position, TIME_BUCKETS[bucket]
+
+
+def _check_aggregates(table: Table, position: int, names: list[str]) -> None:
+    column = table._columns[position]
+    for name in names:
+        if name not in AGGREGATES:
+            raise ValueError(f"Aggregate should be one of {AGGREGATES}, got '{name}'!")
+        numeric = column.type in NUMERIC_TYPES
+        if (name in ("sum", "mean") and not numeric) or (
+            name == "duration" and column.type != "time interval"
+        ):
+            raise ValueError(
+                f"Aggregate '{name}' is not defined for column '{column.name}' "
+                f"of type '{column.type}'!"
+            )
+
+
+def _scan(buffer, rows: Sequence[int]) -> Sequence[Any]:
+    if isinstance(rows, range):
+        return buffer.scan(rows.start, rows.stop)
+    return buffer.take(rows)
+
+
+def _codes(buffer: DictionaryBuffer, rows: Sequence[int]) -> Sequence[int]:
+    if isinstance(rows, range):
+        return buffer.codes(rows.start, rows.stop)
+    return buffer.take_codes(rows)
+
+
+def _split(
+    table: Table, keys: list[tuple[int, int | None]], rows: Sequence[int]
+) -> dict[Any, list[int] | None]:
+    """Positions within the chunk of the rows of every group, None for all of them."""
+    if not keys:
+        return {(): None}
+    parts = []
+    for position, bucket in keys:
+        buffer = table._buffers[position]
+        if isinstance(buffer, DictionaryBuffer):
+            scan = _codes(buffer, rows)
+        else:
+            scan = _scan(buffer, rows)
+        if bucket is not None:
+            scan = [value - value % bucket for value in scan]
+        parts.append(scan)
+    positions_by_key: dict[Any, list[int]] = {}
+    for position, key in enumerate(zip(*parts)):
+        positions = positions_by_key.get(key)
+        if positions is None:
+            positions_by_key[key] = [position]
+        else:
+            positions.append(position)
+    if len(positions_by_key) == 1:
+        return dict.fromkeys(positions_by_key)
+    return positions_by_key
+
+
+def _dictionary(buffer) -> list[str] | None:
+    return buffer.dictionary if isinstance(buffer, DictionaryBuffer) else None
+
+
+def _measures(table: Table, position: int, values: Sequence[Any]) -> Sequence[Any] | None:
+    """What `sum` adds up for the values of a column, if anything."""
+    column_type = table._columns[position].type
+    if column_type in NUMERIC_TYPES:
+        return values
+    if column_type == "time interval":
+        return [upper - lower for lower, upper, _ in values]
+    return None
+
+
+def _decode_key(table: Table, spec: tuple[int, int | None], value: Any) -> Any:
+    return table._buffers[spec[0]].decode(value)
+
+
+def _result(table: Table, position: int, name: str, total: _Totals) -> Any:
+    if name == "count":
+        return total.count
+    if name in ("min", "max"):
+        value = total.low if name == "min" else total.high
+        return None if value is None else table._buffers[position].decode(value)
+    if name == "sum":
+        return total.total
+    if name == "mean":
+        return total.total / total.count if total.count else None
+    return timedelta(microseconds=total.total)
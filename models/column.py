@@ -3,11 +3,24 @@ from datetime import time
 from Pyro5.api import expose
 from abc import ABC, abstractmethod
 import re
+from array import array
 from dataclasses import dataclass
-from typing import Any
+from itertools import repeat
+from typing import Any, Iterable, Sequence
 from datetime import datetime
 from interval import Interval
 
+from .storage import (
+    ColumnBuffer,
+    IntBuffer,
+    RealBuffer,
+    CharBuffer,
+    StringBuffer,
+    DictionaryBuffer,
+    TimeBuffer,
+    IntervalBuffer,
+)
+
 
 COLUMN_TYPE_CHOICES = ["int", "real", "char", "string", "time", "time interval"]
 
@@ -19,6 +32,11 @@ class Column(ABC):
     _name: str
     default: Any
 
+    # `validate` as an expression over `{value}`, inlined by `RowValidator`
+    CHECK = None
+    # typecode of arrays whose items are valid values of the column as they are
+    ARRAY_TYPECODE = None
+
     def __post_init__(self) -> None:
         self.validate_or_error(self.default)
 
@@ -35,6 +53,26 @@ class Column(ABC):
     def validate(value) -> bool:
         pass
 
+    def create_buffer(self) -> ColumnBuffer:
+        return ColumnBuffer()
+
+    def options(self) -> dict[str, Any]:
+        """Keyword arguments besides the name and default that rebuild the column."""
+        return {}
+
+    def parse(self, text: str) -> Any:
+        """Value written as `text`, e.g. in a CSV file."""
+        return text
+
+    def convert_many(self, values: list) -> list:
+        """Parse the strings among `values` read from a text file."""
+        parse = self.parse
+        return [parse(value) if type(value) is str else value for value in values]
+
+    def format_many(self, values: list) -> list:
+        """`values` as written to text files, the inverse of `convert_many`."""
+        return values
+
     def validate_or_error(self, value: Any) -> None:
         if not self.validate(value):
             raise TypeError(
@@ -43,24 +81,49 @@ class Column(ABC):
                 f"'{type(value).__name__}'"
             )
 
+    def validate_many(self, values: list) -> None:
+        """Validate a batch of values, raising for the first invalid one."""
+        if not all(map(self.validate, values)):
+            self.validate_or_error(next(value for value in values if not self.validate(value)))
+
 
 @expose
 class IntCol(Column):
     TYPE = "int"
     DEFAULT = 0
+    MIN = -(2 ** 63)
+    MAX = 2 ** 63 - 1
+    CHECK = f"isinstance({{value}}, int) and {MIN} <= {{value}} <= {MAX}"
+    ARRAY_TYPECODE = "q"
 
     def __init__(self, name: str, default: int = DEFAULT) -> None:
         super().__init__(IntCol.TYPE, name, default)
 
     @staticmethod
     def validate(value) -> bool:
-        return isinstance(value, int)
+        return isinstance(value, int) and IntCol.MIN <= value <= IntCol.MAX
+
+    def validate_many(self, values: list) -> None:
+        if isinstance(values, array) and values.typecode == IntCol.ARRAY_TYPECODE:
+            return
+        if values and set(map(type, values)) == {int}:
+            if IntCol.MIN <= min(values) and max(values) <= IntCol.MAX:
+                return
+        super().validate_many(values)
+
+    def create_buffer(self) -> ColumnBuffer:
+        return IntBuffer()
+
+    def parse(self, text: str) -> int:
+        return int(text)
 
 
 @expose
 class RealCol(Column):
     TYPE = "real"
     DEFAULT = 0.0
+    CHECK = "isinstance({value}, float)"
+    ARRAY_TYPECODE = "d"
 
     def __init__(self, name: str, default: float = DEFAULT) -> None:
         super().__init__(RealCol.TYPE, name, default)
@@ -69,11 +132,29 @@ class RealCol(Column):
     def validate(value) -> bool:
         return isinstance(value, float)
 
+    def validate_many(self, values: list) -> None:
+        if isinstance(values, array) and values.typecode == RealCol.ARRAY_TYPECODE:
+            return
+        if set(map(type, values)) <= {float}:
+            return
+        super().validate_many(values)
+
+    def create_buffer(self) -> ColumnBuffer:
+        return RealBuffer()
+
+    def parse(self, text: str) -> float:
+        return float(text)
+
+    def convert_many(self, values: list) -> list:
+        # JSON has no separate integer type for whole numbers
+        return [float(value) if type(value) in (str, int) else value for value in values]
+
 
 @expose
 class CharCol(Column):
     TYPE = "char"
     DEFAULT = "_"
+    CHECK = "isinstance({value}, str) and len({value}) == 1"
 
     def __init__(self, name: str, default: str = DEFAULT) -> None:
         super().__init__(CharCol.TYPE, name, default)
@@ -82,32 +163,78 @@ class CharCol(Column):
     def validate(value) -> bool:
         return isinstance(value, str) and len(value) == 1
 
+    def validate_many(self, values: list) -> None:
+        if set(map(type, values)) <= {str} and set(map(len, values)) <= {1}:
+            return
+        super().validate_many(values)
+
+    def create_buffer(self) -> ColumnBuffer:
+        return CharBuffer()
+
+    def convert_many(self, values: list) -> list:
+        return values
+
 
 @expose
 class StringCol(Column):
     TYPE = "string"
     DEFAULT = ""
+    CHECK = "isinstance({value}, str)"
+    # columns pickled before dictionary encoding have no attribute of their own
+    dictionary = False
 
-    def __init__(self, name: str, default: str = DEFAULT) -> None:
+    def __init__(self, name: str, default: str = DEFAULT, dictionary: bool = False) -> None:
+        """With `dictionary`, values are stored as codes, see `DictionaryBuffer`."""
         super().__init__(StringCol.TYPE, name, default)
+        self.dictionary = dictionary
 
     @staticmethod
     def validate(value) -> bool:
         return isinstance(value, str)
 
+    def validate_many(self, values: list) -> None:
+        if set(map(type, values)) <= {str}:
+            return
+        super().validate_many(values)
+
+    def create_buffer(self) -> ColumnBuffer:
+        return DictionaryBuffer() if self.dictionary else StringBuffer()
+
+    def options(self) -> dict[str, Any]:
+        return {"dictionary": True} if self.dictionary else {}
+
+    def convert_many(self, values: list) -> list:
+        return values
+
 
 @expose
 class TimeCol(Column):
     TYPE = "time"
     FORMAT = "%H:%M:%S"
     DEFAULT = datetime.strptime("00:00:00", FORMAT).time()
+    CHECK = "isinstance({value}, time) and {value}.tzinfo is None"
 
     def __init__(self, name: str, default: str = DEFAULT) -> None:
         super().__init__(TimeCol.TYPE, name, default)
 
     @staticmethod
     def validate(value) -> bool:
-        return isinstance(value, time)
+        return isinstance(value, time) and value.tzinfo is None
+
+    def validate_many(self, values: list) -> None:
+        if set(map(type, values)) <= {time} and not any(value.tzinfo for value in values):
+            return
+        super().validate_many(values)
+
+    def create_buffer(self) -> ColumnBuffer:
+        return TimeBuffer()
+
+    def parse(self, text: str) -> time:
+        """ISO time, e.g. `13:45:00` or `13:45:00.250000`"""
+        return time.fromisoformat(text.strip())
+
+    def format_many(self, values: list) -> list:
+        return [value.isoformat() for value in values]
 
 
 @expose
@@ -123,4 +250,112 @@ class TimeIntervalCol(Column):
 
     @staticmethod
     def validate(value) -> bool:
-        return isinstance(value, Interval)
\ No newline at end of file
+        return (
+            isinstance(value, Interval)
+            and TimeCol.validate(value.lower_bound)
+            and TimeCol.validate(value.upper_bound)
+        )
+
+    def create_buffer(self) -> ColumnBuffer:
+        return IntervalBuffer()
+
+    PATTERN = re.compile(r"\s*([\[(]?)(.+?)\.\.(.+?)([\])]?)\s*")
+
+    def parse(self, text: str) -> Interval:
+        """ISO times joined by `..`, e.g. `[09:00:00..17:30:00)`
+
+        Brackets mark closed bounds and parentheses open ones; a bound
+        without either is closed.
+        """
+        match = TimeIntervalCol.PATTERN.fullmatch(text)
+        if match is None:
+            raise ValueError(f"Cannot parse time interval from '{text}'!")
+        opening, lower, upper, closing = match.groups()
+        return Interval(
+            time.fromisoformat(lower.strip()),
+            time.fromisoformat(upper.strip()),
+            lower_closed=opening != "(",
+            upper_closed=closing != ")",
+        )
+
+    @staticmethod
+    def format(value: Interval) -> str:
+        return (
+            f"{'[' if value.lower_closed else '('}{value.lower_bound.isoformat()}.."
+            f"{value.upper_bound.isoformat()}{']' if value.upper_closed else ')'}"
+        )
+
+    def format_many(self, values: list) -> list:
+        return list(map(self.format, values))
+
+
+COLUMN_CLASSES = {
+    column.TYPE: column
+    for column in (IntCol, RealCol, CharCol, StringCol, TimeCol, TimeIntervalCol)
+}
+
+
+class RowValidator:
+    """Validation and defaults of whole rows for a fixed list of columns.
+
+    The checks of all columns are compiled into one function, so a row is
+    filled in and validated in a single call instead of a loop over column
+    objects. Build a new validator whenever the columns change.
+    """
+
+    def __init__(self, columns: list[Column]) -> None:
+        self._columns = list(columns)
+        self.row = self._compile()
+
+    def _compile(self):
+        namespace = {"time": time, "fail": self._fail}
+        lines = ["def row(data):", "    get = data.get"]
+        checks = []
+        for position, column in enumerate(self._columns):
+            value = f"v{position}"
+            namespace[f"d{position}"] = column.default
+            # empty values take the default, as they always did in `add_row`
+            lines.append(f"    {value} = get({column.name!r}) or d{position}")
+            if column.CHECK is None:
+                namespace[f"validate{position}"] = column.validate
+                checks.append(f"validate{position}({value})")
+            else:
+                checks.append(f"({column.CHECK.format(value=value)})")
+        values = ", ".join(f"v{position}" for position in range(len(self._columns)))
+        lines += [
+            f"    if not ({' and '.join(checks) or 'True'}):",
+            f"        fail([{values}])",
+            f"    return [{values}]",
+        ]
+        exec("\n".join(lines), namespace)
+        return namespace["row"]
+
+    def _fail(self, values: list) -> None:
+        for column, value in zip(self._columns, values):
+            column.validate_or_error(value)
+
+    def columns(
+        self, values_by_name: dict[str, Sequence], count: int, parse: bool = False
+    ) -> list[Iterable]:
+        """Validated values of every column for a batch of `count` rows
+
+        `values_by_name` holds the given values column-wise; missing columns
+        and empty values take the default. With `parse`, strings are first
+        converted to the column types. Arrays with the typecode of a column
+        are taken as they are, without checking value by value.
+        """
+        columns_values: list[Iterable] = []
+        for column in self._columns:
+            values = values_by_name.get(column.name)
+            if values is None:
+                columns_values.append(repeat(column.default, count))
+                continue
+            default = column.default
+            homogeneous = isinstance(values, array) and values.typecode == column.ARRAY_TYPECODE
+            if not homogeneous or (default and 0 in values):
+                values = [value if value else default for value in values]
+                if parse:
+                    values = column.convert_many(values)
+            column.validate_many(values)
+            columns_values.append(values)
+        return columns_values
@@ -0,0 +1,136 @@
+"""Compression of the blocks of page file streams.
+
+A block is encoded by a list of steps, recorded with it as a string such as
+"delta+zlib": the steps are applied left to right when saving and undone
+right to left when loading. The last step is a codec:
+
+- "zlib" and "lzma" from the standard library;
+- "lz4" and "zstd" when the `lz4` and `zstandard` packages are installed.
+
+Blocks of 64-bit integers (int and time columns) whose values do not
+decrease are delta encoded first, and the deltas are run-length encoded
+when they repeat, e.g. ids or timestamps taken at a fixed step. A block
+that does not get smaller is stored as it is, with no steps.
+"""
+from __future__ import annotations
+
+import lzma
+import operator
+import zlib
+from array import array
+from itertools import accumulate, chain, islice, repeat
+from typing import Callable
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover - lz4 is optional
+    lz4 = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+
+# name: (compress, decompress)
+CODECS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+if lz4 is not None:
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+if zstandard is not None:
+    # compressor objects cannot be shared between threads
+    CODECS["zstd"] = (
+        lambda data: zstandard.ZstdCompressor().compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+# codecs that need a package, by the package
+OPTIONAL_CODECS = {"lz4": "lz4", "zstd": "zstandard"}
+# typecode of the streams that are delta encoded
+DELTA_TYPECODE = "q"
+
+
+def check_codec(codec: str | None) -> None:
+    if codec is None or codec in CODECS:
+        return
+    if codec in OPTIONAL_CODECS:
+        raise ValueError(f"Codec '{codec}' needs the '{OPTIONAL_CODECS[codec]}' package!")
+    raise ValueError(f"Codec should be one of {list(CODECS)}, got '{codec}'!")
+
+
+def encode_block(data: bytes, codec: str, delta: bool = False) -> tuple[bytes, str]:
+    """`data` compressed with `codec`, and the steps that encoded it
+
+    With `delta`, `data` holds 64-bit integers, which are delta encoded
+    first if they do not decrease.
+    """
+    steps = []
+    encoded = data
+    if delta:
+        values = array(DELTA_TYPECODE)
+        values.frombytes(data)
+        deltas = _deltas(values)
+        if deltas is not None:
+            runs = _runs(deltas)
+            if 2 * len(runs) < len(deltas):
+                steps.append("rle")
+                encoded = array(DELTA_TYPECODE, [values[0], *(x for run in runs for x in run)])
+            else:
+                steps.append("delta")
+                encoded = array(DELTA_TYPECODE, [values[0], *deltas])
+    steps.append(codec)
+    encoded = CODECS[codec][0](encoded)
+    if len(encoded) >= len(data):
+        return data, ""
+    return encoded, "+".join(steps)
+
+
+def decode_block(data: bytes, steps: str, typecode: str, swap: bool = False) -> bytes:
+    """Inverse of `encode_block`, with the items of `typecode` byte-swapped if `swap`"""
+    for step in reversed(steps.split("+") if steps else []):
+        if step in CODECS:
+            data = CODECS[step][1](data)
+            continue
+        values = array(DELTA_TYPECODE, data)
+        if swap:
+            values.byteswap()
+            swap = False
+        data = (_undo_runs(values) if step == "rle" else _undo_deltas(values)).tobytes()
+    if swap and typecode != "B":
+        values = array(typecode, data)
+        values.byteswap()
+        data = values.tobytes()
+    return data
+
+
+def _deltas(values: array) -> list[int] | None:
+    """Differences of consecutive values, None unless they are small and not negative."""
+    if len(values) < 2 or not all(map(operator.le, values, islice(values, 1, None))):
+        return None
+    deltas = list(map(operator.sub, islice(values, 1, None), values))
+    # the largest difference of two 64-bit integers does not fit in one
+    if max(deltas) >= 1 << 63:
+        return None
+    return deltas
+
+
+def _runs(deltas: list[int]) -> list[list[int]]:
+    """`(delta, count)` for every run of equal deltas."""
+    runs = []
+    for delta in deltas:
+        if runs and runs[-1][0] == delta:
+            runs[-1][1] += 1
+        else:
+            runs.append([delta, 1])
+    return runs
+
+
+def _undo_deltas(encoded: array) -> array:
+    # the first value followed by the deltas adds up to the values
+    return array(DELTA_TYPECODE, accumulate(encoded))
+
+
+def _undo_runs(encoded: array) -> array:
+    runs = zip(islice(encoded, 1, None, 2), islice(encoded, 2, None, 2))
+    deltas = chain.from_iterable(repeat(delta, count) for delta, count in runs)
+    return array(DELTA_TYPECODE, accumulate(chain([encoded[0]], deltas)))
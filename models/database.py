@@ -1,4 +1,9 @@
+from __future__ import annotations
+
+from typing import Any, Iterator, Sequence
+
 from Pyro5.api import expose
+from models import join as table_join
 from models.table import Table
 
 
@@ -40,3 +45,19 @@ class Database:
         table = self.get_table(name)
         del self._tables[name]
         return table
+
+    def join(
+        self,
+        left: str,
+        right: str,
+        on: str | Sequence[str],
+        how: str = "inner",
+        batch_size: int = table_join.BATCH_SIZE,
+    ) -> Iterator[list[list[Any]]]:
+        """Batches of the rows of table `left` joined with the rows of table `right`
+
+        `on` names the key column of both tables, or is a pair of the left
+        and right key columns. `how` is "inner" or "left". See `models.join`
+        for how the join method is chosen.
+        """
+        return table_join.join(self.get_table(left), self.get_table(right), on, how, batch_size)
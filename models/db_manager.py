@@ -1,17 +1,201 @@
 from __future__ import annotations
 
+import cProfile
+import csv
+import inspect
+import json
+import os
 import pickle
-from typing import Any
+import threading
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
 from models.column import Column
+from models.compression import check_codec
 from models.database import Database
+from models.metrics import Metrics
+from models.pagefile import PageFile, is_page_file
+from models.query import Expr
 from models.row import Row
-from models.table import Table
+from models.storage import ColumnBuffer, PaddedBuffer
+from models.table import BATCH_SIZE, Table
+from models.wal import WriteAheadLog, cut_torn_tail, read_records
+
+
+SAVE_FORMATS = ["pages", "pickle"]
+LOAD_FORMATS = ["csv", "jsonl"]
+# logged mutations that a transaction can apply, see `DBManager.commit`
+TRANSACTION_OPERATIONS = [
+    "add_table",
+    "delete_table",
+    "add_column",
+    "add_row",
+    "add_batch",
+    "change_row",
+    "change_columns",
+    "rename_column",
+    "delete_row",
+    "delete_rows",
+    "compact",
+    "create_index",
+]
+# operations timed once metrics are enabled, see `DBManager.enable_metrics`
+INSTRUMENTED_OPERATIONS = [
+    "create_database",
+    "commit",
+    "add_table",
+    "delete_table",
+    "add_column",
+    "add_row",
+    "add_rows",
+    "add_batch",
+    "bulk_load",
+    "export_table",
+    "change_row",
+    "change_columns",
+    "rename_column",
+    "delete_row",
+    "delete_rows",
+    "compact",
+    "create_index",
+    "select",
+    "aggregate",
+    "join",
+    "save_database",
+    "open_database",
+    "checkpoint",
+]
+
+
+def logged(method):
+    """Run a mutation under the manager lock and record it in the WAL.
+
+    Inside `DBManager.transaction` the mutation is only recorded, to be
+    applied when the transaction commits.
+    """
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrapper(self: DBManager, *args, **kwargs):
+        local = self._local
+        transaction = getattr(local, "transaction", None)
+        if transaction is not None:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            transaction.operations.append([method.__name__, list(bound.args[1:])])
+            return None
+
+        wal = None
+        with self._lock:
+            # mutations made by another one, like the operations of a
+            # committed transaction, are part of its record
+            local.depth = getattr(local, "depth", 0) + 1
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                local.depth -= 1
+            if self._wal is not None and local.depth == 0:
+                wal = self._wal
+                bound = signature.bind(self, *args, **kwargs)
+                bound.apply_defaults()
+                lsn = self._lsn = wal.append(method.__name__, bound.args[1:])
+        if wal is not None:
+            # outside the lock, so that concurrent writers share one fsync
+            wal.commit(lsn)
+        return result
+
+    return wrapper
+
+
+def check_transaction(operations: list[list]) -> None:
+    """Raise unless every operation is a `[name, args]` pair of a transaction mutation."""
+    for operation in operations:
+        name, args = operation
+        if name not in TRANSACTION_OPERATIONS:
+            raise ValueError(
+                f"Transaction operation should be one of {TRANSACTION_OPERATIONS}, got '{name}'!"
+            )
+        if not isinstance(args, (list, tuple)):
+            raise TypeError(f"Arguments of operation '{name}' should be a list!")
+
+
+class Transaction:
+    """Mutations recorded by `DBManager.transaction`, applied on commit."""
+
+    def __init__(self) -> None:
+        self.operations: list[list] = []
+
+    def rollback(self) -> None:
+        """Forget the recorded mutations, nothing is applied on exit."""
+        self.operations.clear()
+
+
+class _Undo:
+    """What a transaction needs to roll the DB back if it fails half way.
+
+    Tables record how to undo each change made to them (see
+    `Table._start_undo`), so a transaction costs nothing more than its
+    changes, and rolling back undoes only those.
+    """
+
+    def __init__(self, db: Database) -> None:
+        self._db = db
+        self._tables = dict(db.tables)
+        self._recording: dict[int, Table] = {}
+
+    def save(self, table_name: str) -> None:
+        table = self._db.tables.get(table_name)
+        if table is not None and id(table) not in self._recording:
+            table._start_undo()
+            self._recording[id(table)] = table
+
+    def rollback(self) -> None:
+        for table in self._recording.values():
+            table._rollback()
+        self._db.tables.clear()
+        self._db.tables.update(self._tables)
+
+    def release(self) -> None:
+        for table in self._recording.values():
+            table._stop_undo()
+
+
+def _coalesce(operations: list[list]) -> Iterator[list]:
+    """Operations with the runs of `add_row`s to one table merged into `add_batch`es."""
+    position = 0
+    while position < len(operations):
+        name, args = operations[position]
+        if name != "add_row":
+            yield operations[position]
+            position += 1
+            continue
+        table_name = args[0]
+        rows = []
+        while position < len(operations):
+            name, args = operations[position]
+            if name != "add_row" or args[0] != table_name:
+                break
+            rows.append(args[1])
+            position += 1
+        yield ["add_batch", [table_name, rows]]
 
 
 class DBManager:
     def __init__(self, db: Database = None) -> None:
         self.db = db
+        self._page_file: PageFile | None = None
+        self._lock = threading.RLock()
+        self._wal: WriteAheadLog | None = None
+        self._wal_options: dict | None = None
+        # sequence number of the last mutation applied to the DB
+        self._lsn = 0
+        self._checkpoints: threading.Thread | None = None
+        self._stop_checkpoints = threading.Event()
+        # the open transaction and the nesting of logged calls, per thread
+        self._local = threading.local()
+        self._metrics: Metrics | None = None
 
     @property
     def db(self) -> Database:
@@ -25,52 +209,462 @@ class DBManager:
         self._db = value
 
     def create_database(self, name: str) -> None:
-        self.db = Database(name)
+        with self._lock:
+            self._close_page_file()
+            self.db = Database(name)
+            self._lsn = 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """Group mutations, which are applied together when the block exits
+
+        Mutations made in the block return None and are only recorded; reads
+        see the DB as it was. On exit the recorded mutations are applied in
+        one go: consecutive `add_row`s to a table are validated and indexed
+        as one batch, and the whole transaction is one WAL record with one
+        fsync. If the block raises, nothing is applied. If a mutation fails,
+        the ones before it are undone and the error is raised.
+        A transaction opened inside another one is part of it.
+        """
+        if getattr(self._local, "transaction", None) is not None:
+            yield self._local.transaction
+            return
 
+        transaction = Transaction()
+        self._local.transaction = transaction
+        try:
+            yield transaction
+        finally:
+            self._local.transaction = None
+        if transaction.operations:
+            self.commit(transaction.operations)
+
+    @logged
+    def commit(self, operations: list[list]) -> None:
+        """Apply the `[name, args]` mutations of a transaction, all or none
+
+        Only the mutations in `TRANSACTION_OPERATIONS` can be applied.
+        """
+        check_transaction(operations)
+        undo = _Undo(self.db)
+        with ExitStack() as stack:
+            # readers cannot take snapshots of a transaction half applied
+            table_names = {args[0] for _, args in operations if args} & set(self.db.tables)
+            for table_name in sorted(table_names):
+                stack.enter_context(self.db.tables[table_name]._lock)
+            try:
+                for name, args in _coalesce(operations):
+                    if name != "add_table" and args:
+                        undo.save(args[0])
+                    getattr(self, name)(*args)
+            except BaseException:
+                undo.rollback()
+                raise
+            finally:
+                undo.release()
+
+    @logged
     def add_table(self, name: str) -> None:
         return self.db.add_table(name)
 
     def get_table(self, name: str) -> Table:
         return self.db.get_table(name)
 
+    @logged
     def delete_table(self, name: str) -> Table:
         return self.db.delete_table(name)
 
+    @logged
     def add_column(self, table_name: str, column: Column) -> None:
         table = self.get_table(table_name)
         return table.add_column(column)
 
+    @logged
     def add_row(self, table_name: str, data: dict[str, Any]) -> None:
         table = self.get_table(table_name)
         return table.add_row(data)
 
+    def add_rows(
+        self,
+        table_name: str,
+        rows: Iterable[dict[str, Any] | Sequence[Any]],
+        columns: list[str] | None = None,
+        parse: bool = False,
+        batch_size: int = BATCH_SIZE,
+    ) -> int:
+        """Append many rows, see `Table.add_rows`; each batch is one WAL record"""
+        rows = iter(rows)
+        added = 0
+        while batch := list(islice(rows, batch_size)):
+            added += self.add_batch(table_name, batch, columns, parse)
+        return added
+
+    @logged
+    def add_batch(
+        self,
+        table_name: str,
+        rows: list[dict[str, Any] | Sequence[Any]],
+        columns: list[str] | None = None,
+        parse: bool = False,
+    ) -> int:
+        table = self.get_table(table_name)
+        return table.add_rows(rows, columns, batch_size=len(rows) or 1, parse=parse)
+
+    def bulk_load(
+        self, table_name: str, path: str, format: str = "csv", batch_size: int = BATCH_SIZE
+    ) -> int:
+        """Append the rows of a CSV file with a header or of a JSON Lines file
+
+        Values are parsed into the column types, times and intervals from
+        ISO text (see `TimeIntervalCol.parse`). Returns the number of rows.
+        """
+        if format not in LOAD_FORMATS:
+            raise ValueError(f"Load format should be one of {LOAD_FORMATS}!")
+
+        with open(path, newline="", encoding="utf-8") as file:
+            if format == "csv":
+                reader = csv.reader(file)
+                header = next(reader, None)
+                if header is None:
+                    return 0
+                return self.add_rows(table_name, reader, header, True, batch_size)
+            rows = (json.loads(line) for line in file if line.strip())
+            return self.add_rows(table_name, rows, parse=True, batch_size=batch_size)
+
+    def export_table(
+        self, table_name: str, path: str, format: str = "csv", columns: list[str] | None = None
+    ) -> int:
+        """Write a table to a CSV, JSON Lines or Arrow IPC file, see `Table.export`"""
+        table = self.get_table(table_name)
+        if self._metrics is not None:
+            self._count_faults(table, columns or table._get_column_names())
+        return table.export(path, format, columns=columns)
+
+    @logged
     def change_row(self, table_name: str, index: int, data: dict[str, Any]) -> None:
         table = self.get_table(table_name)
         return table.change_row(index, data)
 
+    @logged
     def change_columns(self, table_name: str, new_order: list[int]) -> Table:
         table = self.get_table(table_name)
         return table.change_columns(new_order)
 
+    @logged
     def rename_column(self, table_name: str, old_name: str, new_name: str) -> Table:
         table = self.get_table(table_name)
         return table.rename_column(old_name, new_name)
 
+    @logged
     def delete_row(self, table_name: str, index: int) -> Row:
         table = self.get_table(table_name)
         return table.delete_row(index)
 
-    def save_database(self, path_to_save: str = "") -> str:
+    @logged
+    def delete_rows(self, table_name: str, ids: list[int]) -> int:
+        table = self.get_table(table_name)
+        return table.delete_rows(ids)
+
+    @logged
+    def compact(self, table_name: str) -> int:
+        table = self.get_table(table_name)
+        return table.compact()
+
+    @logged
+    def create_index(self, table_name: str, column_name: str, kind: str = "hash") -> None:
+        table = self.get_table(table_name)
+        table.create_index(column_name, kind)
+
+    def select(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: Expr | None = None,
+        order_by: str | list[str] | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> list[list[Any]]:
+        table = self.get_table(table_name)
+        if self._metrics is not None:
+            names = [*(columns or table._get_column_names()), *_names(order_by)]
+            self._count_faults(table, names, where)
+        result = table.select(columns, where, order_by, descending, limit)
+        rows = result.to_list()
+        if self._metrics is not None:
+            self._metrics.add("rows_scanned", result.rows_scanned)
+            self._metrics.add("rows_returned", len(rows))
+        return rows
+
+    def aggregate(
+        self,
+        table_name: str,
+        group_by: list[str | Sequence[str]] | None = None,
+        aggs: dict[str, list[str]] | None = None,
+        where: Expr | None = None,
+    ) -> list[list[Any]]:
+        table = self.get_table(table_name)
+        if self._metrics is not None:
+            names = [item if isinstance(item, str) else item[0] for item in group_by or ()]
+            self._count_faults(table, [*names, *(aggs or {})], where)
+        rows = table.aggregate(group_by, aggs, where)
+        if self._metrics is not None:
+            self._metrics.add("rows_returned", len(rows))
+        return rows
+
+    def join(
+        self, left: str, right: str, on: str | Sequence[str], how: str = "inner"
+    ) -> list[list[Any]]:
+        if self._metrics is not None:
+            left_on, right_on = (on, on) if isinstance(on, str) else on
+            for table_name, key in ((left, left_on), (right, right_on)):
+                table = self.get_table(table_name)
+                self._count_faults(table, table._get_column_names(), indexed=[key])
+        rows = [row for batch in self.db.join(left, right, on, how) for row in batch]
+        if self._metrics is not None:
+            self._metrics.add("rows_returned", len(rows))
+        return rows
+
+    def save_database(
+        self, path_to_save: str = "", format: str = "pages", codec: str | None = None
+    ) -> str:
+        """Save the DB, by default in the page format
+
+        Saving again to the file the DB was opened from or last saved to only
+        writes the pages that changed. The "pickle" format writes the whole
+        DB graph and is kept for import/export.
+
+        `codec` compresses the column blocks of the page format, see
+        `models.compression`. Without one, a file keeps the codec it was last
+        saved with and a new file is not compressed.
+
+        A save in the page format is a checkpoint: the write-ahead log of the
+        file is emptied, and follows the DB when it is saved to a new file.
+        """
+        if format not in SAVE_FORMATS:
+            raise ValueError(f"Save format should be one of {SAVE_FORMATS}!")
+        if codec is not None and format != "pages":
+            raise ValueError(f"Only the page format can be compressed, not '{format}'!")
+        check_codec(codec)
         if path_to_save == "":
-            path_to_save = f"{self.db.name}.pkl"
+            extension = "cdb" if format == "pages" else "pkl"
+            path_to_save = f"{self.db.name}.{extension}"
 
-        with open(path_to_save, "wb") as file:
-            pickle.dump(self.db, file)
+        with self._lock:
+            if format == "pickle":
+                with open(path_to_save, "wb") as file:
+                    pickle.dump(self.db, file)
+                    if self._metrics is not None:
+                        self._metrics.add("bytes_written", file.tell())
+                return path_to_save
+
+            page_file = self._page_file
+            if page_file is None or page_file.path != os.path.abspath(path_to_save):
+                page_file = PageFile.create(path_to_save, codec=codec)
+            elif codec is not None:
+                page_file.codec = codec
+            counts = page_file.bytes_written, page_file.blocks_written, page_file.blocks_reused
+            page_file.save(self.db, self._lsn)
+            if self._metrics is not None:
+                self._metrics.add("bytes_written", page_file.bytes_written - counts[0])
+                self._metrics.add("blocks_written", page_file.blocks_written - counts[1])
+                self._metrics.add("blocks_reused", page_file.blocks_reused - counts[2])
+            if page_file is not self._page_file:
+                # every buffer was read to write the new file, the old one is unused
+                self._close_page_file()
+                self._page_file = page_file
+            self._reset_wal()
 
         return path_to_save
 
-    def open_database(self, path_to_load: str = None) -> None:
-        with open(path_to_load, "rb") as file:
-            db = pickle.load(file)
+    def open_database(self, path_to_load: str = None, mmap: bool = False) -> None:
+        """Open a DB saved in any of the formats
 
-        self.db = db
+        With `mmap`, a DB in the page format is opened read-only and its
+        fixed-width columns are served straight from the mapped file.
+        Mutations logged to the write-ahead log after the last save are
+        replayed, unless the DB is opened with `mmap`: read-only readers see
+        the last checkpoint.
+        """
+        if is_page_file(path_to_load):
+            page_file = PageFile.open(path_to_load, use_mmap=mmap)
+            db = page_file.load()
+        else:
+            page_file = None
+            with open(path_to_load, "rb") as file:
+                db = pickle.load(file)
+
+        with self._lock:
+            self._close_page_file()
+            self._page_file = page_file
+            self.db = db
+            self._lsn = page_file.lsn if page_file is not None else 0
+            if page_file is not None and not page_file.read_only:
+                self._replay(_wal_path(page_file))
+                if self._wal_options is not None:
+                    self._wal = WriteAheadLog(
+                        _wal_path(page_file), self._lsn, **self._wal_options
+                    )
+
+    def _replay(self, path: str) -> None:
+        for lsn, operation, args in read_records(path):
+            if lsn > self._lsn:
+                getattr(self, operation)(*args)
+                self._lsn = lsn
+        # new records have to follow the last replayed one, not a torn tail
+        cut_torn_tail(path)
+
+    def enable_wal(self, fsync_every: int = 1, fsync_interval: float | None = None) -> None:
+        """Log every mutation to `<DB file>.wal` before it is acknowledged
+
+        A record is fsynced once `fsync_every` records are waiting (1 makes
+        every mutation durable on return) or every `fsync_interval` seconds.
+        Records are written in batches, so concurrent writers share fsyncs.
+        The option sticks to the manager and applies to DBs opened later.
+        """
+        with self._lock:
+            if self._page_file is None or self._page_file.read_only:
+                raise ValueError("The WAL needs a DB saved in the page format!")
+            self._close_wal()
+            self._wal_options = {"fsync_every": fsync_every, "fsync_interval": fsync_interval}
+            self._wal = WriteAheadLog(
+                _wal_path(self._page_file), self._lsn, **self._wal_options
+            )
+
+    def disable_wal(self) -> None:
+        with self._lock:
+            self._close_wal()
+            self._wal_options = None
+
+    def checkpoint(self) -> None:
+        """Save the DB to its file, which empties the write-ahead log."""
+        with self._lock:
+            if self._page_file is None:
+                raise ValueError("You should save DB before making checkpoints!")
+            self.save_database(self._page_file.path)
+
+    def start_checkpoints(self, interval: float) -> None:
+        """Make a checkpoint every `interval` seconds in the background."""
+        self.stop_checkpoints()
+
+        def run() -> None:
+            while not self._stop_checkpoints.wait(interval):
+                self.checkpoint()
+
+        self._stop_checkpoints.clear()
+        self._checkpoints = threading.Thread(target=run, daemon=True)
+        self._checkpoints.start()
+
+    def stop_checkpoints(self) -> None:
+        if self._checkpoints is not None:
+            self._stop_checkpoints.set()
+            self._checkpoints.join()
+            self._checkpoints = None
+
+    def enable_metrics(
+        self,
+        profile_every: int = 0,
+        on_profile: Callable[[str, cProfile.Profile], Any] | None = None,
+    ) -> Metrics:
+        """Start collecting metrics of the operations, see `models.metrics`
+
+        Every `profile_every`-th call of an operation is profiled, and the
+        profile passed to `on_profile`. Metrics already collected are kept.
+        """
+        with self._lock:
+            if self._metrics is None:
+                metrics = Metrics(profile_every, on_profile)
+                for name in INSTRUMENTED_OPERATIONS:
+                    # the instance attribute shadows the method until disabled
+                    setattr(self, name, metrics.wrap(name, getattr(self, name)))
+                self._metrics = metrics
+            return self._metrics
+
+    def disable_metrics(self) -> None:
+        """Stop collecting metrics; the operations run unwrapped again"""
+        with self._lock:
+            if self._metrics is not None:
+                for name in INSTRUMENTED_OPERATIONS:
+                    delattr(self, name)
+                self._metrics = None
+
+    def stats(self) -> dict[str, Any]:
+        """Metrics collected since `enable_metrics`, see `Metrics.stats`"""
+        if self._metrics is None:
+            raise ValueError("Metrics are not enabled, call enable_metrics first!")
+        return self._metrics.stats()
+
+    def write_metrics(self, target: str | tuple[str, int]) -> None:
+        """Dump the metrics in the Prometheus text format, see `Metrics.write_prometheus`"""
+        if self._metrics is None:
+            raise ValueError("Metrics are not enabled, call enable_metrics first!")
+        self._metrics.write_prometheus(target)
+
+    def close(self) -> None:
+        """Stop the background work and flush the log; the DB is not saved."""
+        self.stop_checkpoints()
+        with self._lock:
+            self._close_page_file()
+
+    def _count_faults(
+        self,
+        table: Table,
+        column_names: Iterable[str],
+        where: Expr | None = None,
+        indexed: Iterable[str] = (),
+    ) -> None:
+        """Count what a read is about to use as cache hits or misses
+
+        The columns of `column_names` and `where`, and the indexes of the
+        columns of `where` and `indexed`, are hits if they are in memory
+        already and misses if the read faults them in from the page file.
+        """
+        if where is not None:
+            column_names = [*column_names, *where.column_names()]
+            indexed = [*indexed, *where.column_names()]
+        positions = table._schema.positions
+        names = set(column_names) & positions.keys()
+        buffers = [table._buffers[positions[name]] for name in names]
+        indexes = [table._indexes[name] for name in set(indexed) & table._indexes.keys()]
+        for cache, deferred in (
+            ("columns", [_unpadded(buffer) for buffer in buffers]),
+            ("indexes", indexes),
+        ):
+            loaded = sum(item.is_loaded for item in deferred)
+            self._metrics.cache(cache, loaded, len(deferred) - loaded)
+
+    def _reset_wal(self) -> None:
+        """Start an empty log next to the page file after a checkpoint."""
+        path = _wal_path(self._page_file)
+        if self._wal is not None and self._wal.path != path:
+            self._close_wal()
+        if self._wal is None and self._wal_options is not None:
+            self._wal = WriteAheadLog(path, self._lsn, **self._wal_options)
+        if self._wal is not None:
+            self._wal.sync()
+            self._wal.truncate()
+        elif os.path.exists(path):
+            # records of an earlier session, all included in this save
+            os.remove(path)
+
+    def _close_wal(self) -> None:
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def _close_page_file(self) -> None:
+        self._close_wal()
+        if self._page_file is not None:
+            self._page_file.close()
+            self._page_file = None
+
+
+def _names(names: str | list[str] | None) -> list[str]:
+    return [names] if isinstance(names, str) else list(names or ())
+
+
+def _unpadded(buffer: ColumnBuffer) -> ColumnBuffer:
+    return buffer.inner if isinstance(buffer, PaddedBuffer) else buffer
+
+
+def _wal_path(page_file: PageFile) -> str:
+    return f"{page_file.path}.wal"
@@ -0,0 +1,201 @@
+"""Streaming export of tables to CSV, JSON Lines and Arrow IPC.
+
+Rows are read from the column buffers a chunk at a time, so exporting a
+table never holds more than `chunk_size` rows of it in memory. Times and
+intervals are written in the text form read back by `Column.parse`; the
+Arrow stream keeps times as `time64[us]` and intervals as structs of their
+bounds.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import IO, TYPE_CHECKING, Iterator, Sequence
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+from .storage import IntervalBuffer
+
+if TYPE_CHECKING:
+    from .table import Table
+
+
+EXPORT_FORMATS = ["csv", "jsonl", "arrow"]
+CHUNK_SIZE = 65536
+
+
+def export_chunks(
+    table: Table,
+    format: str = "csv",
+    chunk_size: int = CHUNK_SIZE,
+    columns: list[str] | None = None,
+) -> Iterator[str | bytes]:
+    """Encoded pieces of the export, text for CSV/JSON Lines, bytes for Arrow."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Export format should be one of {EXPORT_FORMATS}!")
+    # writes made during the export do not show up in it
+    table = table.snapshot()
+    if columns is None:
+        columns = list(table._get_column_names())
+    positions = [table._get_column_position(name) for name in columns]
+
+    if format == "arrow":
+        return _arrow_chunks(table, columns, positions, chunk_size)
+    return _text_chunks(table, columns, positions, chunk_size, format)
+
+
+def export(
+    table: Table,
+    target: str | IO,
+    format: str = "csv",
+    chunk_size: int = CHUNK_SIZE,
+    columns: list[str] | None = None,
+) -> int:
+    """Write the rows of `table` to a path or an open stream, return their count.
+
+    Streams are written as they are: text streams for CSV and JSON Lines,
+    binary ones for Arrow.
+    """
+    table = table.snapshot()
+    chunks = export_chunks(table, format, chunk_size, columns)
+    if isinstance(target, str):
+        if format == "arrow":
+            file = open(target, "wb")
+        else:
+            file = open(target, "w", newline="", encoding="utf-8")
+        with file:
+            _write_chunks(chunks, file)
+    else:
+        _write_chunks(chunks, target)
+    return table.rows_count
+
+
+def _write_chunks(chunks: Iterator[str | bytes], stream: IO) -> None:
+    for chunk in chunks:
+        stream.write(chunk)
+
+
+def _text_chunks(
+    table: Table, columns: list[str], positions: list[int], chunk_size: int, format: str
+) -> Iterator[str]:
+    out = io.StringIO()
+    if format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        yield _take(out)
+
+    for rows in table._live_chunks(chunk_size):
+        values = [
+            table._columns[position].format_many(table._buffers[position].values_at(rows))
+            for position in positions
+        ]
+        if format == "csv":
+            writer.writerows(zip(*values))
+        else:
+            dumps = json.dumps
+            for row in zip(*values):
+                out.write(dumps(dict(zip(columns, row)), ensure_ascii=False))
+                out.write("\n")
+        yield _take(out)
+
+
+def _take(out: io.StringIO) -> str:
+    text = out.getvalue()
+    out.seek(0)
+    out.truncate()
+    return text
+
+
+def _arrow_chunks(
+    table: Table, columns: list[str], positions: list[int], chunk_size: int
+) -> Iterator[bytes]:
+    if pa is None:
+        raise ImportError("Arrow export requires the 'pyarrow' package!")
+
+    types = [_arrow_type(table._columns[position].type) for position in positions]
+    schema = pa.schema(list(zip(columns, types)))
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for rows in table._live_chunks(chunk_size):
+            arrays = [
+                _arrow_array(table._buffers[position], rows, type_)
+                for position, type_ in zip(positions, types)
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+class _ChunkSink:
+    """Write-only file handing out what was written since the last `take`."""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_type(column_type: str):
+    time_type = pa.time64("us")
+    return {
+        "int": pa.int64(),
+        "real": pa.float64(),
+        "char": pa.string(),
+        "string": pa.string(),
+        "time": time_type,
+        "time interval": pa.struct(
+            [
+                ("lower", time_type),
+                ("upper", time_type),
+                ("lower_closed", pa.bool_()),
+                ("upper_closed", pa.bool_()),
+            ]
+        ),
+    }[column_type]
+
+
+def _arrow_array(buffer, rows: Sequence[int], type_):
+    if issubclass(buffer.buffer_type, IntervalBuffer):
+        lowers, uppers, flags = zip(*_stored(buffer, rows)) if rows else ((), (), ())
+        return pa.StructArray.from_arrays(
+            [
+                pa.array(lowers, type_.field("lower").type),
+                pa.array(uppers, type_.field("upper").type),
+                pa.array([bool(flag & IntervalBuffer.LOWER_CLOSED) for flag in flags]),
+                pa.array([bool(flag & IntervalBuffer.UPPER_CLOSED) for flag in flags]),
+            ],
+            fields=list(type_),
+        )
+    if pa.types.is_string(type_):
+        return pa.array(buffer.values_at(rows), type_)
+    # fixed-width columns are exported in their stored form
+    return pa.array(_stored(buffer, rows), type_)
+
+
+def _stored(buffer, rows: Sequence[int]) -> Sequence:
+    if isinstance(rows, range):
+        return buffer.scan(rows.start, rows.stop)
+    return buffer.take(rows)
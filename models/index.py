@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import random
+from abc import ABC, abstractmethod
+from copy import deepcopy
+from bisect import bisect_left, insort
+from itertools import count
+from typing import Any, Callable, Iterable
+
+from .storage import ColumnBuffer, Deferred, IntervalBuffer
+
+
+INDEX_KINDS = ["hash", "sorted", "interval"]
+
+
+class Index(Deferred, ABC):
+    """Secondary index mapping stored column values to row positions.
+
+    Keys are the stored representation of values (see `ColumnBuffer.raw`),
+    so lookups take literals encoded with `ColumnBuffer.encode`.
+    """
+
+    KIND = ""
+
+    def __init__(self, column_name: str) -> None:
+        self.column_name = column_name
+
+    def build(self, buffer: ColumnBuffer, rows: Iterable[int] | None = None) -> None:
+        """Index the given rows of `buffer`, all of them by default."""
+        self.clear()
+        for row in range(len(buffer)) if rows is None else rows:
+            self.insert(buffer.raw(row), row)
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def insert(self, key: Any, row: int) -> None:
+        pass
+
+    def insert_many(self, keys: Iterable[Any], first_row: int) -> None:
+        """Insert keys of consecutive rows starting at `first_row`."""
+        for row, key in enumerate(keys, first_row):
+            self.insert(key, row)
+
+    @abstractmethod
+    def remove(self, key: Any, row: int) -> None:
+        pass
+
+    @abstractmethod
+    def lookup(self, key: Any) -> list[int]:
+        pass
+
+    def copy(self) -> Index:
+        return deepcopy(self)
+
+
+class HashIndex(Index):
+    KIND = "hash"
+
+    def __init__(self, column_name: str) -> None:
+        super().__init__(column_name)
+        self._rows: dict[Any, set[int]] = {}
+
+    def clear(self) -> None:
+        self._rows = {}
+
+    def insert(self, key: Any, row: int) -> None:
+        self._rows.setdefault(key, set()).add(row)
+
+    def remove(self, key: Any, row: int) -> None:
+        rows = self._rows[key]
+        rows.discard(row)
+        if not rows:
+            del self._rows[key]
+
+    def lookup(self, key: Any) -> list[int]:
+        return sorted(self._rows.get(key, ()))
+
+    def copy(self) -> HashIndex:
+        index = HashIndex(self.column_name)
+        index._rows = {key: set(rows) for key, rows in self._rows.items()}
+        return index
+
+
+class SortedIndex(Index):
+    """Index kept as a sorted list of `(key, row)` pairs."""
+
+    KIND = "sorted"
+
+    def __init__(self, column_name: str) -> None:
+        super().__init__(column_name)
+        self._entries: list[tuple[Any, int]] = []
+
+    def clear(self) -> None:
+        self._entries = []
+
+    def build(self, buffer: ColumnBuffer, rows: Iterable[int] | None = None) -> None:
+        rows = range(len(buffer)) if rows is None else rows
+        self._entries = sorted((buffer.raw(row), row) for row in rows)
+
+    def insert(self, key: Any, row: int) -> None:
+        insort(self._entries, (key, row))
+
+    def insert_many(self, keys: Iterable[Any], first_row: int) -> None:
+        # sorting two sorted runs is a linear merge
+        self._entries += sorted(zip(keys, count(first_row)))
+        self._entries.sort()
+
+    def remove(self, key: Any, row: int) -> None:
+        del self._entries[bisect_left(self._entries, (key, row))]
+
+    def lookup(self, key: Any) -> list[int]:
+        return self.range(key, key)
+
+    def copy(self) -> SortedIndex:
+        index = SortedIndex(self.column_name)
+        index._entries = list(self._entries)
+        return index
+
+    def range(
+        self,
+        low: Any = None,
+        high: Any = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> list[int]:
+        """Rows with keys between `low` and `high`; `None` leaves a side open."""
+        entries = self._entries
+        start, stop = 0, len(entries)
+        if low is not None:
+            # (low,) sorts before every (low, row) pair and (low, inf) after them
+            bound = (low,) if low_inclusive else (low, float("inf"))
+            start = bisect_left(entries, bound)
+        if high is not None:
+            bound = (high, float("inf")) if high_inclusive else (high,)
+            stop = bisect_left(entries, bound)
+        return sorted(row for _, row in entries[start:stop])
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "max_upper")
+
+    def __init__(self, key: tuple, priority: float) -> None:
+        self.key = key
+        self.priority = priority
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+        self.max_upper = key[1]
+
+    def update(self) -> None:
+        max_upper = self.key[1]
+        if self.left is not None and self.left.max_upper > max_upper:
+            max_upper = self.left.max_upper
+        if self.right is not None and self.right.max_upper > max_upper:
+            max_upper = self.right.max_upper
+        self.max_upper = max_upper
+
+
+def _split(node: _Node | None, key: tuple) -> tuple[_Node | None, _Node | None]:
+    """Split a treap into keys lower than `key` and the rest."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def overlaps(first: tuple, second: tuple) -> bool:
+    """Whether two stored `(lower, upper, flags, ...)` intervals intersect."""
+    lower_closed, upper_closed = IntervalBuffer.LOWER_CLOSED, IntervalBuffer.UPPER_CLOSED
+    for left, right in ((first, second), (second, first)):
+        # left must start before right ends
+        if left[0] > right[1]:
+            return False
+        if left[0] == right[1] and not (left[2] & lower_closed and right[2] & upper_closed):
+            return False
+    for value in (first, second):
+        if value[0] == value[1] and value[2] != lower_closed | upper_closed:
+            return False  # empty interval
+    return True
+
+
+class IntervalIndex(Index):
+    """Augmented interval tree over the stored `(lower, upper, flags)` values.
+
+    The tree is a treap ordered by `(lower, upper, flags, row)` in which each
+    node also tracks the largest upper bound of its subtree, so overlap
+    queries skip every subtree that ends before the queried interval starts.
+    Being ordered, it also answers the lookups of a sorted index.
+    """
+
+    KIND = "interval"
+
+    def __init__(self, column_name: str) -> None:
+        super().__init__(column_name)
+        self._root: _Node | None = None
+
+    def clear(self) -> None:
+        self._root = None
+
+    def build(self, buffer: ColumnBuffer, rows: Iterable[int] | None = None) -> None:
+        rows = range(len(buffer)) if rows is None else rows
+        keys = sorted((*buffer.raw(row), row) for row in rows)
+        # a balanced tree whose priorities decrease level by level is a treap
+        priorities = sorted((random.random() for _ in keys), reverse=True)
+        levels: list[list[_Node]] = []
+
+        def build_range(start: int, stop: int, depth: int) -> _Node | None:
+            if start >= stop:
+                return None
+            middle = (start + stop) // 2
+            node = _Node(keys[middle], 0.0)
+            if len(levels) == depth:
+                levels.append([])
+            levels[depth].append(node)
+            node.left = build_range(start, middle, depth + 1)
+            node.right = build_range(middle + 1, stop, depth + 1)
+            node.update()
+            return node
+
+        self._root = build_range(0, len(keys), 0)
+        priority = iter(priorities)
+        for level in levels:
+            for node in level:
+                node.priority = next(priority)
+
+    def insert(self, key: tuple, row: int) -> None:
+        left, right = _split(self._root, (*key, row))
+        self._root = _merge(_merge(left, _Node((*key, row), random.random())), right)
+
+    def remove(self, key: tuple, row: int) -> None:
+        left, right = _split(self._root, (*key, row))
+        _, right = _split(right, (*key, row, 0))
+        self._root = _merge(left, right)
+
+    def lookup(self, key: tuple) -> list[int]:
+        return self.range(key, key)
+
+    def range(
+        self,
+        low: tuple | None = None,
+        high: tuple | None = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> list[int]:
+        """Rows whose stored value lies between `low` and `high`."""
+        rows = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            value = node.key[:3]
+            above_low = low is None or value > low or (value == low and low_inclusive)
+            below_high = high is None or value < high or (value == high and high_inclusive)
+            if above_low and below_high:
+                rows.append(node.key[3])
+            if low is None or value >= low:
+                stack.append(node.left)
+            if high is None or value <= high:
+                stack.append(node.right)
+        return sorted(rows)
+
+    def overlapping(self, key: tuple) -> list[int]:
+        """Rows whose interval intersects the stored interval `key`."""
+        lower, upper = key[0], key[1]
+        rows = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_upper < lower:
+                continue
+            stack.append(node.left)
+            if node.key[0] <= upper:
+                if overlaps(node.key, key):
+                    rows.append(node.key[3])
+                stack.append(node.right)
+        return sorted(rows)
+
+
+INDEX_CLASSES = {index.KIND: index for index in (HashIndex, SortedIndex, IntervalIndex)}
+
+
+def create_index(
+    kind: str, column_name: str, buffer: ColumnBuffer, rows: Iterable[int] | None = None
+) -> Index:
+    if kind not in INDEX_CLASSES:
+        raise ValueError(f"Index kind should be one of {INDEX_KINDS}, got '{kind}'!")
+    if kind == IntervalIndex.KIND and not issubclass(buffer.buffer_type, IntervalBuffer):
+        raise ValueError("Interval index requires a time interval column!")
+    index = INDEX_CLASSES[kind](column_name)
+    index.build(buffer, rows)
+    return index
+
+
+def deferred_index(
+    kind: str,
+    column_name: str,
+    buffer: ColumnBuffer,
+    rows: Callable[[], Iterable[int]] | None = None,
+) -> Index:
+    """Index that is only built from `buffer` once it is first used.
+
+    `rows` is called then for the ids of the rows to index, all by default.
+    """
+    index = INDEX_CLASSES[kind].deferred(
+        lambda index: index.build(buffer, None if rows is None else rows())
+    )
+    index.column_name = column_name
+    return index
+
+
+def merge_rows(row_lists: Iterable[list[int]]) -> list[int]:
+    return sorted(set().union(*row_lists))
@@ -0,0 +1,169 @@
+"""Joins of the rows of two tables on a column of each.
+
+Keys are compared in their stored form (see `ColumnBuffer.raw`), so both
+columns must have the same type. The join method follows the columns:
+
+- "interval": time interval columns are joined on overlap, probing an
+  interval index of the right table, built for the join if it has none;
+- "merge": columns that both have a sorted index are joined by walking the
+  two indexes side by side, which yields the rows ordered by key;
+- "hash": otherwise the keys of the right table are hashed and the left
+  table is scanned once against them, which yields the rows in left order.
+
+Rows are produced in batches of `[*left values, *right values]`; with
+`how="left"`, left rows without a match get `None` for every right value.
+"""
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Iterator, Sequence
+
+from .index import IntervalIndex, SortedIndex, create_index
+
+if TYPE_CHECKING:
+    from .table import Table
+
+
+JOIN_KINDS = ["inner", "left"]
+BATCH_SIZE = 65536
+
+
+def join(
+    left: Table,
+    right: Table,
+    on: str | Sequence[str],
+    how: str = "inner",
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[list[list[Any]]]:
+    """Batches of at most `batch_size` joined rows, see the module docstring."""
+    if how not in JOIN_KINDS:
+        raise ValueError(f"Join kind should be one of {JOIN_KINDS}, got '{how}'!")
+    if batch_size < 1:
+        raise ValueError(f"Batch size should be positive, got {batch_size}!")
+    left, right = left.snapshot(), right.snapshot()
+    left_name, right_name = _key_names(on)
+    method = join_method(left, right, on)
+    pairs = _PAIRS[method](left, right, left_name, right_name, how == "left")
+    return _batches(left, right, pairs, batch_size)
+
+
+def join_method(left: Table, right: Table, on: str | Sequence[str]) -> str:
+    """Which of "hash", "merge" and "interval" joins `left` and `right` on `on`."""
+    left_name, right_name = _key_names(on)
+    left_column = left.get_column_by_name(left_name)
+    right_column = right.get_column_by_name(right_name)
+    if left_column.type != right_column.type:
+        raise ValueError(
+            f"Cannot join column '{left_name}' of type '{left_column.type}' "
+            f"with column '{right_name}' of type '{right_column.type}'!"
+        )
+    if left_column.type == "time interval":
+        return "interval"
+    left_index = left._indexes.get(left_name)
+    right_index = right._indexes.get(right_name)
+    if isinstance(left_index, SortedIndex) and isinstance(right_index, SortedIndex):
+        return "merge"
+    return "hash"
+
+
+def _key_names(on: str | Sequence[str]) -> tuple[str, str]:
+    if isinstance(on, str):
+        return on, on
+    left_name, right_name = on
+    return left_name, right_name
+
+
+def _hash_pairs(
+    left: Table, right: Table, left_name: str, right_name: str, keep_left: bool
+) -> Iterator[tuple[int, int | None]]:
+    right_buffer = right._buffers[right._get_column_position(right_name)]
+    right_ids: dict[Any, list[int]] = {}
+    for ids in right._live_chunks(BATCH_SIZE):
+        for row, key in zip(ids, _scan(right_buffer, ids)):
+            matches = right_ids.get(key)
+            if matches is None:
+                right_ids[key] = [row]
+            else:
+                matches.append(row)
+
+    left_buffer = left._buffers[left._get_column_position(left_name)]
+    missing = [None] if keep_left else []
+    for ids in left._live_chunks(BATCH_SIZE):
+        for row, key in zip(ids, _scan(left_buffer, ids)):
+            for match in right_ids.get(key, missing):
+                yield row, match
+
+
+def _merge_pairs(
+    left: Table, right: Table, left_name: str, right_name: str, keep_left: bool
+) -> Iterator[tuple[int, int | None]]:
+    left_entries = _entries(left, left_name)
+    right_entries = _entries(right, right_name)
+    start = 0
+    for position, (key, row) in enumerate(left_entries):
+        # rows with the same key match the same run of the right entries
+        if not position or left_entries[position - 1][0] != key:
+            while start < len(right_entries) and right_entries[start][0] < key:
+                start += 1
+        stop = start
+        while stop < len(right_entries) and right_entries[stop][0] == key:
+            yield row, right_entries[stop][1]
+            stop += 1
+        if stop == start and keep_left:
+            yield row, None
+
+
+def _entries(table: Table, column_name: str) -> list[tuple[Any, int]]:
+    # an index shared with the table may hold rows appended after the snapshot
+    entries = table._indexes[column_name]._entries
+    return [entry for entry in entries if entry[1] < table._rows_count]
+
+
+def _interval_pairs(
+    left: Table, right: Table, left_name: str, right_name: str, keep_left: bool
+) -> Iterator[tuple[int, int | None]]:
+    index = right._indexes.get(right_name)
+    if not isinstance(index, IntervalIndex):
+        buffer = right._buffers[right._get_column_position(right_name)]
+        index = create_index(IntervalIndex.KIND, right_name, buffer, right._live_ids())
+
+    left_buffer = left._buffers[left._get_column_position(left_name)]
+    for ids in left._live_chunks(BATCH_SIZE):
+        for row, key in zip(ids, _scan(left_buffer, ids)):
+            matches = [match for match in index.overlapping(key) if match < right._rows_count]
+            if not matches and keep_left:
+                yield row, None
+            for match in matches:
+                yield row, match
+
+
+_PAIRS = {"hash": _hash_pairs, "merge": _merge_pairs, "interval": _interval_pairs}
+
+
+def _scan(buffer, rows: Sequence[int]) -> Sequence[Any]:
+    if isinstance(rows, range):
+        return buffer.scan(rows.start, rows.stop)
+    return buffer.take(rows)
+
+
+def _batches(
+    left: Table,
+    right: Table,
+    pairs: Iterator[tuple[int, int | None]],
+    batch_size: int,
+) -> Iterator[list[list[Any]]]:
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            return
+        left_ids = [row for row, _ in batch]
+        right_ids = [row for _, row in batch]
+        columns = [buffer.values_at(left_ids) for buffer in left._buffers]
+        if None in right_ids:
+            columns += [
+                [None if row is None else buffer[row] for row in right_ids]
+                for buffer in right._buffers
+            ]
+        else:
+            columns += [buffer.values_at(right_ids) for buffer in right._buffers]
+        yield [list(values) for values in zip(*columns)]
@@ -0,0 +1,233 @@
+"""Counters and latency histograms of `DBManager` operations.
+
+Metrics are off by default and cost nothing then: `DBManager.enable_metrics`
+wraps the operations of that one manager in timing wrappers, and
+`disable_metrics` removes them again. `Metrics.prometheus` renders what was
+collected in the Prometheus text format, which `write_prometheus` writes to
+a file (e.g. for the textfile collector of the node exporter) or sends to a
+socket.
+
+The "columns" and "indexes" caches count the columns and indexes that
+reads found in memory (hits) or had to fault in from the page file
+(misses), see `models.storage.Deferred`.
+
+Every `profile_every`-th call of an operation can also run under `cProfile`;
+the profile is kept in `Metrics.profiles` and passed to `on_profile`.
+"""
+from __future__ import annotations
+
+import cProfile
+import os
+import socket
+import stat
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+    2.5, 5.0, 10.0,
+)
+PREFIX = "customdb"
+
+
+class Histogram:
+    """Latencies of one operation, counted per bucket."""
+
+    __slots__ = ("counts", "count", "errors", "total")
+
+    def __init__(self) -> None:
+        # the last bucket counts what is above every bound
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float, failed: bool = False) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if failed:
+            self.errors += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """`(upper bound, calls at most that long)` pairs, as Prometheus buckets are."""
+        bounds = [*map(str, LATENCY_BUCKETS), "+Inf"]
+        cumulative, total = [], 0
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class Metrics:
+    """What the operations of one `DBManager` did, see the module docstring."""
+
+    def __init__(
+        self,
+        profile_every: int = 0,
+        on_profile: Callable[[str, cProfile.Profile], Any] | None = None,
+    ) -> None:
+        if profile_every < 0:
+            raise ValueError(f"Profiling interval cannot be negative, got {profile_every}!")
+        self._lock = threading.Lock()
+        self.operations: dict[str, Histogram] = {}
+        self.counters = {
+            "rows_scanned": 0,
+            "rows_returned": 0,
+            "bytes_written": 0,
+            "blocks_written": 0,
+            "blocks_reused": 0,
+        }
+        # cache name: [hits, misses]
+        self.caches: dict[str, list[int]] = {}
+        self.profile_every = profile_every
+        self.on_profile = on_profile
+        self.profiles: dict[str, cProfile.Profile] = {}
+        # operations called by another one are timed but never profiled
+        self._local = threading.local()
+
+    def observe(self, operation: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            histogram = self.operations.get(operation)
+            if histogram is None:
+                histogram = self.operations[operation] = Histogram()
+            histogram.observe(seconds, failed)
+
+    def add(self, counter: str, amount: int) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def cache(self, name: str, hits: int, misses: int) -> None:
+        with self._lock:
+            counts = self.caches.setdefault(name, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+
+    def wrap(self, operation: str, method: Callable) -> Callable:
+        """`method` timed, and profiled when it is its turn, as `operation`"""
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            profile = self._profile_for(operation)
+            start = perf_counter()
+            try:
+                if profile is None:
+                    result = method(*args, **kwargs)
+                else:
+                    result = profile.runcall(method, *args, **kwargs)
+            except BaseException:
+                self.observe(operation, perf_counter() - start, failed=True)
+                raise
+            finally:
+                if profile is not None:
+                    self._local.profiling = False
+                    self._profiled(operation, profile)
+            self.observe(operation, perf_counter() - start)
+            return result
+
+        return wrapper
+
+    def _profile_for(self, operation: str) -> cProfile.Profile | None:
+        if not self.profile_every or getattr(self._local, "profiling", False):
+            return None
+        histogram = self.operations.get(operation)
+        if (histogram.count if histogram is not None else 0) % self.profile_every:
+            return None
+        self._local.profiling = True
+        return cProfile.Profile()
+
+    def _profiled(self, operation: str, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self.profiles[operation] = profile
+        if self.on_profile is not None:
+            self.on_profile(operation, profile)
+
+    def stats(self) -> dict[str, Any]:
+        """Everything collected so far, as plain data"""
+        with self._lock:
+            return {
+                "operations": {
+                    name: {
+                        "count": histogram.count,
+                        "errors": histogram.errors,
+                        "seconds": histogram.total,
+                        "mean_seconds": histogram.total / histogram.count,
+                        "latency_buckets": dict(histogram.cumulative()),
+                    }
+                    for name, histogram in sorted(self.operations.items())
+                },
+                **self.counters,
+                "caches": {
+                    name: {
+                        "hits": hits,
+                        "misses": misses,
+                        "hit_rate": hits / (hits + misses) if hits + misses else None,
+                    }
+                    for name, (hits, misses) in sorted(self.caches.items())
+                },
+            }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        stats = self.stats()
+        lines = [
+            f"# HELP {PREFIX}_operation_seconds Latency of DBManager operations.",
+            f"# TYPE {PREFIX}_operation_seconds histogram",
+        ]
+        for name, operation in stats["operations"].items():
+            label = f'operation="{name}"'
+            for bound, count in operation["latency_buckets"].items():
+                lines.append(f'{PREFIX}_operation_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"{PREFIX}_operation_seconds_sum{{{label}}} {operation['seconds']}")
+            lines.append(f"{PREFIX}_operation_seconds_count{{{label}}} {operation['count']}")
+        lines += [
+            f"# HELP {PREFIX}_operation_errors_total Operations that raised.",
+            f"# TYPE {PREFIX}_operation_errors_total counter",
+        ]
+        for name, operation in stats["operations"].items():
+            label = f'operation="{name}"'
+            lines.append(f"{PREFIX}_operation_errors_total{{{label}}} {operation['errors']}")
+        for counter, text in (
+            ("rows_scanned", "Rows read by selects."),
+            ("rows_returned", "Rows returned by selects, aggregates and joins."),
+            ("bytes_written", "Bytes written by saves."),
+            ("blocks_written", "Blocks of streams written by saves."),
+            ("blocks_reused", "Blocks of streams that saves found unchanged on disk."),
+        ):
+            lines += [
+                f"# HELP {PREFIX}_{counter}_total {text}",
+                f"# TYPE {PREFIX}_{counter}_total counter",
+                f"{PREFIX}_{counter}_total {stats[counter]}",
+            ]
+        for outcome in ("hits", "misses"):
+            lines += [
+                f"# HELP {PREFIX}_cache_{outcome}_total Cache {outcome}, per cache.",
+                f"# TYPE {PREFIX}_cache_{outcome}_total counter",
+            ]
+            for name, cache in stats["caches"].items():
+                lines.append(f'{PREFIX}_cache_{outcome}_total{{cache="{name}"}} {cache[outcome]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, target: str | tuple[str, int]) -> None:
+        """Write `prometheus` to a file, a Unix socket or a `(host, port)` TCP socket
+
+        A file is replaced at once, so a collector never reads half of it.
+        """
+        text = self.prometheus().encode()
+        if isinstance(target, tuple):
+            with socket.create_connection(target) as connection:
+                connection.sendall(text)
+            return
+        if os.path.exists(target) and stat.S_ISSOCK(os.stat(target).st_mode):
+            with socket.socket(socket.AF_UNIX) as connection:
+                connection.connect(target)
+                connection.sendall(text)
+            return
+        temporary = f"{target}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(text)
+        os.replace(temporary, target)
@@ -0,0 +1,454 @@
+"""Native on-disk format of a database.
+
+A page file is a sequence of fixed-size pages::
+
+    page 0      header: magic, version, page size, byte order, location and
+                size of the catalog, page count and a checksum of the header
+    page 1...   column data and catalog pages
+
+Every buffer is persisted as a list of binary streams (see
+`ColumnBuffer.streams`), and every stream is cut into page-sized blocks.
+The tombstones of deleted rows are one more stream of their table.
+The catalog is a zlib-compressed JSON document describing the tables,
+their columns and indexes, where the blocks of each stream live together
+with their CRC32, and which pages are free.
+
+Saving is copy-on-write: a block whose checksum did not change keeps its
+page, a changed block is written to a free page, and the header is
+switched to the new catalog only after all of it reached the disk. A crash
+during a save therefore leaves the previous version intact. Opening reads
+only the header and the catalog; column buffers, tombstones and indexes are
+faulted in when they are first used.
+
+Streams can be compressed with a codec (see `models.compression`). Their
+blocks then span several pages of raw data, and every block is compressed
+on its own and stored in as few pages as it needs, so a save still writes
+only the blocks that changed. Columns are still loaded whole: the first
+read of a column, even of a single row, decompresses every block of its
+streams. The codec of the last save is kept in the catalog and used by the
+next saves to the file.
+
+A file can also be opened read-only through `mmap`. Fixed-width columns
+whose pages are contiguous and uncompressed then use views of the mapping as their storage,
+so several reader processes share one copy in the page cache. Incremental
+saves may scatter the pages of a column; saving to a new file lays every
+column out contiguously again.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from functools import cache, partial
+from itertools import compress
+from typing import Any, Callable, Iterator, Sequence
+from weakref import WeakKeyDictionary
+
+from .column import COLUMN_CLASSES
+from .compression import DELTA_TYPECODE, check_codec, decode_block, encode_block
+from .database import Database
+from .index import deferred_index
+from .storage import ColumnBuffer, PaddedBuffer
+from .table import LIVE_MASK, Table
+
+
+MAGIC = b"CUSTOMDB"
+VERSION = 1
+PAGE_SIZE = 8192
+HEADER = struct.Struct("<8sIIBQQQQ")
+HEADER_CHECKSUM = struct.Struct("<I")
+# pages of raw data in a block of a compressed stream
+COMPRESSED_BLOCK_PAGES = 8
+# column types whose sorted blocks are delta encoded before compression
+DELTA_COLUMN_TYPES = {"int", "time"}
+
+
+def is_page_file(path: str) -> bool:
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class PageFile:
+    def __init__(self, path: str, page_size: int = PAGE_SIZE, codec: str | None = None) -> None:
+        check_codec(codec)
+        self.path = os.path.abspath(path)
+        self.page_size = page_size
+        # compresses the streams written by saves, None for none
+        self.codec = codec
+        self._byteorder = sys.byteorder
+        self._catalog: dict[str, Any] = {"free": []}
+        self._catalog_pages: list[int] = []
+        self._page_count = 1
+        # stream records of the buffers as they are stored in this file
+        self._stored: WeakKeyDictionary[ColumnBuffer, list[dict]] = WeakKeyDictionary()
+        self._file = None
+        self._mmap: mmap.mmap | None = None
+        # written by saves, and blocks of streams that a save found unchanged
+        self.bytes_written = 0
+        self.blocks_reused = 0
+        self.blocks_written = 0
+
+    @property
+    def lsn(self) -> int:
+        """Last write-ahead log record included in the saved data."""
+        return self._catalog.get("lsn", 0)
+
+    @property
+    def read_only(self) -> bool:
+        return self._mmap is not None
+
+    @classmethod
+    def create(
+        cls, path: str, page_size: int = PAGE_SIZE, codec: str | None = None
+    ) -> PageFile:
+        page_file = cls(path, page_size, codec)
+        page_file._file = open(path, "w+b")
+        return page_file
+
+    @classmethod
+    def open(cls, path: str, use_mmap: bool = False) -> PageFile:
+        """Open an existing file, read-only and memory-mapped if `use_mmap`."""
+        page_file = cls(path)
+        page_file._file = open(path, "rb" if use_mmap else "r+b")
+        if use_mmap:
+            page_file._mmap = mmap.mmap(
+                page_file._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        page_file._read_header()
+        return page_file
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # columns still view the mapping, it goes away with them
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_header(self) -> None:
+        self._file.seek(0)
+        data = self._file.read(HEADER.size + HEADER_CHECKSUM.size)
+        if len(data) < HEADER.size + HEADER_CHECKSUM.size:
+            raise ValueError(f"File '{self.path}' is not a database file!")
+
+        fields = data[:HEADER.size]
+        (checksum,) = HEADER_CHECKSUM.unpack(data[HEADER.size:])
+        (
+            magic,
+            version,
+            page_size,
+            big_endian,
+            catalog_page,
+            catalog_length,
+            catalog_page_count,
+            page_count,
+        ) = HEADER.unpack(fields)
+        if magic != MAGIC or zlib.crc32(fields) != checksum:
+            raise ValueError(f"File '{self.path}' is not a database file!")
+        if version != VERSION:
+            raise ValueError(f"Unsupported database file version {version}!")
+
+        self.page_size = page_size
+        self._byteorder = "big" if big_endian else "little"
+        self._page_count = page_count
+        self._file.seek(catalog_page * page_size)
+        self._catalog = json.loads(zlib.decompress(self._file.read(catalog_length)))
+        self.codec = self._catalog.get("codec")
+        self._catalog_pages = list(range(catalog_page, catalog_page + catalog_page_count))
+
+    def _write_header(
+        self, catalog_page: int, catalog_length: int, catalog_page_count: int
+    ) -> None:
+        fields = HEADER.pack(
+            MAGIC,
+            VERSION,
+            self.page_size,
+            self._byteorder == "big",
+            catalog_page,
+            catalog_length,
+            catalog_page_count,
+            self._page_count,
+        )
+        self._file.seek(0)
+        self._file.write(fields + HEADER_CHECKSUM.pack(zlib.crc32(fields)))
+        self.bytes_written += len(fields) + HEADER_CHECKSUM.size
+
+    def _read_pages(self, page: int, count: int) -> bytes:
+        self._file.seek(page * self.page_size)
+        return self._file.read(count * self.page_size)
+
+    def _write_pages(self, page: int, data: bytes) -> None:
+        self._file.seek(page * self.page_size)
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    # loading
+
+    def load(self) -> Database:
+        """Database described by the catalog, with all data left on disk."""
+        db = Database(self._catalog["name"])
+        for table_record in self._catalog["tables"]:
+            db.tables[table_record["name"]] = self._load_table(table_record)
+        return db
+
+    def _load_table(self, record: dict) -> Table:
+        table = Table(record["name"])
+        table._rows_count = record["rows"]
+        table._read_only = self.read_only
+        stream = record.get("tombstones")
+        # read once, for the table and the indexes, whichever needs them first
+        tombstones = None if stream is None else cache(partial(self._read_stream, stream))
+        if stream is not None and "deleted" in record:
+            table._defer_tombstones(tombstones, record["deleted"])
+        elif stream is not None:
+            # saved before the catalog counted the deleted rows
+            table._tombstones = bytearray(tombstones())
+            table._deleted = table._tombstones.count(1)
+        for column_record in record["columns"]:
+            column_class = COLUMN_CLASSES[column_record["type"]]
+            options = column_record.get("options", {})
+            buffer_class = type(column_class(column_record["name"], **options).create_buffer())
+            buffer = buffer_class.deferred(self._stream_loader(column_record["streams"]))
+            default = buffer.decode(_from_json(column_record["default"]))
+            column = column_class(column_record["name"], default, **options)
+            self._stored[buffer] = column_record["streams"]
+            if column_record.get("prefix"):
+                buffer = PaddedBuffer(buffer, column_record["prefix"], default)
+            table._schema.add(column)
+            table._buffers.append(buffer)
+        for column_name, kind in record["indexes"].items():
+            buffer = table._buffers[table._get_column_position(column_name)]
+            table._indexes[column_name] = deferred_index(
+                kind, column_name, buffer, partial(_live_ids, record["rows"], tombstones)
+            )
+        return table
+
+    def _stream_loader(self, records: list[dict]):
+        def load(buffer: ColumnBuffer) -> None:
+            buffer.__init__()
+            buffer.use_typecodes([record["typecode"] for record in records])
+            if self._mmap is not None:
+                views = [self._map_stream(record) for record in records]
+                if None not in views and buffer.map_streams(views):
+                    return
+            buffer.load_streams([self._read_stream(record) for record in records])
+
+        return load
+
+    def _map_stream(self, record: dict) -> memoryview | None:
+        """View of a stream inside the mapping, if it is stored contiguously."""
+        if self._byteorder != sys.byteorder or record.get("codec") is not None:
+            return None
+        blocks = record["blocks"]
+        for (page, count, _), (next_page, _, _) in zip(blocks, blocks[1:]):
+            if page + count != next_page:
+                return None
+        start = blocks[0][0] * self.page_size if blocks else 0
+        return memoryview(self._mmap)[start:start + record["length"]]
+
+    def _read_stream(self, record: dict) -> bytes:
+        if record.get("codec") is not None:
+            swap = self._byteorder != sys.byteorder
+            return b"".join(
+                decode_block(self._read_pages(page, count)[:size], steps, record["typecode"], swap)
+                for page, count, _, size, steps in record["blocks"]
+            )
+        data = b"".join(
+            self._read_pages(page, count) for page, count, _ in record["blocks"]
+        )[:record["length"]]
+        if self._byteorder != sys.byteorder and record["typecode"] != "B":
+            values = array(record["typecode"], data)
+            values.byteswap()
+            data = values.tobytes()
+        return data
+
+    # saving
+
+    def save(self, db: Database, lsn: int = 0) -> None:
+        """Write the changed blocks of `db` and switch to its new catalog."""
+        if self.read_only:
+            raise ValueError(f"File '{self.path}' is opened read-only!")
+        # only pages that were free before this save are reused, so the
+        # previous catalog stays valid until the header is switched
+        self._free = sorted(self._catalog["free"])
+        while self._free and self._free[-1] == self._page_count - 1:
+            self._free.pop()
+            self._page_count -= 1
+
+        catalog = {
+            "name": db.name,
+            "lsn": lsn,
+            "codec": self.codec,
+            "tables": [self._save_table(table) for table in db.tables.values()],
+        }
+        used = _used_pages(catalog)
+        released = _used_pages(self._catalog) | set(self._catalog_pages)
+
+        catalog_pages: list[int] = []
+        while True:
+            catalog["free"] = sorted((set(self._free) | released) - used)
+            data = zlib.compress(json.dumps(catalog).encode())
+            pages_needed = -(-len(data) // self.page_size)
+            if pages_needed <= len(catalog_pages):
+                break
+            self._free = sorted(self._free + catalog_pages)
+            first_page = self._allocate(pages_needed)
+            catalog_pages = list(range(first_page, first_page + pages_needed))
+
+        self._write_pages(catalog_pages[0], data)
+        self._file.truncate(self._page_count * self.page_size)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self._write_header(catalog_pages[0], len(data), len(catalog_pages))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._catalog = catalog
+        self._catalog_pages = catalog_pages
+
+    def _save_table(self, table: Table) -> dict:
+        previous_table = next(
+            (
+                record
+                for record in self._catalog.get("tables", ())
+                if record["name"] == table.name
+            ),
+            {},
+        )
+        previous_columns = {
+            (record["name"], record["type"]): record["streams"]
+            for record in previous_table.get("columns", ())
+        }
+        columns = []
+        for column, buffer in zip(table._columns, table._buffers):
+            prefix = 0
+            if isinstance(buffer, PaddedBuffer):
+                # the defaults of the rows before the column stay unwritten
+                prefix, buffer = buffer.prefix, buffer.inner
+            stored = self._stored.get(buffer)
+            # a buffer saved with another codec is recompressed with this one
+            if (
+                stored is not None
+                and not buffer.is_loaded
+                and all(record.get("codec") == self.codec for record in stored)
+            ):
+                self.blocks_reused += sum(len(record["blocks"]) for record in stored)
+            else:
+                if stored is None:
+                    # a buffer copied under a snapshot (see `Table._own`) is
+                    # compared with the blocks its column was last saved in
+                    stored = previous_columns.get((column.name, column.type))
+                delta = column.type in DELTA_COLUMN_TYPES
+                stored = [
+                    self._save_stream(stream, previous, delta)
+                    for stream, previous in zip(
+                        buffer.streams(), stored or [None] * len(buffer.streams())
+                    )
+                ]
+                self._stored[buffer] = stored
+            columns.append(
+                {
+                    "type": column.type,
+                    "name": column.name,
+                    "default": _to_json(buffer.encode(column.default)),
+                    "options": column.options(),
+                    "streams": stored,
+                    "prefix": prefix,
+                }
+            )
+        tombstones = None
+        if table._deleted:
+            tombstones = self._save_stream(table._tombstones, previous_table.get("tombstones"))
+        return {
+            "name": table.name,
+            "rows": table._rows_count,
+            "deleted": table._deleted,
+            "columns": columns,
+            "indexes": table.indexes,
+            "tombstones": tombstones,
+        }
+
+    def _save_stream(
+        self, stream: array | bytearray, previous: dict | None, delta: bool = False
+    ) -> dict:
+        """Record of `stream` saved in blocks, delta encoding sorted blocks if `delta`"""
+        data = memoryview(stream).cast("B")
+        typecode = stream.typecode if isinstance(stream, array) else "B"
+        codec = self.codec
+        previous_blocks = []
+        # blocks of another codec hold other ranges of the stream
+        if previous is not None and previous.get("codec") == codec:
+            previous_blocks = previous["blocks"]
+        block_size = self.page_size * (COMPRESSED_BLOCK_PAGES if codec else 1)
+        blocks = []
+        for number, offset in enumerate(range(0, len(data), block_size)):
+            block = data[offset:offset + block_size]
+            checksum = zlib.crc32(block)
+            if number < len(previous_blocks) and previous_blocks[number][2] == checksum:
+                blocks.append(previous_blocks[number])
+                self.blocks_reused += 1
+                continue
+            self.blocks_written += 1
+            if codec is None:
+                page = self._allocate()
+                self._write_pages(page, block)
+                blocks.append([page, 1, checksum])
+                continue
+            # a compressed block also records its size and how it was encoded
+            encoded, steps = encode_block(block, codec, delta and typecode == DELTA_TYPECODE)
+            count = -(-len(encoded) // self.page_size)
+            page = self._allocate(count)
+            self._write_pages(page, encoded)
+            blocks.append([page, count, checksum, len(encoded), steps])
+        return {"typecode": typecode, "length": len(data), "blocks": blocks, "codec": codec}
+
+    def _allocate(self, count: int = 1) -> int:
+        """First page of a run of `count` free pages."""
+        free = self._free
+        for position in range(len(free) - count + 1):
+            if free[position + count - 1] - free[position] == count - 1:
+                first_page = free[position]
+                del free[position:position + count]
+                return first_page
+        self._page_count += count
+        return self._page_count - count
+
+
+def _live_ids(rows: int, tombstones: Callable[[], bytes] | None) -> Sequence[int]:
+    """Ids of the rows of a saved table that were live when it was saved."""
+    if tombstones is None:
+        return range(rows)
+    mask = tombstones()[:rows].translate(LIVE_MASK)
+    return list(compress(range(rows), mask + b"\1" * (rows - len(mask))))
+
+
+def _used_pages(catalog: dict) -> set[int]:
+    return {
+        page + offset
+        for table in catalog.get("tables", ())
+        for stream in _table_streams(table)
+        for page, count, *_ in stream["blocks"]
+        for offset in range(count)
+    }
+
+
+def _table_streams(table: dict) -> Iterator[dict]:
+    for column in table["columns"]:
+        yield from column["streams"]
+    if table.get("tombstones") is not None:
+        yield table["tombstones"]
+
+
+def _to_json(value: Any) -> Any:
+    return list(value) if isinstance(value, tuple) else value
+
+
+def _from_json(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
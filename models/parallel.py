@@ -0,0 +1,169 @@
+"""Scans of a table fanned out over a pool of worker processes.
+
+The columns a scan reads are copied into shared memory blocks
+(`multiprocessing.shared_memory`), one per buffer stream (see
+`ColumnBuffer.streams`), and the workers attach to the blocks by name, so
+no buffer is pickled to them. Fixed-width buffers are read from the blocks
+in place, the others are loaded from them. Every worker scans a contiguous
+partition of the row ids and the partial results come back in partition
+order.
+
+Pools are started on first use and reused by later scans with the same
+parallelism.
+"""
+from __future__ import annotations
+
+import atexit
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+from .storage import typecode
+
+if TYPE_CHECKING:
+    from .column import Column
+    from .table import Table
+
+
+_EXECUTORS: dict[int, ProcessPoolExecutor] = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def check_parallelism(parallelism: int) -> None:
+    if not isinstance(parallelism, int) or parallelism < 1:
+        raise ValueError(f"Parallelism should be a positive integer, got {parallelism!r}!")
+
+
+def executor(parallelism: int) -> ProcessPoolExecutor:
+    with _EXECUTORS_LOCK:
+        pool = _EXECUTORS.get(parallelism)
+        if pool is None:
+            pool = _EXECUTORS[parallelism] = ProcessPoolExecutor(parallelism)
+        return pool
+
+
+@atexit.register
+def shutdown() -> None:
+    """Stop the worker processes of every pool."""
+    with _EXECUTORS_LOCK:
+        for pool in _EXECUTORS.values():
+            pool.shutdown(cancel_futures=True)
+        _EXECUTORS.clear()
+
+
+def partitions(rows_count: int, parallelism: int) -> list[tuple[int, int]]:
+    """`(start, stop)` ranges of ids splitting `rows_count` ids into even parts."""
+    size = max(-(-rows_count // parallelism), 1)
+    return [(start, min(start + size, rows_count)) for start in range(0, rows_count, size)]
+
+
+def map_partitions(
+    table: Table,
+    column_names: Iterable[str],
+    function: Callable[..., Any],
+    args: tuple,
+    parallelism: int,
+) -> list[Any]:
+    """Results of `function(table, *args, start, stop)` for every partition
+
+    `function` runs in the worker processes, on a read-only table holding
+    only `column_names`, so it has to be a module-level function.
+    """
+    with SharedTable(table, column_names) as shared:
+        pool = executor(parallelism)
+        futures = [
+            pool.submit(_run, shared.spec, function, (*args, start, stop))
+            for start, stop in partitions(table._rows_count, parallelism)
+        ]
+        return [future.result() for future in futures]
+
+
+class SharedTable:
+    """Columns of a table copied into shared memory blocks, until closed.
+
+    `spec` is what a worker needs to attach to the blocks: the block names,
+    sizes and typecodes, and the column definitions.
+    """
+
+    def __init__(self, table: Table, column_names: Iterable[str]) -> None:
+        self._blocks: list[shared_memory.SharedMemory] = []
+        try:
+            self.spec = {
+                "name": table.name,
+                "rows": table._rows_count,
+                "tombstones": self._share(table._tombstones[:table._rows_count]),
+                "columns": [
+                    self._share_column(table, name) for name in dict.fromkeys(column_names)
+                ],
+            }
+        except BaseException:
+            self.close()
+            raise
+
+    def _share_column(
+        self, table: Table, name: str
+    ) -> tuple[Column, list[tuple[str, int, str]]]:
+        buffer = table._buffers[table._get_column_position(name)]
+        return table.get_column_by_name(name), [self._share(stream) for stream in buffer.streams()]
+
+    def _share(self, stream) -> tuple[str, int, str]:
+        # a copy, as a view would keep the arrays that a snapshot shares
+        # with the live table from growing until the block is filled
+        data = stream.tobytes() if isinstance(stream, array) else bytes(stream)
+        # blocks cannot be empty
+        block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        self._blocks.append(block)
+        block.buf[:len(data)] = data
+        code = typecode(stream) if isinstance(stream, (array, memoryview)) else "B"
+        return block.name, len(data), code
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> SharedTable:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _run(spec: dict, function: Callable[..., Any], args: tuple) -> Any:
+    blocks: list[shared_memory.SharedMemory] = []
+    try:
+        return function(_attach(spec, blocks), *args)
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # still viewed by a traceback, closed when it is collected
+
+
+def _attach(spec: dict, blocks: list[shared_memory.SharedMemory]) -> Table:
+    from .table import Table
+
+    def view(record: tuple[str, int, str]) -> memoryview:
+        name, size, _ = record
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        return block.buf[:size]
+
+    table = Table(spec["name"])
+    table._rows_count = spec["rows"]
+    table._read_only = True
+    table._tombstones = bytearray(view(spec["tombstones"]))
+    table._deleted = table._tombstones.count(1)
+    for column, records in spec["columns"]:
+        buffer = column.create_buffer()
+        buffer.use_typecodes([code for _, _, code in records])
+        streams = [view(record) for record in records]
+        if not buffer.map_streams(streams):
+            buffer.load_streams(streams)
+        table._schema.add(column)
+        table._buffers.append(buffer)
+    return table
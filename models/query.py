@@ -0,0 +1,550 @@
+"""Predicates and lazy result sets for `Table.select`.
+
+Predicates are built from `col` references and combined with `&`, `|` and
+`~`. Python binds `&` tighter than comparisons, so comparisons have to be
+parenthesized::
+
+    table.select(where=(col("amount") > 10) & col("name").startswith("a"))
+
+A predicate is compiled once against the table schema and then evaluated
+over column chunks, with NumPy when it is installed and with plain Python
+otherwise.
+"""
+from __future__ import annotations
+
+import operator
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+from . import parallel
+from .index import IntervalIndex, SortedIndex, merge_rows, overlaps
+from .storage import DictionaryBuffer, IntervalBuffer, typecode
+
+if TYPE_CHECKING:
+    from .table import Table
+
+
+CHUNK_SIZE = 65536
+
+Mask = Sequence[bool]
+Kernel = Callable[["Batch"], Mask]
+
+
+class Batch:
+    """A selection of table rows whose column data is loaded on demand.
+
+    `rows` is either a contiguous `range`, which is read with cheap slices,
+    or a sorted list of candidate positions produced by an index.
+    """
+
+    def __init__(self, table: Table, rows: range | list[int]) -> None:
+        self.table = table
+        self.rows = rows
+        self._scans: dict[int, Sequence[Any]] = {}
+        self._values: dict[int, list[Any]] = {}
+        self._codes: dict[int, Sequence[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def scan(self, position: int) -> Sequence[Any]:
+        if position not in self._scans:
+            buffer = self.table._buffers[position]
+            if isinstance(self.rows, range):
+                scan = buffer.scan(self.rows.start, self.rows.stop)
+            else:
+                scan = buffer.take(self.rows)
+            self._scans[position] = scan
+        return self._scans[position]
+
+    def codes(self, position: int) -> Sequence[int] | None:
+        """Dictionary codes of a column, None if it is not dictionary-encoded."""
+        buffer = self.table._buffers[position]
+        if not isinstance(buffer, DictionaryBuffer):
+            return None
+        if position not in self._codes:
+            if isinstance(self.rows, range):
+                codes = buffer.codes(self.rows.start, self.rows.stop)
+            else:
+                codes = buffer.take_codes(self.rows)
+            self._codes[position] = codes
+        return self._codes[position]
+
+    def values(self, position: int) -> list[Any]:
+        if position not in self._values:
+            buffer = self.table._buffers[position]
+            if isinstance(self.rows, range):
+                values = buffer.values(self.rows.start, self.rows.stop)
+            else:
+                values = buffer.values_at(self.rows)
+            self._values[position] = values
+        return self._values[position]
+
+    def positions(self, mask: Mask) -> list[int]:
+        if np is not None and isinstance(mask, np.ndarray):
+            return np.asarray(self.rows)[mask].tolist()
+        return list(compress(self.rows, mask))
+
+
+def _as_numpy(values: Sequence[Any]):
+    """NumPy view of a typed array or memoryview, `None` for other sequences."""
+    if np is None or not isinstance(values, (array, memoryview)):
+        return None
+    return np.frombuffer(values, dtype=typecode(values))
+
+
+def _combine(op: Callable, left: Mask, right: Mask) -> Mask:
+    if np is not None and (
+        isinstance(left, np.ndarray) or isinstance(right, np.ndarray)
+    ):
+        return op(np.asarray(left, dtype=bool), np.asarray(right, dtype=bool))
+    return list(map(op, left, right))
+
+
+class Expr:
+    def __and__(self, other: Expr) -> Expr:
+        return And(self, other)
+
+    def __or__(self, other: Expr) -> Expr:
+        return Or(self, other)
+
+    def __invert__(self) -> Expr:
+        return Not(self)
+
+    def column_names(self) -> set[str]:
+        raise NotImplementedError
+
+    def compile(self, table: Table) -> Kernel:
+        """Resolve columns and literals against `table` once."""
+        raise NotImplementedError
+
+
+class And(Expr):
+    def __init__(self, left: Expr, right: Expr) -> None:
+        self.left = left
+        self.right = right
+
+    def column_names(self) -> set[str]:
+        return self.left.column_names() | self.right.column_names()
+
+    def compile(self, table: Table) -> Kernel:
+        left, right = self.left.compile(table), self.right.compile(table)
+        return lambda batch: _combine(operator.and_, left(batch), right(batch))
+
+
+class Or(And):
+    def compile(self, table: Table) -> Kernel:
+        left, right = self.left.compile(table), self.right.compile(table)
+        return lambda batch: _combine(operator.or_, left(batch), right(batch))
+
+
+class Not(Expr):
+    def __init__(self, operand: Expr) -> None:
+        self.operand = operand
+
+    def column_names(self) -> set[str]:
+        return self.operand.column_names()
+
+    def compile(self, table: Table) -> Kernel:
+        operand = self.operand.compile(table)
+
+        def kernel(batch: Batch) -> Mask:
+            mask = operand(batch)
+            if np is not None and isinstance(mask, np.ndarray):
+                return ~mask
+            return [not matched for matched in mask]
+
+        return kernel
+
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class Compare(Expr):
+    """`column <op> literal`, evaluated on the stored representation."""
+
+    def __init__(self, column: str, op: str, value: Any) -> None:
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def column_names(self) -> set[str]:
+        return {self.column}
+
+    def compile(self, table: Table) -> Kernel:
+        position = table._get_column_position(self.column)
+        literal = table._buffers[position].encode(self.value)
+        compare = COMPARISONS[self.op]
+
+        def kernel(batch: Batch) -> Mask:
+            if self.op in ("==", "!="):
+                codes = batch.codes(position)
+                if codes is not None:
+                    return _compare_codes(compare, codes, batch.table._buffers[position], literal)
+            values = batch.scan(position)
+            vector = _as_numpy(values)
+            if vector is not None:
+                return compare(vector, literal)
+            return list(map(compare, values, repeat(literal)))
+
+        return kernel
+
+
+def _compare_codes(
+    compare: Callable, codes: Sequence[int], buffer: DictionaryBuffer, literal: str
+) -> Mask:
+    """`==` or `!=` of dictionary-encoded values with `literal`, on their codes"""
+    code = buffer.code(literal)
+    if code is None:
+        # no row holds the literal
+        matched = compare is operator.ne
+        if np is not None:
+            return np.full(len(codes), matched)
+        return [matched] * len(codes)
+    vector = _as_numpy(codes)
+    if vector is not None:
+        return compare(vector, code)
+    return list(map(compare, codes, repeat(code)))
+
+
+class IsIn(Expr):
+    def __init__(self, column: str, values: Iterable[Any]) -> None:
+        self.column = column
+        self.values = list(values)
+
+    def column_names(self) -> set[str]:
+        return {self.column}
+
+    def compile(self, table: Table) -> Kernel:
+        position = table._get_column_position(self.column)
+        buffer = table._buffers[position]
+        literals = {buffer.encode(value) for value in self.values}
+
+        def kernel(batch: Batch) -> Mask:
+            codes = batch.codes(position)
+            if codes is not None:
+                dictionary = batch.table._buffers[position]
+                literal_codes = {dictionary.code(literal) for literal in literals} - {None}
+                vector = _as_numpy(codes)
+                if vector is not None:
+                    return np.isin(vector, list(literal_codes))
+                return [code in literal_codes for code in codes]
+            values = batch.scan(position)
+            vector = _as_numpy(values)
+            if vector is not None:
+                return np.isin(vector, list(literals))
+            return [value in literals for value in values]
+
+        return kernel
+
+
+class StringTest(Expr):
+    """A `str` method such as `startswith` applied to every value."""
+
+    def __init__(self, column: str, method: str, argument: str) -> None:
+        self.column = column
+        self.method = method
+        self.argument = argument
+
+    def column_names(self) -> set[str]:
+        return {self.column}
+
+    def compile(self, table: Table) -> Kernel:
+        position = table._get_column_position(self.column)
+        if table.get_column_by_name(self.column).type not in ("string", "char"):
+            raise TypeError(f"Column '{self.column}' does not contain strings!")
+        test = getattr(str, self.method)
+        argument = self.argument
+        return lambda batch: [test(value, argument) for value in batch.values(position)]
+
+
+class Overlaps(Expr):
+    """Interval column values that intersect a given interval."""
+
+    def __init__(self, column: str, value: Any) -> None:
+        self.column = column
+        self.value = value
+
+    def column_names(self) -> set[str]:
+        return {self.column}
+
+    def compile(self, table: Table) -> Kernel:
+        position = table._get_column_position(self.column)
+        if table.get_column_by_name(self.column).type != "time interval":
+            raise TypeError(f"Column '{self.column}' does not contain intervals!")
+        key = table._buffers[position].encode(self.value)
+
+        def kernel(batch: Batch) -> Mask:
+            buffer = batch.table._buffers[position]
+            if np is not None and type(buffer) is IntervalBuffer and isinstance(batch.rows, range):
+                return _overlaps_vector(buffer.bounds(batch.rows.start, batch.rows.stop), key)
+            return [overlaps(value, key) for value in batch.scan(position)]
+
+        return kernel
+
+
+def _overlaps_vector(bounds: tuple[array, array, bytearray], key: tuple) -> Mask:
+    """`overlaps` of the stored intervals given by their bounds with `key`, in NumPy"""
+    lowers, uppers = _as_numpy(bounds[0]), _as_numpy(bounds[1])
+    flags = np.frombuffer(bounds[2], dtype=np.uint8)
+    lower_closed, upper_closed = IntervalBuffer.LOWER_CLOSED, IntervalBuffer.UPPER_CLOSED
+    key_lower, key_upper, key_flags = key
+    if key_lower == key_upper and key_flags != lower_closed | upper_closed:
+        return np.zeros(len(lowers), dtype=bool)  # empty interval
+    # each interval must start before the other ends, or where it ends if
+    # both of the touching bounds are closed
+    mask = (lowers < key_upper) | (
+        (lowers == key_upper) & bool(key_flags & upper_closed) & ((flags & lower_closed) != 0)
+    )
+    mask &= (uppers > key_lower) | (
+        (uppers == key_lower) & bool(key_flags & lower_closed) & ((flags & upper_closed) != 0)
+    )
+    mask &= (lowers != uppers) | (flags == lower_closed | upper_closed)
+    return mask
+
+
+class Col:
+    """Reference to a column inside a predicate."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    __hash__ = None
+
+    def __eq__(self, value: Any) -> Expr:
+        return Compare(self.name, "==", value)
+
+    def __ne__(self, value: Any) -> Expr:
+        return Compare(self.name, "!=", value)
+
+    def __lt__(self, value: Any) -> Expr:
+        return Compare(self.name, "<", value)
+
+    def __le__(self, value: Any) -> Expr:
+        return Compare(self.name, "<=", value)
+
+    def __gt__(self, value: Any) -> Expr:
+        return Compare(self.name, ">", value)
+
+    def __ge__(self, value: Any) -> Expr:
+        return Compare(self.name, ">=", value)
+
+    def between(self, low: Any, high: Any) -> Expr:
+        return (self >= low) & (self <= high)
+
+    def isin(self, values: Iterable[Any]) -> Expr:
+        return IsIn(self.name, values)
+
+    def startswith(self, prefix: str) -> Expr:
+        return StringTest(self.name, "startswith", prefix)
+
+    def endswith(self, suffix: str) -> Expr:
+        return StringTest(self.name, "endswith", suffix)
+
+    def contains(self, substring: str) -> Expr:
+        return StringTest(self.name, "__contains__", substring)
+
+    def overlaps(self, value: Any) -> Expr:
+        return Overlaps(self.name, value)
+
+
+def col(name: str) -> Col:
+    return Col(name)
+
+
+def _conjuncts(expr: Expr) -> list[Expr]:
+    if type(expr) is And:
+        return _conjuncts(expr.left) + _conjuncts(expr.right)
+    return [expr]
+
+
+def index_candidates(table: Table, where: Expr) -> list[int] | None:
+    """Rows that may match `where` according to the table indexes.
+
+    Returns `None` when no conjunct of `where` can be answered by an index,
+    in which case the whole table has to be scanned.
+    """
+    candidates = _index_candidates(table, where)
+    if candidates and candidates[-1] >= table._rows_count:
+        # an index built after a snapshot was taken also covers later rows
+        candidates = [row for row in candidates if row < table._rows_count]
+    return candidates
+
+
+def _index_candidates(table: Table, where: Expr) -> list[int] | None:
+    bounds: dict[str, list] = {}
+    for conjunct in _conjuncts(where):
+        if not isinstance(conjunct, (Compare, IsIn, Overlaps)):
+            continue
+        index = table._indexes.get(conjunct.column)
+        if index is None:
+            continue
+        buffer = table._buffers[table._get_column_position(conjunct.column)]
+
+        if isinstance(conjunct, Overlaps):
+            if isinstance(index, IntervalIndex):
+                return index.overlapping(buffer.encode(conjunct.value))
+            continue
+
+        if isinstance(conjunct, IsIn):
+            return merge_rows(
+                index.lookup(buffer.encode(value)) for value in conjunct.values
+            )
+        literal = buffer.encode(conjunct.value)
+        if conjunct.op == "==":
+            return index.lookup(literal)
+        if conjunct.op == "!=" or not isinstance(index, (SortedIndex, IntervalIndex)):
+            continue
+
+        low, high = bounds.setdefault(conjunct.column, [None, None])
+        if conjunct.op in (">", ">=") and (low is None or literal >= low[0]):
+            bounds[conjunct.column][0] = (literal, conjunct.op == ">=")
+        elif conjunct.op in ("<", "<=") and (high is None or literal <= high[0]):
+            bounds[conjunct.column][1] = (literal, conjunct.op == "<=")
+
+    for column, (low, high) in bounds.items():
+        low, low_inclusive = low or (None, True)
+        high, high_inclusive = high or (None, True)
+        return table._indexes[column].range(low, high, low_inclusive, high_inclusive)
+    return None
+
+
+class ResultSet:
+    """Lazily evaluated result of `Table.select`.
+
+    Nothing is scanned until the result set is iterated; each iteration
+    re-runs the query against a snapshot of the current table contents.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        columns: list[str],
+        where: Expr | None = None,
+        order_by: list[str] | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        parallelism: int = 1,
+    ) -> None:
+        parallel.check_parallelism(parallelism)
+        self._table = table
+        self._columns = columns
+        self._where = where
+        self._order_by = order_by or []
+        self._descending = descending
+        self._limit = limit
+        self._parallelism = parallelism
+        # rows the predicate was evaluated on, for the metrics of `DBManager`
+        self.rows_scanned = 0
+        # fail early on unknown columns
+        for name in (*columns, *self._order_by):
+            table._get_column_position(name)
+        if where is not None:
+            where.compile(table)
+
+    @property
+    def columns(self) -> list[str]:
+        return self._columns
+
+    def _matching_positions(
+        self, table: Table, start: int = 0, stop: int | None = None
+    ) -> Iterator[list[int]]:
+        """Chunks of the ids from `start` to `stop` of the rows matching the predicate."""
+        if self._where is None:
+            for rows in table._live_chunks(CHUNK_SIZE, start, stop):
+                self.rows_scanned += len(rows)
+                yield list(rows)
+            return
+
+        candidates = index_candidates(table, self._where)
+        if candidates is None and self._parallelism > 1:
+            # indexed lookups are cheap enough, full scans are split over workers
+            self.rows_scanned += table.rows_count
+            yield from parallel.map_partitions(
+                table,
+                self._where.column_names(),
+                _scan_partition,
+                (self._where,),
+                self._parallelism,
+            )
+            return
+
+        kernel = self._where.compile(table)
+        if candidates is None:
+            chunks = table._live_chunks(CHUNK_SIZE, start, stop)
+        else:
+            stop = table._rows_count if stop is None else stop
+            candidates = candidates[bisect_left(candidates, start):bisect_left(candidates, stop)]
+            chunks = (
+                candidates[start:start + CHUNK_SIZE]
+                for start in range(0, len(candidates), CHUNK_SIZE)
+            )
+        for rows in chunks:
+            self.rows_scanned += len(rows)
+            batch = Batch(table, rows)
+            yield batch.positions(kernel(batch))
+
+    def row_positions(self) -> Iterator[int]:
+        """Positions of the matching rows, in result order."""
+        return self._row_positions(self._table.snapshot())
+
+    def _row_positions(self, table: Table) -> Iterator[int]:
+        if self._order_by:
+            positions = [
+                position
+                for chunk in self._matching_positions(table)
+                for position in chunk
+            ]
+            # sorted on the stored values, e.g. times as microseconds since midnight
+            keys = [
+                table._buffers[table._get_column_position(name)].take(positions)
+                for name in self._order_by
+            ]
+            key = keys[0] if len(keys) == 1 else list(zip(*keys))
+            order = sorted(range(len(positions)), key=key.__getitem__, reverse=self._descending)
+            yield from (positions[index] for index in order[:self._limit])
+            return
+
+        remaining = self._limit
+        for chunk in self._matching_positions(table):
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            yield from chunk
+            if remaining == 0:
+                return
+
+    def __iter__(self) -> Iterator[list[Any]]:
+        table = self._table.snapshot()
+        buffers = [table._buffers[table._get_column_position(name)] for name in self._columns]
+        for row in self._row_positions(table):
+            yield [buffer[row] for buffer in buffers]
+
+    def to_list(self) -> list[list[Any]]:
+        return list(self)
+
+    def count(self) -> int:
+        return sum(1 for _ in self.row_positions())
+
+
+def _scan_partition(table: Table, where: Expr, start: int, stop: int) -> list[int]:
+    """Ids from `start` to `stop` of the rows matching `where`, run by workers."""
+    return [
+        row
+        for chunk in ResultSet(table, [], where)._matching_positions(table, start, stop)
+        for row in chunk
+    ]
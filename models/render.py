@@ -0,0 +1,190 @@
+"""Text rendering of tables in the `orgtbl` layout of `tabulate`.
+
+Column widths are measured once over every row and then kept up to date as
+rows are appended, changed and deleted, so rendering a page of a large
+table only formats the rows on that page, and all pages line up.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Sequence
+
+if TYPE_CHECKING:
+    from .table import Table
+
+
+NUMERIC_TYPES = {"int", "real"}
+MEASURE_CHUNK = 65536
+# header cells are padded like `tabulate` pads them
+HEADER_PADDING = 2
+
+
+def cell_texts(column_type: str, values: list[Any]) -> list[str]:
+    if column_type == "real":
+        return [format(value, "g") for value in values]
+    if column_type == "time interval":
+        return [f"{value.lower_bound} - {value.upper_bound}" for value in values]
+    # `tabulate` strips the whitespace around cells
+    return [str(value).strip() for value in values]
+
+
+class Layout:
+    """Widths of the columns of a table, measured over its first `rows` row ids.
+
+    Every column counts its cells by length, so when a cell changes or its
+    row is deleted only a count moves, and the width follows without
+    measuring the column again. Real numbers are aligned on their decimal
+    point, so for them the integer and the fractional parts are counted
+    separately. The index column is as wide as the last position.
+    """
+
+    def __init__(self, table: Table) -> None:
+        self.headers = table.columns
+        self.types = ["int"] + [column.type for column in table._columns]
+        # lengths of the cells (integer parts of real numbers), and of the
+        # fractional parts of real numbers
+        self.lengths = [Counter() for _ in self.headers]
+        self.fractions = [Counter() for _ in self.headers]
+        self.rows = 0
+        self.live_rows = 0
+
+    @property
+    def widths(self) -> list[int]:
+        widths = [len(header) + HEADER_PADDING for header in self.headers]
+        if self.live_rows:
+            widths[0] = max(widths[0], len(str(self.live_rows - 1)))
+        for position in range(1, len(widths)):
+            width = max(self.lengths[position], default=0) + self._fraction(position)
+            widths[position] = max(widths[position], width)
+        return widths
+
+    def _fraction(self, position: int) -> int:
+        return max(self.fractions[position], default=0)
+
+    def measure(self, table: Table) -> None:
+        """Account for the rows appended since the last measurement."""
+        for start in range(self.rows, table._rows_count, MEASURE_CHUNK):
+            ids = table._live_ids(start, min(start + MEASURE_CHUNK, table._rows_count))
+            self._count(table, ids, 1)
+            self.live_rows += len(ids)
+        self.rows = table._rows_count
+
+    def forget(self, table: Table, ids: Sequence[int]) -> None:
+        """Uncount the cells of rows `ids` before they change, see `recount`."""
+        self._count(table, [row_id for row_id in ids if row_id < self.rows], -1)
+
+    def recount(self, table: Table, ids: Sequence[int]) -> None:
+        """Count the cells of rows `ids` again once they changed."""
+        self._count(table, [row_id for row_id in ids if row_id < self.rows], 1)
+
+    def delete(self, table: Table, ids: Sequence[int]) -> None:
+        """Uncount the rows `ids` before they are deleted."""
+        measured = [row_id for row_id in ids if row_id < self.rows]
+        self._count(table, measured, -1)
+        self.live_rows -= len(measured)
+
+    def add_column(self, table: Table) -> None:
+        """Follow `Table.add_column`: the rows measured so far hold the default."""
+        column = table._columns[-1]
+        self.rename(table)
+        texts = cell_texts(column.type, [column.default] if self.live_rows else [])
+        for counts, lengths in zip((self.lengths, self.fractions), _lengths(column.type, texts)):
+            counts.append(Counter({length: self.live_rows for length in lengths}))
+
+    def reorder(self, table: Table, new_order: list[int]) -> None:
+        """Follow `Table.change_columns`, once the columns moved."""
+        lengths, fractions = list(self.lengths), list(self.fractions)
+        for old, new in enumerate(new_order, 1):
+            lengths[new + 1] = self.lengths[old]
+            fractions[new + 1] = self.fractions[old]
+        self.lengths, self.fractions = lengths, fractions
+        self.rename(table)
+
+    def rename(self, table: Table) -> None:
+        self.headers = table.columns
+        self.types = ["int"] + [column.type for column in table._columns]
+
+    def _count(self, table: Table, ids: Sequence[int], sign: int) -> None:
+        if not ids:
+            return
+        for position, buffer in enumerate(table._buffers, 1):
+            self._tally(position, cell_texts(self.types[position], buffer.values_at(ids)), sign)
+
+    def _tally(self, position: int, texts: list[str], sign: int) -> None:
+        for counts, lengths in zip(
+            (self.lengths[position], self.fractions[position]),
+            _lengths(self.types[position], texts),
+        ):
+            if sign > 0:
+                counts.update(lengths)
+                continue
+            counts.subtract(lengths)
+            for length in [length for length, count in counts.items() if count <= 0]:
+                del counts[length]
+
+    def render(self, table: Table, offset: int, limit: int | None) -> str:
+        numeric = [
+            column_type in NUMERIC_TYPES and self.live_rows > 0 for column_type in self.types
+        ]
+        widths = self.widths
+        lines = [
+            _line(
+                header.rjust(width) if is_numeric else header.ljust(width)
+                for header, width, is_numeric in zip(self.headers, widths, numeric)
+            ),
+            "|" + "+".join("-" * (width + 2) for width in widths) + "|",
+        ]
+
+        stop = table.rows_count if limit is None else min(offset + limit, table.rows_count)
+        positions = range(min(offset, stop), stop)
+        columns = _page_texts(
+            table, self.types, positions, table._position_ids(positions.start, stop)
+        )
+        for position, texts in enumerate(columns):
+            width = widths[position]
+            if self.types[position] == "real":
+                fraction = self._fraction(position)
+                columns[position] = [
+                    (integer + part.ljust(fraction)).rjust(width)
+                    for integer, part in map(_split_decimal, texts)
+                ]
+            elif numeric[position]:
+                columns[position] = [text.rjust(width) for text in texts]
+            else:
+                columns[position] = [text.ljust(width) for text in texts]
+        lines.extend(map(_line, zip(*columns)))
+        return "\n".join(lines)
+
+
+def _page_texts(
+    table: Table, types: list[str], positions: range, ids: Sequence[int]
+) -> list[list[str]]:
+    texts = [list(map(str, positions))]
+    for column_type, buffer in zip(types[1:], table._buffers):
+        texts.append(cell_texts(column_type, buffer.values_at(ids)))
+    return texts
+
+
+def _lengths(column_type: str, texts: list[str]) -> tuple[Counter, Counter]:
+    """Cells of `texts` counted by length, and by the length of their fraction."""
+    if column_type != "real":
+        return Counter(map(len, texts)), Counter()
+    parts = list(map(_split_decimal, texts))
+    return (
+        Counter(len(integer) for integer, _ in parts),
+        Counter(len(fraction) for _, fraction in parts),
+    )
+
+
+def _split_decimal(text: str) -> tuple[str, str]:
+    point = text.find(".")
+    if point == -1:
+        # exponents are aligned like fractions, as `tabulate` does
+        point = text.find("e")
+    if point == -1:
+        return text, ""
+    return text[:point], text[point:]
+
+
+def _line(cells) -> str:
+    return "| " + " | ".join(cells) + " |"
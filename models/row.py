@@ -1,21 +1,48 @@
+from __future__ import annotations
+
 from Pyro5.api import expose
-from typing import Any
+from typing import Any, Sequence
 
 
 @expose
 class Row:
-    def __init__(self, values: list[Any]) -> None:
-        self._values = values
+    """Lightweight view of one row over the column buffers of a table."""
+
+    __slots__ = ("_buffers", "_index")
+
+    def __init__(self, buffers: Sequence, index: int) -> None:
+        self._buffers = buffers
+        self._index = index
+
+    @classmethod
+    def detached(cls, values: list[Any]) -> Row:
+        """Row that owns its values instead of viewing a table."""
+        return cls([[value] for value in values], 0)
+
+    def __getstate__(self) -> dict:
+        return {"_buffers": self._buffers, "_index": self._index}
+
+    def __setstate__(self, state: dict) -> None:
+        # rows pickled before the columnar storage owned a list of values
+        if "_values" in state:
+            state = {"_buffers": [[value] for value in state["_values"]], "_index": 0}
+        self._buffers = state["_buffers"]
+        self._index = state["_index"]
 
     def __getitem__(self, index: int) -> Any:
-        return self._values[index]
+        return self._buffers[index][self._index]
 
     def __setitem__(self, key: int, value: Any) -> None:
-        self._values[key] = value
+        self._buffers[key][self._index] = value
 
     def __repr__(self) -> str:
         return f'[{", ".join(map(str, self.values))}]'
 
+    @property
+    def id(self) -> int:
+        """Stable id of the row in its table, see `Table.delete_rows`"""
+        return self._index
+
     @property
     def values(self):
-        return self._values
+        return [buffer[self._index] for buffer in self._buffers]
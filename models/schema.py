@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from .column import Column, RowValidator
+
+
+class Schema:
+    """Columns of a table, with their names and positions cached.
+
+    The caches are rebuilt by the schema changes, which are rare, so the row
+    paths look up columns by name in constant time and validate rows with a
+    validator compiled for the current columns.
+    """
+
+    def __init__(self, columns: Iterable[Column] = ()) -> None:
+        self.columns: list[Column] = list(columns)
+        self._index()
+
+    def _index(self) -> None:
+        self.names = tuple(column.name for column in self.columns)
+        self.name_set = frozenset(self.names)
+        self.positions = {name: position for position, name in enumerate(self.names)}
+        self._validator: RowValidator | None = None
+
+    def __getstate__(self) -> dict:
+        # the compiled validator is rebuilt on first use
+        return {**self.__dict__, "_validator": None}
+
+    @property
+    def validator(self) -> RowValidator:
+        if self._validator is None:
+            self._validator = RowValidator(self.columns)
+        return self._validator
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def position(self, name: str) -> int:
+        try:
+            return self.positions[name]
+        except KeyError:
+            raise KeyError(f"No column with name '{name}' found in table!") from None
+
+    def column(self, name: str) -> Column:
+        return self.columns[self.position(name)]
+
+    def add(self, column: Column) -> None:
+        self.columns.append(column)
+        self._index()
+
+    def rename(self, old_name: str, new_name: str) -> None:
+        self.column(old_name)._name = new_name
+        self._index()
+
+    def reorder(self, columns: list[Column]) -> None:
+        self.columns = columns
+        self._index()
@@ -0,0 +1,735 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from copy import copy
+from datetime import time
+from itertools import accumulate, islice, repeat
+import pickle
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from interval import Interval
+
+
+MICROSECONDS_PER_SECOND = 1_000_000
+ITERATION_CHUNK = 4096
+
+
+def time_to_micros(value: time) -> int:
+    seconds = (value.hour * 60 + value.minute) * 60 + value.second
+    return seconds * MICROSECONDS_PER_SECOND + value.microsecond
+
+
+def micros_to_time(value: int) -> time:
+    seconds, microsecond = divmod(value, MICROSECONDS_PER_SECOND)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return time(hour, minute, second, microsecond)
+
+
+def typecode(values: array | memoryview) -> str:
+    return values.typecode if isinstance(values, array) else values.format
+
+
+# typecodes of arrays of small unsigned numbers, narrowest first
+UNSIGNED_TYPECODES = ("B", "H", "I")
+
+
+def widened(values: array | memoryview, largest: Any) -> array | memoryview:
+    """`values` as an array of a typecode wide enough for `largest`
+
+    Only arrays of `UNSIGNED_TYPECODES` are widened, others are returned as
+    they are, like arrays whose items already have room for `largest`.
+    """
+    code = typecode(values)
+    if code not in UNSIGNED_TYPECODES or largest < 1 << 8 * values.itemsize:
+        return values
+    for wider in UNSIGNED_TYPECODES[UNSIGNED_TYPECODES.index(code) + 1:]:
+        if largest < 1 << 8 * array(wider).itemsize:
+            return array(wider, values)
+    raise OverflowError(f"Value {largest} does not fit any of {UNSIGNED_TYPECODES}!")
+
+
+# loads are serialized, so a thread never sees a half-loaded object
+_LOADING = threading.RLock()
+
+
+class Deferred:
+    """Mixin for objects whose data is produced on first access.
+
+    An instance made by `deferred` only holds a loader. The first lookup of
+    an attribute it does not have yet runs the loader, which fills in the
+    real attributes; after that `__getattr__` is never reached again.
+    """
+
+    @classmethod
+    def deferred(cls, loader: Callable[[Any], None]):
+        instance = cls.__new__(cls)
+        instance._loader = loader
+        return instance
+
+    @property
+    def is_loaded(self) -> bool:
+        return "_loader" not in self.__dict__
+
+    def load(self) -> None:
+        with _LOADING:
+            loader = self.__dict__.pop("_loader", None)
+            if loader is not None:
+                loader(self)
+
+    def __getattr__(self, name: str) -> Any:
+        if not name.startswith("__"):
+            # waits for a load that another thread may be running
+            self.load()
+            if name in self.__dict__:
+                return self.__dict__[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __getstate__(self) -> dict:
+        self.load()
+        return self.__dict__
+
+
+class ColumnBuffer(Deferred):
+    """Storage for the values of a single column, addressed by row position.
+
+    The base implementation keeps plain Python objects in a list and is used
+    for column types that have no specialised buffer.
+    """
+
+    def __init__(self) -> None:
+        self._data: Any = []
+
+    def __getstate__(self) -> dict:
+        state = dict(super().__getstate__())
+        for name, value in state.items():
+            if isinstance(value, memoryview):
+                state[name] = array(value.format, value.tobytes())
+        return state
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def buffer_type(self) -> type[ColumnBuffer]:
+        """Class of the buffer that stores the values."""
+        return type(self)
+
+    def copy(self) -> ColumnBuffer:
+        clone = type(self).__new__(type(self))
+        clone.__dict__.update(
+            {name: copy(value) for name, value in self.__getstate__().items()}
+        )
+        return clone
+
+    def __getitem__(self, index: int) -> Any:
+        return self._data[index]
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        self._data[index] = value
+
+    def __delitem__(self, index: int) -> None:
+        del self._data[index]
+
+    def truncate(self, length: int) -> None:
+        """Drop the values from position `length` on."""
+        del self._data[length:]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def append(self, value: Any) -> None:
+        self._data.append(value)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self._data.extend(values)
+
+    def encode(self, value: Any) -> Any:
+        """Convert a value into the representation returned by `scan`."""
+        return value
+
+    def scan(self, start: int, stop: int) -> Sequence[Any]:
+        """Stored representation of a range of rows, for bulk comparisons."""
+        return self._data[start:stop]
+
+    def values(self, start: int, stop: int) -> list[Any]:
+        return list(self._data[start:stop])
+
+    def raw(self, index: int) -> Any:
+        """Stored representation of one row, as used by indexes."""
+        return self._data[index]
+
+    def take(self, rows: Iterable[int]) -> Sequence[Any]:
+        """Like `scan`, but for an arbitrary selection of rows."""
+        data = self._data
+        if isinstance(data, (array, memoryview)):
+            return array(typecode(data), map(data.__getitem__, rows))
+        return [data[row] for row in rows]
+
+    def values_at(self, rows: Iterable[int]) -> list[Any]:
+        if isinstance(rows, range) and rows.step == 1:
+            return self.values(rows.start, rows.stop)
+        return [self[row] for row in rows]
+
+    def decode(self, value: Any) -> Any:
+        """Inverse of `encode`."""
+        return value
+
+    def streams(self) -> list[array | bytearray]:
+        """Contiguous binary arrays holding the buffer, for persistence."""
+        if isinstance(self._data, array):
+            return [self._data]
+        return [bytearray(pickle.dumps(self._data))]
+
+    def load_streams(self, streams: list[bytes]) -> None:
+        """Fill an empty buffer from the contents of `streams`."""
+        if isinstance(self._data, array):
+            self._data.frombytes(streams[0])
+        else:
+            self._data = pickle.loads(streams[0])
+
+    def use_typecodes(self, typecodes: list[str]) -> None:
+        """Store an empty buffer in arrays of the typecodes its streams were saved with.
+
+        Only buffers whose arrays widen as values grow need them, see
+        `CharBuffer`.
+        """
+
+    def map_streams(self, streams: list[memoryview]) -> bool:
+        """Use read-only views of `streams` as storage instead of copies.
+
+        Only fixed-width buffers can do this; others return False and have
+        to be filled with `load_streams`.
+        """
+        data = self.__dict__.get("_data")
+        if not isinstance(data, array):
+            return False
+        self._data = streams[0].cast(data.typecode)
+        return True
+
+    def view(self) -> memoryview:
+        """Zero-copy view of a fixed-width buffer in its stored representation.
+
+        While a view of an in-memory buffer is alive the buffer cannot grow,
+        so release it before adding rows.
+        """
+        self.load()
+        data = self.__dict__.get("_data")
+        if not isinstance(data, (array, memoryview)):
+            raise TypeError(f"{type(self).__name__} has no fixed-width representation!")
+        return memoryview(data).toreadonly()
+
+    def _iter_in_chunks(self) -> Iterator[Any]:
+        for start in range(0, len(self), ITERATION_CHUNK):
+            yield from self.values(start, start + ITERATION_CHUNK)
+
+
+class IntBuffer(ColumnBuffer):
+    def __init__(self) -> None:
+        self._data = array("q")
+
+
+class RealBuffer(ColumnBuffer):
+    def __init__(self) -> None:
+        self._data = array("d")
+
+
+class CharBuffer(ColumnBuffer):
+    """Single characters stored as fixed-width code points.
+
+    Code points are kept in a byte array while they all fit in a byte, and
+    the array is widened the first time one does not.
+    """
+
+    def __init__(self) -> None:
+        self._data = array("B")
+
+    def use_typecodes(self, typecodes: list[str]) -> None:
+        self._data = array(typecodes[0])
+
+    def __getitem__(self, index: int) -> str:
+        return chr(self._data[index])
+
+    def __setitem__(self, index: int, value: str) -> None:
+        code = ord(value)
+        self._data = widened(self._data, code)
+        self._data[index] = code
+
+    def __iter__(self) -> Iterator[str]:
+        return map(chr, self._data)
+
+    def append(self, value: str) -> None:
+        code = ord(value)
+        self._data = widened(self._data, code)
+        self._data.append(code)
+
+    def extend(self, values: Iterable[str]) -> None:
+        codes = list(map(ord, values))
+        if codes:
+            self._data = widened(self._data, max(codes))
+            self._data.fromlist(codes)
+
+    def encode(self, value: str) -> int:
+        return ord(value)
+
+    def decode(self, value: int) -> str:
+        return chr(value)
+
+    def values(self, start: int, stop: int) -> list[str]:
+        return list(map(chr, self._data[start:stop]))
+
+
+class StringBuffer(ColumnBuffer):
+    """Strings stored as UTF-8 in one blob, addressed by (start, length) pairs.
+
+    Overwritten and deleted values leave garbage in the blob, which is
+    reclaimed by `compact` once it outweighs the live data.
+    """
+
+    def __init__(self) -> None:
+        self._starts = array("q")
+        self._lengths = array("q")
+        self._blob = bytearray()
+        self._garbage = 0
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index: int) -> str:
+        start = self._starts[index]
+        return self._blob[start:start + self._lengths[index]].decode()
+
+    def __setitem__(self, index: int, value: str) -> None:
+        self._garbage += self._lengths[index]
+        encoded = value.encode()
+        self._starts[index] = len(self._blob)
+        self._lengths[index] = len(encoded)
+        self._blob += encoded
+        self._compact_if_wasteful()
+
+    def __delitem__(self, index: int) -> None:
+        self._garbage += self._lengths[index]
+        del self._starts[index]
+        del self._lengths[index]
+        self._compact_if_wasteful()
+
+    def truncate(self, length: int) -> None:
+        self._garbage += sum(self._lengths[length:])
+        del self._starts[length:]
+        del self._lengths[length:]
+        self._compact_if_wasteful()
+
+    def __iter__(self) -> Iterator[str]:
+        return self._iter_in_chunks()
+
+    def append(self, value: str) -> None:
+        encoded = value.encode()
+        self._starts.append(len(self._blob))
+        self._lengths.append(len(encoded))
+        self._blob += encoded
+
+    def extend(self, values: Iterable[str]) -> None:
+        encoded = [value.encode() for value in values]
+        lengths = array("q", map(len, encoded))
+        starts = accumulate(lengths, initial=len(self._blob))
+        self._starts.extend(islice(starts, len(lengths)))
+        self._lengths.extend(lengths)
+        self._blob += b"".join(encoded)
+
+    def values(self, start: int, stop: int) -> list[str]:
+        blob = self._blob
+        return [
+            blob[offset:offset + length].decode()
+            for offset, length in zip(
+                self._starts[start:stop], self._lengths[start:stop]
+            )
+        ]
+
+    def scan(self, start: int, stop: int) -> list[str]:
+        return self.values(start, stop)
+
+    def raw(self, index: int) -> str:
+        return self[index]
+
+    def streams(self) -> list[array | bytearray]:
+        return [self._starts, self._lengths, self._blob]
+
+    def load_streams(self, streams: list[bytes]) -> None:
+        self._starts.frombytes(streams[0])
+        self._lengths.frombytes(streams[1])
+        self._blob[:] = streams[2]
+        self._garbage = len(self._blob) - sum(self._lengths)
+
+    def take(self, rows: Iterable[int]) -> list[str]:
+        return [self[row] for row in rows]
+
+    def _compact_if_wasteful(self) -> None:
+        if self._garbage > 4096 and self._garbage * 2 > len(self._blob):
+            self.compact()
+
+    def compact(self) -> None:
+        values = list(self)
+        self.__init__()
+        self.extend(values)
+
+
+class DictionaryBuffer(ColumnBuffer):
+    """Strings stored as codes into a dictionary of the distinct values.
+
+    Every distinct string is kept once and rows hold its code, in an array
+    as narrow as the dictionary allows. The stored representation is still
+    the string, so indexes and comparisons treat the column like any other
+    string column; equality tests and grouping can use `code` and `codes`
+    instead. Values that no row holds any more stay in the dictionary.
+    """
+
+    def __init__(self) -> None:
+        self._codes = array("B")
+        self._values: list[str] = []
+        self._lookup: dict[str, int] = {}
+
+    def use_typecodes(self, typecodes: list[str]) -> None:
+        self._codes = array(typecodes[0])
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @property
+    def dictionary(self) -> list[str]:
+        """The distinct values, by code."""
+        return self._values
+
+    def code(self, value: str) -> int | None:
+        """Code of `value`, None if no row ever held it."""
+        return self._lookup.get(value)
+
+    def _encode_code(self, value: str) -> int:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self._values)
+            self._values.append(value)
+            self._codes = widened(self._codes, code)
+        return code
+
+    def codes(self, start: int, stop: int) -> array | memoryview:
+        return self._codes[start:stop]
+
+    def take_codes(self, rows: Iterable[int]) -> array:
+        return array(typecode(self._codes), map(self._codes.__getitem__, rows))
+
+    def __getitem__(self, index: int) -> str:
+        return self._values[self._codes[index]]
+
+    def __setitem__(self, index: int, value: str) -> None:
+        self._codes[index] = self._encode_code(value)
+
+    def __delitem__(self, index: int) -> None:
+        del self._codes[index]
+
+    def truncate(self, length: int) -> None:
+        del self._codes[length:]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._values.__getitem__, self._codes)
+
+    def append(self, value: str) -> None:
+        code = self._encode_code(value)
+        self._codes.append(code)
+
+    def extend(self, values: Iterable[str]) -> None:
+        # encoding may widen the codes, so they are stored afterwards
+        codes = [self._encode_code(value) for value in values]
+        self._codes.fromlist(codes)
+
+    def values(self, start: int, stop: int) -> list[str]:
+        return list(map(self._values.__getitem__, self._codes[start:stop]))
+
+    def scan(self, start: int, stop: int) -> list[str]:
+        return self.values(start, stop)
+
+    def raw(self, index: int) -> str:
+        return self[index]
+
+    def take(self, rows: Iterable[int]) -> list[str]:
+        return [self[row] for row in rows]
+
+    def streams(self) -> list[array | bytearray]:
+        dictionary = StringBuffer()
+        dictionary.extend(self._values)
+        return [self._codes, *dictionary.streams()]
+
+    def _load_dictionary(self, streams: list[bytes]) -> None:
+        dictionary = StringBuffer()
+        dictionary.load_streams(streams)
+        self._values = list(dictionary)
+        self._lookup = {value: code for code, value in enumerate(self._values)}
+
+    def load_streams(self, streams: list[bytes]) -> None:
+        self._codes.frombytes(streams[0])
+        self._load_dictionary(streams[1:])
+
+    def map_streams(self, streams: list[memoryview]) -> bool:
+        self._codes = streams[0].cast(self._codes.typecode)
+        self._load_dictionary(streams[1:])
+        return True
+
+
+class TimeBuffer(ColumnBuffer):
+    """`time` values stored as microseconds since midnight."""
+
+    def __init__(self) -> None:
+        self._data = array("q")
+
+    def __getitem__(self, index: int) -> time:
+        return micros_to_time(self._data[index])
+
+    def __setitem__(self, index: int, value: time) -> None:
+        self._data[index] = time_to_micros(value)
+
+    def __iter__(self) -> Iterator[time]:
+        return map(micros_to_time, self._data)
+
+    def append(self, value: time) -> None:
+        self._data.append(time_to_micros(value))
+
+    def extend(self, values: Iterable[time]) -> None:
+        self._data.extend(map(time_to_micros, values))
+
+    def encode(self, value: time) -> int:
+        return time_to_micros(value)
+
+    def decode(self, value: int) -> time:
+        return micros_to_time(value)
+
+    def values(self, start: int, stop: int) -> list[time]:
+        return list(map(micros_to_time, self._data[start:stop]))
+
+
+class IntervalBuffer(ColumnBuffer):
+    """`Interval`s of `time` values stored as paired bound arrays.
+
+    Closedness of both ends is packed into one flag byte per row. The stored
+    representation of a value is the `(lower, upper, flags)` tuple, which
+    orders intervals by their lower bound first.
+    """
+
+    LOWER_CLOSED = 1
+    UPPER_CLOSED = 2
+
+    def __init__(self) -> None:
+        self._lowers = array("q")
+        self._uppers = array("q")
+        self._flags = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._lowers)
+
+    def _decode(self, lower: int, upper: int, flags: int) -> Interval:
+        return Interval(
+            micros_to_time(lower),
+            micros_to_time(upper),
+            lower_closed=bool(flags & self.LOWER_CLOSED),
+            upper_closed=bool(flags & self.UPPER_CLOSED),
+        )
+
+    def _encode_flags(self, value: Interval) -> int:
+        return (
+            self.LOWER_CLOSED * bool(value.lower_closed)
+            | self.UPPER_CLOSED * bool(value.upper_closed)
+        )
+
+    def __getitem__(self, index: int) -> Interval:
+        return self._decode(
+            self._lowers[index], self._uppers[index], self._flags[index]
+        )
+
+    def __setitem__(self, index: int, value: Interval) -> None:
+        self._lowers[index] = time_to_micros(value.lower_bound)
+        self._uppers[index] = time_to_micros(value.upper_bound)
+        self._flags[index] = self._encode_flags(value)
+
+    def __delitem__(self, index: int) -> None:
+        del self._lowers[index]
+        del self._uppers[index]
+        del self._flags[index]
+
+    def truncate(self, length: int) -> None:
+        del self._lowers[length:]
+        del self._uppers[length:]
+        del self._flags[length:]
+
+    def __iter__(self) -> Iterator[Interval]:
+        return self._iter_in_chunks()
+
+    def append(self, value: Interval) -> None:
+        self._lowers.append(time_to_micros(value.lower_bound))
+        self._uppers.append(time_to_micros(value.upper_bound))
+        self._flags.append(self._encode_flags(value))
+
+    def extend(self, values: Iterable[Interval]) -> None:
+        for value in values:
+            self.append(value)
+
+    def values(self, start: int, stop: int) -> list[Interval]:
+        return list(
+            map(
+                self._decode,
+                self._lowers[start:stop],
+                self._uppers[start:stop],
+                self._flags[start:stop],
+            )
+        )
+
+    def encode(self, value: Interval) -> tuple[int, int, int]:
+        return (
+            time_to_micros(value.lower_bound),
+            time_to_micros(value.upper_bound),
+            self._encode_flags(value),
+        )
+
+    def scan(self, start: int, stop: int) -> list[tuple[int, int, int]]:
+        return list(
+            zip(
+                self._lowers[start:stop],
+                self._uppers[start:stop],
+                self._flags[start:stop],
+            )
+        )
+
+    def decode(self, value: tuple[int, int, int]) -> Interval:
+        return self._decode(*value)
+
+    def bounds(self, start: int, stop: int) -> tuple[array, array, bytearray]:
+        """Lower bounds, upper bounds and flags of a range of rows, unzipped."""
+        return self._lowers[start:stop], self._uppers[start:stop], self._flags[start:stop]
+
+    def raw(self, index: int) -> tuple[int, int, int]:
+        return self._lowers[index], self._uppers[index], self._flags[index]
+
+    def streams(self) -> list[array | bytearray]:
+        return [self._lowers, self._uppers, self._flags]
+
+    def load_streams(self, streams: list[bytes]) -> None:
+        self._lowers.frombytes(streams[0])
+        self._uppers.frombytes(streams[1])
+        self._flags[:] = streams[2]
+
+    def take(self, rows: Iterable[int]) -> list[tuple[int, int, int]]:
+        return [self.raw(row) for row in rows]
+
+
+class PaddedBuffer(ColumnBuffer):
+    """Buffer of a column added to a table that already had rows.
+
+    The first `prefix` rows read the column default without storing it, so
+    adding a column does not touch the existing rows. The defaults are
+    written out when one of those rows changes or the table is compacted.
+    """
+
+    def __init__(self, inner: ColumnBuffer, prefix: int, default: Any) -> None:
+        self.inner = inner
+        self.prefix = prefix
+        self.default = default
+        self._raw_default = inner.encode(default)
+
+    @property
+    def buffer_type(self) -> type[ColumnBuffer]:
+        return self.inner.buffer_type
+
+    def __len__(self) -> int:
+        return self.prefix + len(self.inner)
+
+    def copy(self) -> PaddedBuffer:
+        return PaddedBuffer(self.inner.copy(), self.prefix, self.default)
+
+    def materialize(self) -> None:
+        """Store the defaults of the first rows like any other value."""
+        if not self.prefix:
+            return
+        filled = type(self.inner)()
+        filled.extend(repeat(self.default, self.prefix))
+        filled.extend(self.inner.values(0, len(self.inner)))
+        self.inner = filled
+        self.prefix = 0
+
+    def __getitem__(self, index: int) -> Any:
+        if index < self.prefix:
+            return self.default
+        return self.inner[index - self.prefix]
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        if index < self.prefix:
+            self.materialize()
+        self.inner[index - self.prefix] = value
+
+    def __delitem__(self, index: int) -> None:
+        self.materialize()
+        del self.inner[index]
+
+    def truncate(self, length: int) -> None:
+        if length < self.prefix:
+            self.prefix = length
+        self.inner.truncate(max(length - self.prefix, 0))
+
+    def __iter__(self) -> Iterator[Any]:
+        return self._iter_in_chunks()
+
+    def append(self, value: Any) -> None:
+        self.inner.append(value)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self.inner.extend(values)
+
+    def encode(self, value: Any) -> Any:
+        return self.inner.encode(value)
+
+    def decode(self, value: Any) -> Any:
+        return self.inner.decode(value)
+
+    def _split(self, start: int, stop: int) -> tuple[int, int, int]:
+        """Count of defaults and the range of `inner` making up rows `start` to `stop`."""
+        stop = min(stop, len(self))
+        defaults = max(min(stop, self.prefix) - start, 0)
+        return defaults, max(start - self.prefix, 0), max(stop - self.prefix, 0)
+
+    def scan(self, start: int, stop: int) -> Sequence[Any]:
+        defaults, start, stop = self._split(start, stop)
+        stored = self.inner.scan(start, stop)
+        if not defaults:
+            return stored
+        if isinstance(stored, (array, memoryview)):
+            code = typecode(widened(stored, self._raw_default))
+            return array(code, repeat(self._raw_default, defaults)) + array(code, stored)
+        return [self._raw_default] * defaults + list(stored)
+
+    def values(self, start: int, stop: int) -> list[Any]:
+        defaults, start, stop = self._split(start, stop)
+        return [self.default] * defaults + self.inner.values(start, stop)
+
+    def raw(self, index: int) -> Any:
+        if index < self.prefix:
+            return self._raw_default
+        return self.inner.raw(index - self.prefix)
+
+    def take(self, rows: Iterable[int]) -> Sequence[Any]:
+        rows = list(rows)
+        prefix = self.prefix
+        stored = self.inner.take([row - prefix for row in rows if row >= prefix])
+        if len(stored) == len(rows):
+            return stored
+        stored_values = iter(stored)
+        taken = [self._raw_default if row < prefix else next(stored_values) for row in rows]
+        if isinstance(stored, (array, memoryview)):
+            return array(typecode(widened(stored, self._raw_default)), taken)
+        return taken
+
+    def streams(self) -> list[array | bytearray]:
+        padded = self.copy()
+        padded.materialize()
+        return padded.inner.streams()
+
+    def view(self) -> memoryview:
+        if self.prefix:
+            raise TypeError("Column has rows stored as defaults, compact the table first!")
+        return self.inner.view()
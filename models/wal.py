@@ -0,0 +1,252 @@
+"""Append-only write-ahead log of `DBManager` mutations.
+
+Every record is framed as ``length (u32) | crc32 (u32) | payload`` and the
+payload holds the log sequence number followed by the operation name and
+its arguments in a small tagged binary encoding. A torn or corrupted tail,
+as left behind by a crash in the middle of a write, ends the replay and is
+cut off before the log is appended to again.
+
+Appending only queues the record. Queued records reach the disk together
+in one write and one fsync (group commit), either once `fsync_every`
+records are queued, every `fsync_interval` seconds from a background
+thread, or on an explicit `sync`.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import zlib
+from datetime import time
+from typing import Any, Iterator
+
+from interval import Interval
+
+from .column import COLUMN_CLASSES, Column
+from .storage import micros_to_time, time_to_micros
+
+
+FRAME = struct.Struct("<II")
+LSN = struct.Struct("<Q")
+INT = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+SIZE = struct.Struct("<I")
+INTERVAL = struct.Struct("<qqBB")
+
+
+def _encode(value: Any, out: bytearray) -> None:
+    if value is None:
+        out += b"N"
+    elif value is True or value is False:
+        out += b"T" if value else b"F"
+    elif isinstance(value, int):
+        if -(2 ** 63) <= value < 2 ** 63:
+            out += b"i" + INT.pack(value)
+        else:
+            _encode_text(b"I", str(value), out)
+    elif isinstance(value, float):
+        out += b"f" + FLOAT.pack(value)
+    elif isinstance(value, str):
+        _encode_text(b"s", value, out)
+    elif isinstance(value, time):
+        out += b"t" + INT.pack(time_to_micros(value))
+    elif isinstance(value, Interval):
+        out += b"v" + INTERVAL.pack(
+            time_to_micros(value.lower_bound),
+            time_to_micros(value.upper_bound),
+            bool(value.lower_closed),
+            bool(value.upper_closed),
+        )
+    elif isinstance(value, (list, tuple)):
+        out += b"l" + SIZE.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out += b"d" + SIZE.pack(len(value))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    elif isinstance(value, Column):
+        out += b"c"
+        _encode([value.type, value.name, value.default, value.options()], out)
+    else:
+        raise TypeError(f"Cannot log value of type '{type(value).__name__}'!")
+
+
+def _encode_text(tag: bytes, text: str, out: bytearray) -> None:
+    data = text.encode()
+    out += tag + SIZE.pack(len(data)) + data
+
+
+def _decode(data: memoryview, offset: int) -> tuple[Any, int]:
+    tag = data[offset:offset + 1].tobytes()
+    offset += 1
+    if tag == b"N":
+        return None, offset
+    if tag in (b"T", b"F"):
+        return tag == b"T", offset
+    if tag == b"i":
+        return INT.unpack_from(data, offset)[0], offset + INT.size
+    if tag == b"f":
+        return FLOAT.unpack_from(data, offset)[0], offset + FLOAT.size
+    if tag in (b"s", b"I"):
+        (size,) = SIZE.unpack_from(data, offset)
+        offset += SIZE.size
+        text = data[offset:offset + size].tobytes().decode()
+        return (text if tag == b"s" else int(text)), offset + size
+    if tag == b"t":
+        return micros_to_time(INT.unpack_from(data, offset)[0]), offset + INT.size
+    if tag == b"v":
+        lower, upper, lower_closed, upper_closed = INTERVAL.unpack_from(data, offset)
+        value = Interval(
+            micros_to_time(lower),
+            micros_to_time(upper),
+            lower_closed=bool(lower_closed),
+            upper_closed=bool(upper_closed),
+        )
+        return value, offset + INTERVAL.size
+    if tag in (b"l", b"d"):
+        (size,) = SIZE.unpack_from(data, offset)
+        offset += SIZE.size
+        items = []
+        for _ in range(size * (2 if tag == b"d" else 1)):
+            item, offset = _decode(data, offset)
+            items.append(item)
+        if tag == b"d":
+            return dict(zip(items[::2], items[1::2])), offset
+        return items, offset
+    if tag == b"c":
+        (type_, name, default, *options), offset = _decode(data, offset)
+        # logs written before columns had options hold three items
+        return COLUMN_CLASSES[type_](name, default, **(options[0] if options else {})), offset
+    raise ValueError(f"Unknown value tag {tag!r} in the log!")
+
+
+def encode_record(lsn: int, operation: str, args: tuple) -> bytes:
+    payload = bytearray(LSN.pack(lsn))
+    _encode([operation, list(args)], payload)
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path: str) -> Iterator[tuple[int, str, list]]:
+    """Records of the log at `path`, up to the first incomplete one."""
+    for _, lsn, operation, args in _scan(path):
+        yield lsn, operation, args
+
+
+def cut_torn_tail(path: str) -> None:
+    """Truncate the log at `path` to its last complete record.
+
+    Records appended after a torn tail would never be replayed, so the
+    tail has to go before the log is written to again.
+    """
+    if not os.path.exists(path):
+        return
+    end = 0
+    for end, _, _, _ in _scan(path):
+        pass
+    if end < os.path.getsize(path):
+        with open(path, "r+b") as file:
+            file.truncate(end)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def _scan(path: str) -> Iterator[tuple[int, int, str, list]]:
+    """Complete records of the log at `path`, each with the offset of its end."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as file:
+        data = memoryview(file.read())
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        size, checksum = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + size]
+        if len(payload) < size or zlib.crc32(payload) != checksum:
+            return
+        (lsn,) = LSN.unpack_from(payload)
+        (operation, args), _ = _decode(payload, LSN.size)
+        offset += FRAME.size + size
+        yield offset, lsn, operation, args
+
+
+class WriteAheadLog:
+    def __init__(
+        self,
+        path: str,
+        lsn: int = 0,
+        fsync_every: int = 1,
+        fsync_interval: float | None = None,
+    ) -> None:
+        self.path = path
+        self.lsn = lsn
+        self.durable_lsn = lsn
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = open(path, "ab")
+        self._pending = bytearray()
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if fsync_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def append(self, operation: str, args: tuple) -> int:
+        """Queue a record and return its sequence number."""
+        with self._lock:
+            self.lsn += 1
+            self._pending += encode_record(self.lsn, operation, args)
+            self._pending_count += 1
+            return self.lsn
+
+    def commit(self, lsn: int) -> None:
+        """Make record `lsn` durable if the fsync policy asks for it.
+
+        Records queued by other threads in the meantime are written by the
+        same fsync, and a record already covered by another thread's fsync
+        costs nothing. With `fsync_every` 1 the record is durable on return,
+        even when another thread took it out of the queue and is still
+        writing it: `sync` waits for that write.
+        """
+        if lsn <= self.durable_lsn or self.fsync_every <= 0:
+            return
+        if self.fsync_every == 1 or self._pending_count >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Write and fsync every queued record."""
+        with self._io_lock:
+            with self._lock:
+                data, self._pending = self._pending, bytearray()
+                self._pending_count = 0
+                lsn = self.lsn
+            if data:
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self.durable_lsn = max(self.durable_lsn, lsn)
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+
+    def truncate(self) -> None:
+        """Drop the written records, once a checkpoint made them redundant."""
+        with self._io_lock:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.sync()
+        self._file.close()
+
+    @property
+    def pending(self) -> int:
+        return self._pending_count
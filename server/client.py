@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from Pyro5.api import Proxy
+
+from models.column import COLUMN_CLASSES
+
+from . import serializers  # noqa: F401 - registers the serializer hooks
+from .service import OPERATIONS
+
+
+class OperationBatch:
+    """Operations recorded by calling `DBManager` methods, sent in one call.
+
+    ::
+
+        with remote.batch() as batch:
+            for row in rows:
+                batch.add_row("table", row)
+        batch.results
+    """
+
+    def __init__(self, remote: RemoteDB) -> None:
+        self._remote = remote
+        self.operations: list[list] = []
+        self.results: list[Any] | None = None
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        if name not in OPERATIONS:
+            raise AttributeError(name)
+
+        def record(*args, **kwargs) -> None:
+            self.operations.append([name, list(args), kwargs])
+
+        return record
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def __enter__(self) -> OperationBatch:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.results = self._remote.execute(self.operations)
+
+
+class RemoteDB:
+    """Client of a `DBService`; like Pyro proxies, it belongs to one thread."""
+
+    def __init__(self, uri: str) -> None:
+        self._proxy = Proxy(uri)
+
+    def close(self) -> None:
+        self._proxy._pyroRelease()
+
+    def __enter__(self) -> RemoteDB:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name not in OPERATIONS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.execute([[name, list(args), kwargs]])[0]
+
+    def execute(self, operations: list[list]) -> list[Any]:
+        return self._proxy.execute(operations)
+
+    def batch(self) -> OperationBatch:
+        return OperationBatch(self)
+
+    def tables(self) -> list[str]:
+        return self._proxy.tables()
+
+    def columns(self, table_name: str) -> list[str]:
+        return self._proxy.columns(table_name)
+
+    def rows_count(self, table_name: str) -> int:
+        return self._proxy.rows_count(table_name)
+
+    def stats(self) -> dict[str, Any]:
+        """Metrics of the server's `DBManager`, if it has them enabled"""
+        return self._proxy.stats()
+
+    def select_columns(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list | None = None,
+        order_by: str | list[str] | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> dict[str, list[Any]]:
+        """Values of the matching rows by column name, fetched in one call
+
+        `where` is a predicate in list form, see `server.service.build_where`.
+        """
+        result = self._proxy.select(table_name, columns, where, order_by, descending, limit)
+        return {
+            name: list(map(_decoder(column_type), values))
+            for name, column_type, values in zip(
+                result["columns"], result["types"], result["data"]
+            )
+        }
+
+    def select(self, *args, **kwargs) -> list[list[Any]]:
+        """Like `select_columns`, but as a list of rows"""
+        return [list(row) for row in zip(*self.select_columns(*args, **kwargs).values())]
+
+
+def _decoder(column_type: str) -> Callable[[Any], Any]:
+    column_class = COLUMN_CLASSES[column_type]
+    return column_class("value").create_buffer().decode
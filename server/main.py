@@ -0,0 +1,87 @@
+"""Serve a database over Pyro5.
+
+    python -m server.main --db shop.cdb --port 9090
+
+Clients connect with `server.client.RemoteDB("PYRO:customdb@host:9090")`,
+or `"PYRONAME:customdb"` when the service is registered with a name server.
+"""
+from __future__ import annotations
+
+import argparse
+
+import Pyro5.api
+from Pyro5 import config
+
+from models.db_manager import DBManager
+
+from .service import DBService
+
+
+def serve(
+    db_manager: DBManager,
+    host: str = "localhost",
+    port: int = 9090,
+    name: str = "customdb",
+    use_name_server: bool = False,
+    threads: int = 16,
+) -> None:
+    """Serve `db_manager` until the process is stopped."""
+    daemon, _ = create_daemon(db_manager, host, port, name, use_name_server, threads)
+    with daemon:
+        daemon.requestLoop()
+
+
+def create_daemon(
+    db_manager: DBManager,
+    host: str = "localhost",
+    port: int = 9090,
+    name: str = "customdb",
+    use_name_server: bool = False,
+    threads: int = 16,
+) -> tuple[Pyro5.api.Daemon, Pyro5.api.URI]:
+    """Daemon serving `db_manager`, not yet running, and the URI it is served at."""
+    # every connection is handled by a thread of a pool
+    config.SERVERTYPE = "thread"
+    config.THREADPOOL_SIZE = threads
+    daemon = Pyro5.api.Daemon(host=host, port=port)
+    uri = daemon.register(DBService(db_manager), objectId=name)
+    if use_name_server:
+        with Pyro5.api.locate_ns() as name_server:
+            name_server.register(name, uri)
+    return daemon, uri
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a database over Pyro5")
+    parser.add_argument("--db", help="database file to open, a new DB is created if omitted")
+    parser.add_argument("--create", default="db", help="name of the new DB")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--name", default="customdb", help="object id and name server name")
+    parser.add_argument("--ns", action="store_true", help="register with a Pyro5 name server")
+    parser.add_argument("--threads", type=int, default=16)
+    arguments = parser.parse_args()
+
+    db_manager = DBManager()
+    if arguments.db:
+        db_manager.open_database(arguments.db)
+    else:
+        db_manager.create_database(arguments.create)
+    try:
+        daemon, uri = create_daemon(
+            db_manager,
+            arguments.host,
+            arguments.port,
+            arguments.name,
+            arguments.ns,
+            arguments.threads,
+        )
+        print(f"Serving {uri}")
+        with daemon:
+            daemon.requestLoop()
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Pyro5 serializer hooks for the values stored in tables.
+
+Serpent turns `time` into a string and does not know `Interval` or the
+column classes, so they travel as tagged dicts and are rebuilt on the
+other side. Both the server and the client register the hooks on import.
+"""
+from datetime import time
+
+from interval import Interval
+from Pyro5.api import register_class_to_dict, register_dict_to_class
+
+from models.column import COLUMN_CLASSES, Column
+from models.storage import micros_to_time, time_to_micros
+
+
+def _time_to_dict(value: time) -> dict:
+    return {"__class__": "time", "micros": time_to_micros(value)}
+
+
+def _time_from_dict(_: str, data: dict) -> time:
+    return micros_to_time(data["micros"])
+
+
+def _interval_to_dict(value: Interval) -> dict:
+    return {
+        "__class__": "Interval",
+        "lower": time_to_micros(value.lower_bound),
+        "upper": time_to_micros(value.upper_bound),
+        "lower_closed": bool(value.lower_closed),
+        "upper_closed": bool(value.upper_closed),
+    }
+
+
+def _interval_from_dict(_: str, data: dict) -> Interval:
+    return Interval(
+        micros_to_time(data["lower"]),
+        micros_to_time(data["upper"]),
+        lower_closed=data["lower_closed"],
+        upper_closed=data["upper_closed"],
+    )
+
+
+def _column_to_dict(column: Column) -> dict:
+    return {
+        "__class__": "Column",
+        "type": column.type,
+        "name": column.name,
+        "default": column.default,
+        "options": column.options(),
+    }
+
+
+def _column_from_dict(_: str, data: dict) -> Column:
+    default = data["default"]
+    if isinstance(default, dict):  # nested values are not rebuilt by Pyro
+        default = {"time": _time_from_dict, "Interval": _interval_from_dict}[
+            default["__class__"]
+        ](default["__class__"], default)
+    return COLUMN_CLASSES[data["type"]](data["name"], default, **data.get("options", {}))
+
+
+def register() -> None:
+    register_class_to_dict(time, _time_to_dict)
+    register_dict_to_class("time", _time_from_dict)
+    register_class_to_dict(Interval, _interval_to_dict)
+    register_dict_to_class("Interval", _interval_from_dict)
+    for column_class in COLUMN_CLASSES.values():
+        register_class_to_dict(column_class, _column_to_dict)
+    register_dict_to_class("Column", _column_from_dict)
+
+
+register()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from typing import Any
+
+from Pyro5.api import behavior, expose
+
+from models.db_manager import DBManager, check_transaction
+from models.query import Expr, col
+from models.row import Row
+from models.table import Table
+
+from . import serializers  # noqa: F401 - registers the serializer hooks
+
+
+OPERATIONS = {
+    "create_database",
+    "add_table",
+    "delete_table",
+    "add_column",
+    "add_row",
+    "add_rows",
+    "change_row",
+    "change_columns",
+    "rename_column",
+    "delete_row",
+    "delete_rows",
+    "compact",
+    "create_index",
+    "commit",
+    # saves to the file the server opened; clients cannot choose a path
+    "checkpoint",
+}
+COLUMN_TESTS = {"between", "isin", "startswith", "endswith", "contains", "overlaps"}
+COMPARISON_METHODS = {
+    "==": "__eq__",
+    "!=": "__ne__",
+    "<": "__lt__",
+    "<=": "__le__",
+    ">": "__gt__",
+    ">=": "__ge__",
+}
+
+
+def build_where(spec: list | None) -> Expr | None:
+    """Predicate from its list form, e.g. `["and", [">", "amount", 10], ["isin", "name", ["a"]]]`"""
+    if spec is None:
+        return None
+    op, *operands = spec
+    if op in ("and", "or"):
+        expr = build_where(operands[0])
+        for operand in operands[1:]:
+            expr = expr & build_where(operand) if op == "and" else expr | build_where(operand)
+        return expr
+    if op == "not":
+        return ~build_where(operands[0])
+    column_name, *arguments = operands
+    if op in COMPARISON_METHODS:
+        return getattr(col(column_name), COMPARISON_METHODS[op])(*arguments)
+    if op in COLUMN_TESTS:
+        return getattr(col(column_name), op)(*arguments)
+    raise ValueError(f"Unknown predicate operator '{op}'!")
+
+
+def _result(value: Any) -> Any:
+    """Remote-friendly form of a `DBManager` result."""
+    if isinstance(value, Row):
+        return value.values
+    if isinstance(value, Table):
+        return value.name
+    return value
+
+
+@expose
+@behavior(instance_mode="single")
+class DBService:
+    """`DBManager` served over Pyro5, with batched operations and columnar reads.
+
+    One instance serves every client; `DBManager` serializes the mutations.
+    """
+
+    def __init__(self, db_manager: DBManager) -> None:
+        self._db_manager = db_manager
+
+    def execute(self, operations: list[list]) -> list[Any]:
+        """Run `[name, args]` or `[name, args, kwargs]` operations in one call
+
+        Consecutive `add_row`s of the same table are added as one batch.
+        Returns the result of every operation.
+        """
+        results: list[Any] = []
+        position = 0
+        while position < len(operations):
+            name, args, kwargs = self._operation(operations[position])
+            if name == "add_row" and not kwargs:
+                table_name = args[0]
+                rows = []
+                while position < len(operations):
+                    name, args, kwargs = self._operation(operations[position])
+                    if name != "add_row" or kwargs or args[0] != table_name:
+                        break
+                    rows.append(args[1])
+                    position += 1
+                self._db_manager.add_batch(table_name, rows)
+                results.extend([None] * len(rows))
+                continue
+            results.append(_result(getattr(self._db_manager, name)(*args, **kwargs)))
+            position += 1
+        return results
+
+    @staticmethod
+    def _operation(operation: list) -> tuple[str, list, dict]:
+        name, args, kwargs = (*operation, {})[:3]
+        if name not in OPERATIONS:
+            raise ValueError(f"Operation should be one of {sorted(OPERATIONS)}, got '{name}'!")
+        if name == "commit":
+            # the operations of a transaction are run by name too
+            check_transaction(kwargs.get("operations", args[0] if args else []))
+        return name, args, kwargs
+
+    def select(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        where: list | None = None,
+        order_by: str | list[str] | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> dict[str, Any]:
+        """Matching rows as columns of stored values, see `RemoteDB.select`"""
+        table = self._db_manager.get_table(table_name).snapshot()
+        result = table.select(columns, build_where(where), order_by, descending, limit)
+        positions = list(result.row_positions())
+        column_positions = [table._get_column_position(name) for name in result.columns]
+        return {
+            "columns": result.columns,
+            "types": [table._columns[position].type for position in column_positions],
+            "data": [
+                list(table._buffers[position].take(positions))
+                for position in column_positions
+            ],
+        }
+
+    def tables(self) -> list[str]:
+        return list(self._db_manager.db.tables)
+
+    def columns(self, table_name: str) -> list[str]:
+        return self._db_manager.get_table(table_name).columns
+
+    def rows_count(self, table_name: str) -> int:
+        return self._db_manager.get_table(table_name).rows_count
+
+    def stats(self) -> dict[str, Any]:
+        return self._db_manager.stats()
@@ -0,0 +1,88 @@
+import datetime
+
+import pytest
+from interval import Interval
+
+from models.column import IntCol, RealCol, StringCol, TimeCol, TimeIntervalCol
+from models.query import col
+from models.table import Table
+
+
+@pytest.fixture
+def table():
+    table = Table("test")
+    table.add_column(StringCol("name"))
+    table.add_column(IntCol("amount"))
+    table.add_column(RealCol("price"))
+    table.add_column(TimeCol("time"))
+    table.add_column(TimeIntervalCol("slot"))
+    table.add_rows(
+        [
+            [
+                "ab"[i % 2],
+                i,
+                i / 2,
+                datetime.time(i % 3, i),
+                Interval(datetime.time(1), datetime.time(1, i)),
+            ]
+            for i in range(1, 13)
+        ]
+    )
+    table.delete_rows([11])  # the row with amount 12
+    return table
+
+
+def test_aggregate_by_column(table):
+    result = table.aggregate(
+        ["name"],
+        {"amount": ["sum", "min", "max", "mean", "count"], "slot": ["duration"]},
+    )
+
+    assert result == [
+        ["a", 30, 2, 10, 6.0, 5, datetime.timedelta(minutes=30)],
+        ["b", 36, 1, 11, 6.0, 6, datetime.timedelta(minutes=36)],
+    ]
+
+
+def test_aggregate_by_time_bucket_with_filter(table):
+    result = table.aggregate(
+        [("time", "hour"), "name"], {"price": ["sum"]}, where=col("amount") > 3
+    )
+
+    assert result == [
+        [datetime.time(0), "a", 3.0],
+        [datetime.time(0), "b", 4.5],
+        [datetime.time(1), "a", 7.0],
+        [datetime.time(1), "b", 3.5],
+        [datetime.time(2), "a", 4.0],
+        [datetime.time(2), "b", 8.0],
+    ]
+
+
+def test_aggregate_whole_table_and_errors(table):
+    assert table.aggregate(aggs={"time": ["min", "max"], "name": ["count"]}) == [
+        [datetime.time(0, 3), datetime.time(2, 11), 11]
+    ]
+    assert Table("empty").aggregate() == [[]]
+
+    with pytest.raises(ValueError):
+        table.aggregate(aggs={"name": ["sum"]})
+    with pytest.raises(ValueError):
+        table.aggregate([("amount", "hour")])
+    with pytest.raises(ValueError):
+        table.aggregate(aggs={"amount": ["median"]})
+
+
+def test_aggregate_by_dictionary_codes():
+    table = Table("test")
+    table.add_column(StringCol("name", dictionary=True))
+    table.add_column(IntCol("amount"))
+    table.add_rows([["ba"[i % 2], i] for i in range(1, 7)])
+
+    assert table.aggregate(["name"], {"amount": ["count", "sum"]}) == [
+        ["a", 3, 9],
+        ["b", 3, 12],
+    ]
+    assert table.aggregate(
+        ["name"], {"amount": ["max"]}, where=col("amount") > 2
+    ) == [["a", 5], ["b", 6]]
@@ -1,10 +1,13 @@
 import datetime
+from array import array
 from typing import Type
 
 import interval
 import pytest
 
-from models.column import Column, IntCol, RealCol, CharCol, StringCol, TimeCol, TimeIntervalCol
+from models.column import (
+    Column, IntCol, RealCol, CharCol, StringCol, TimeCol, TimeIntervalCol, RowValidator
+)
 
 
 def test_column_default_validation():
@@ -59,4 +62,34 @@ def test_time_interval_col_validation():
     col = TimeIntervalCol("name")
     assert col.validate(interval.Interval(datetime.time(12, 23, 34),
                                           datetime.time(12, 23, 35)))
-    assert not col.validate("12:34:56:78 - 12:34:56:79")
\ No newline at end of file
+    assert not col.validate("12:34:56:78 - 12:34:56:79")
+
+def test_row_validator_fills_defaults_and_validates():
+    validator = RowValidator(
+        [IntCol("amount", 5), CharCol("char"), TimeIntervalCol("slot"), StringCol("name")]
+    )
+
+    assert validator.row({"amount": 0, "name": "a"}) == [
+        5, "_", TimeIntervalCol.DEFAULT, "a"
+    ]
+    with pytest.raises(TypeError, match="Column 'char'"):
+        validator.row({"char": "ab"})
+    with pytest.raises(TypeError, match="Column 'slot'"):
+        validator.row({"slot": datetime.time(1)})
+    with pytest.raises(TypeError, match="Column 'amount'"):
+        validator.row({"amount": 2 ** 63})
+
+
+def test_row_validator_takes_typed_arrays_as_they_are():
+    validator = RowValidator([IntCol("amount"), RealCol("price", 1.0), StringCol("name")])
+    amounts = array("q", [1, 2, 3])
+
+    columns = validator.columns(
+        {"amount": amounts, "price": array("d", [0.0, 2.0, 3.0])}, 3
+    )
+
+    assert columns[0] is amounts
+    assert list(columns[1]) == [1.0, 2.0, 3.0]
+    assert list(columns[2]) == ["", "", ""]
+    with pytest.raises(TypeError):
+        validator.columns({"amount": array("d", [1.5])}, 1)
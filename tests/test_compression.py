@@ -0,0 +1,45 @@
+from array import array
+
+import pytest
+
+from models.compression import CODECS, check_codec, decode_block, encode_block
+
+
+@pytest.mark.parametrize(
+    "values, steps",
+    [
+        (list(range(0, 3000, 3)), "rle+zlib"),
+        ([i * i for i in range(1000)], "delta+zlib"),
+        ([i % 7 for i in range(1000)], "zlib"),
+    ],
+)
+def test_integer_blocks_round_trip(values, steps):
+    data = array("q", values).tobytes()
+    encoded, used = encode_block(data, "zlib", delta=True)
+
+    assert used == steps
+    assert len(encoded) < len(data)
+    assert decode_block(encoded, used, "q") == data
+
+
+def test_decoding_swaps_foreign_byte_order():
+    values = array("q", range(100, 1100))
+    values.byteswap()
+    encoded, steps = encode_block(values.tobytes(), "lzma")
+
+    assert decode_block(encoded, steps, "q", swap=True) == array("q", range(100, 1100)).tobytes()
+
+
+def test_incompressible_blocks_are_stored_as_they_are():
+    data = bytes(range(256))
+
+    assert encode_block(data, "zlib") == (data, "")
+    assert decode_block(data, "", "B") == data
+
+
+@pytest.mark.skipif("zstd" in CODECS, reason="zstandard is installed")
+def test_optional_codecs_name_their_package():
+    check_codec("zlib")
+    with pytest.raises(ValueError) as exception_info:
+        check_codec("zstd")
+    assert "zstandard" in exception_info.value.args[0]
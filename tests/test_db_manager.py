@@ -1,12 +1,16 @@
+import operator
 import os.path
+import pickle
 from unittest.mock import patch
 
 import pytest
 
-from models.column import IntCol
+from models.column import IntCol, RealCol, StringCol
 from models.database import Database
 from models.db_manager import DBManager
+from models.query import col as table_col
 from models.table import Table
+from models.wal import read_records
 
 
 # fmt: off
@@ -88,7 +92,7 @@ def test_access_db_without_creating_or_opening():
 
 
 def test_save_database_file_creating():
-    file_name = "test_db.pkl"
+    file_name = "test_db.cdb"
     try:
         db_manager = DBManager()
         db_manager.create_database("test_db")
@@ -122,4 +126,177 @@ def test_open_database_is_same_as_saved():
             == opened_db.get_table("test_table").rows_count
         )
     finally:
-        os.remove("test_db.pkl")
+        os.remove("test_db.cdb")
+
+
+@pytest.mark.parametrize(
+    "format, content",
+    [
+        ("csv", "name,amount,price\na,1,1.5\n\"b,c\",2,\n"),
+        ("jsonl", '{"name": "a", "amount": 1, "price": 1.5}\n{"name": "b,c", "amount": 2}\n'),
+    ],
+)
+def test_bulk_load(format, content, tmp_path):
+    path = tmp_path / f"rows.{format}"
+    path.write_text(content)
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_column("test_table", StringCol("name"))
+    db_manager.add_column("test_table", RealCol("price"))
+
+    assert db_manager.bulk_load("test_table", str(path), format, batch_size=1) == 2
+    assert db_manager.get_table("test_table").rows == [[0, 1, "a", 1.5], [1, 2, "b,c", 0.0]]
+
+    with pytest.raises(ValueError):
+        db_manager.bulk_load("test_table", str(path), "xml")
+
+
+def test_open_database_pickled_before_dictionary_columns(tmp_path):
+    column = StringCol("name")
+    del column.dictionary
+    table = Table("test_table")
+    # the layout of tables pickled before the columnar storage
+    table.__dict__ = {"_name": "test_table", "_columns": [column], "_rows": [["a"], ["b"]]}
+    db = Database("test_db")
+    db.tables["test_table"] = table
+    path = str(tmp_path / "test_db.pkl")
+    with open(path, "wb") as file:
+        pickle.dump(db, file)
+
+    db_manager = DBManager()
+    db_manager.open_database(path)
+    assert db_manager.get_table("test_table").rows == [[0, "a"], [1, "b"]]
+
+
+def _transaction_db_manager():
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_column("test_table", StringCol("name"))
+    db_manager.create_index("test_table", "amount")
+    db_manager.add_row("test_table", {"amount": 1, "name": "a"})
+    return db_manager
+
+
+def test_transaction_is_applied_on_exit():
+    db_manager = _transaction_db_manager()
+    table = db_manager.get_table("test_table")
+
+    with db_manager.transaction():
+        for amount in range(2, 5):
+            assert db_manager.add_row("test_table", {"amount": amount}) is None
+        db_manager.change_row("test_table", 0, {"name": "b"})
+        assert table.rows_count == 1
+
+    assert table.rows == [[0, 1, "b"], [1, 2, ""], [2, 3, ""], [3, 4, ""]]
+    assert table.select(where=table_col("amount") == 3).to_list() == [[3, ""]]
+
+
+def test_transaction_is_dropped_when_block_raises():
+    db_manager = _transaction_db_manager()
+
+    with pytest.raises(RuntimeError):
+        with db_manager.transaction():
+            db_manager.add_row("test_table", {"amount": 2})
+            raise RuntimeError()
+
+    assert db_manager.get_table("test_table").rows_count == 1
+
+
+def test_failed_transaction_is_rolled_back():
+    db_manager = _transaction_db_manager()
+    table = db_manager.get_table("test_table")
+    rows = table.rows
+
+    with pytest.raises(TypeError):
+        with db_manager.transaction():
+            db_manager.add_row("test_table", {"amount": 2, "name": "b"})
+            db_manager.change_row("test_table", 0, {"amount": 5})
+            db_manager.rename_column("test_table", "name", "title")
+            db_manager.add_column("test_table", IntCol("count"))
+            db_manager.add_table("other_table")
+            db_manager.delete_row("test_table", 0)
+            db_manager.add_row("test_table", {"amount": "not a number"})
+
+    assert table.rows == rows
+    assert table.columns == ["index: int", "amount: int", "name: string"]
+    assert list(db_manager.db.tables) == ["test_table"]
+    assert table.select(where=table_col("amount") == 1).to_list() == [[1, "a"]]
+    assert table.select(where=table_col("amount") == 2).to_list() == []
+
+
+def test_rollback_undoes_compaction_and_schema_changes():
+    db_manager = _transaction_db_manager()
+    db_manager.add_row("test_table", {"amount": 2, "name": "b"})
+    db_manager.add_row("test_table", {"amount": 3, "name": "c"})
+    table = db_manager.get_table("test_table")
+    rows = table.rows
+
+    with pytest.raises(KeyError):
+        with db_manager.transaction():
+            db_manager.change_row("test_table", 2, {"amount": 1, "name": "d"})
+            db_manager.delete_rows("test_table", [0])
+            db_manager.compact("test_table")
+            db_manager.create_index("test_table", "name", "sorted")
+            db_manager.change_columns("test_table", [1, 0])
+            db_manager.add_row("test_table", {"amount": 4})
+            db_manager.delete_row("test_table", 0)
+            db_manager.rename_column("test_table", "missing", "other")
+
+    assert table.rows == rows
+    assert table.columns == ["index: int", "amount: int", "name: string"]
+    assert table.indexes == {"amount": "hash"}
+    assert table.select(where=table_col("amount") == 1).to_list() == [[1, "a"]]
+    assert table.select(where=table_col("amount") == 3).to_list() == [[3, "c"]]
+
+
+def test_transaction_changes_buffers_in_place():
+    db_manager = _transaction_db_manager()
+    table = db_manager.get_table("test_table")
+    buffers = list(table._buffers)
+    index = table._indexes["amount"]
+
+    with db_manager.transaction():
+        db_manager.change_row("test_table", 0, {"amount": 5})
+        db_manager.add_row("test_table", {"amount": 6})
+
+    assert all(map(operator.is_, table._buffers, buffers))
+    assert table._indexes["amount"] is index
+    assert table.rows == [[0, 5, "a"], [1, 6, ""]]
+
+
+def test_commit_applies_transaction_mutations_only(tmp_path):
+    db_manager = _transaction_db_manager()
+    path = str(tmp_path / "owned.pkl")
+
+    with pytest.raises(ValueError):
+        db_manager.commit([["save_database", [path, "pickle"]]])
+    with pytest.raises(ValueError):
+        db_manager.commit([["close", []]])
+    with pytest.raises(TypeError):
+        db_manager.commit([["compact", []]])
+
+    assert not os.path.exists(path)
+    assert db_manager.get_table("test_table").rows_count == 1
+
+
+def test_transaction_is_one_wal_record(tmp_path):
+    path = str(tmp_path / "test_db.cdb")
+    db_manager = _transaction_db_manager()
+    db_manager.save_database(path)
+    db_manager.enable_wal()
+
+    with db_manager.transaction():
+        db_manager.add_row("test_table", {"amount": 2})
+        db_manager.add_row("test_table", {"amount": 3})
+        db_manager.delete_row("test_table", 0)
+
+    assert [operation for _, operation, _ in read_records(f"{path}.wal")] == ["commit"]
+    db_manager._wal._file.close()  # crash without a checkpoint
+
+    replayed = DBManager()
+    replayed.open_database(path)
+    assert replayed.get_table("test_table").rows == [[0, 2, ""], [1, 3, ""]]
@@ -0,0 +1,88 @@
+import datetime
+import io
+import json
+
+import pytest
+from interval import Interval
+
+from models.column import IntCol, RealCol, StringCol, TimeCol, TimeIntervalCol
+from models.db_manager import DBManager
+
+
+@pytest.fixture
+def db_manager():
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    for name in ("test_table", "copy"):
+        db_manager.add_table(name)
+        db_manager.add_column(name, IntCol("amount"))
+        db_manager.add_column(name, RealCol("price"))
+        db_manager.add_column(name, StringCol("name"))
+        db_manager.add_column(name, TimeCol("time"))
+        db_manager.add_column(name, TimeIntervalCol("slot"))
+    db_manager.add_rows(
+        "test_table",
+        [
+            [
+                i + 1,
+                i / 4,
+                f'name, "{i}"',
+                datetime.time(i % 24, 0, 0, i),
+                Interval(datetime.time(1), datetime.time(2, i % 60), upper_closed=i % 2 == 0),
+            ]
+            for i in range(10)
+        ],
+    )
+    return db_manager
+
+
+@pytest.mark.parametrize("format", ["csv", "jsonl"])
+def test_export_round_trips_through_bulk_load(db_manager, format, tmp_path):
+    path = str(tmp_path / f"table.{format}")
+
+    assert db_manager.export_table("test_table", path, format) == 10
+    db_manager.bulk_load("copy", path, format)
+
+    assert db_manager.get_table("copy").rows == db_manager.get_table("test_table").rows
+
+
+def test_export_chunks_are_bounded(db_manager):
+    chunks = list(db_manager.get_table("test_table").export_chunks("jsonl", chunk_size=3))
+
+    assert [chunk.count("\n") for chunk in chunks] == [3, 3, 3, 1]
+    first = json.loads(chunks[0].splitlines()[0])
+    assert first["time"] == "00:00:00"
+    assert first["slot"] == "[01:00:00..02:00:00]"
+
+
+def test_export_to_stream_with_columns(db_manager):
+    stream = io.StringIO()
+
+    db_manager.get_table("test_table").export(stream, columns=["name", "amount"])
+
+    assert stream.getvalue().splitlines()[:2] == ["name,amount", '"name, ""0""",1']
+
+
+def test_export_to_arrow(db_manager, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    path = str(tmp_path / "table.arrow")
+
+    db_manager.get_table("test_table").export(path, "arrow", chunk_size=4)
+
+    with pa.ipc.open_stream(path) as reader:
+        batches = list(reader)
+    assert [batch.num_rows for batch in batches] == [4, 4, 2]
+    table = pa.Table.from_batches(batches)
+    assert table.column("amount").to_pylist() == list(range(1, 11))
+    assert table.column("time")[1].as_py() == datetime.time(1, 0, 0, 1)
+    assert table.column("slot")[1].as_py() == {
+        "lower": datetime.time(1),
+        "upper": datetime.time(2, 1),
+        "lower_closed": True,
+        "upper_closed": False,
+    }
+
+
+def test_unknown_export_format(db_manager):
+    with pytest.raises(ValueError):
+        db_manager.get_table("test_table").export_chunks("xml")
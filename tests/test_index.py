@@ -0,0 +1,161 @@
+import datetime
+import os
+
+import pytest
+
+from models.column import IntCol, StringCol, TimeCol
+from models.db_manager import DBManager
+from models.index import HashIndex, SortedIndex
+from models.query import col, index_candidates
+from models.table import Table
+
+
+@pytest.fixture
+def table():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    table.add_column(TimeCol("time"))
+    for amount, name in enumerate(["anna", "bob", "anna", "carl"]):
+        table.add_row(
+            {"amount": amount + 1, "name": name, "time": datetime.time(amount + 8)}
+        )
+    return table
+
+
+def test_hash_index_lookup():
+    index = HashIndex("name")
+    index.insert("a", 0)
+    index.insert("b", 1)
+    index.insert("a", 2)
+
+    assert index.lookup("a") == [0, 2]
+
+    index.remove("a", 0)
+
+    assert index.lookup("a") == [2]
+    assert index.lookup("b") == [1]
+
+
+def test_sorted_index_range():
+    index = SortedIndex("amount")
+    for row, key in enumerate([5, 1, 3, 3, 9]):
+        index.insert(key, row)
+
+    assert index.range(3, 5) == [0, 2, 3]
+    assert index.range(3, 5, low_inclusive=False) == [0]
+    assert index.range(high=3, high_inclusive=False) == [1]
+    assert index.range(low=6) == [4]
+
+
+def test_create_index(table):
+    table.create_index("name")
+    assert table.indexes == {"name": "hash"}
+
+    with pytest.raises(ValueError) as exception_info:
+        table.create_index("name", kind="sorted")
+    assert exception_info.value.args[0] == "Column 'name' is already indexed!"
+
+    with pytest.raises(ValueError):
+        table.create_index("amount", kind="btree")
+
+
+def test_index_is_used_by_select(table):
+    table.create_index("name")
+    table.create_index("time", kind="sorted")
+
+    assert index_candidates(table, col("name") == "anna") == [0, 2]
+    where = (col("time") > datetime.time(8)) & (col("time") <= datetime.time(10))
+    assert index_candidates(table, where) == [1, 2]
+    assert index_candidates(table, col("amount") == 1) is None
+
+    where = (col("name") == "anna") & (col("amount") > 1)
+    assert table.select(["amount"], where=where).to_list() == [[3]]
+
+
+def test_index_follows_mutations(table):
+    table.create_index("name")
+    table.create_index("amount", kind="sorted")
+
+    table.delete_row(0)
+    table.change_row(0, {"name": "anna", "amount": 10})
+    table.add_row({"name": "bob", "amount": 7})
+    table.change_columns([2, 1, 0])
+    table.rename_column("name", "first_name")
+
+    assert table.select(["amount"], where=col("first_name") == "anna").to_list() == [
+        [10],
+        [3],
+    ]
+    assert table.select(["amount"], where=col("amount") >= 5).count() == 2
+    # indexes hold row ids, which deletes do not shift
+    assert table._indexes["first_name"].lookup("bob") == [4]
+
+
+def test_index_survives_save_and_open(table):
+    try:
+        db_manager = DBManager()
+        db_manager.create_database("test_db")
+        db_manager.db.tables["test"] = table
+        table.create_index("name")
+        path = db_manager.save_database()
+
+        db_manager.open_database(path)
+
+        opened = db_manager.get_table("test")
+        assert opened.indexes == {"name": "hash"}
+        assert index_candidates(opened, col("name") == "bob") == [1]
+    finally:
+        os.remove("test_db.cdb")
+
+
+def test_interval_index_against_scan():
+    import random
+
+    from interval import Interval
+    from models.column import TimeIntervalCol
+    from models.index import IntervalIndex
+
+    def at(minutes):
+        return datetime.time(minutes // 60, minutes % 60)
+
+    table = Table("test")
+    table.add_column(TimeIntervalCol("slot"))
+    generator = random.Random(0)
+    for _ in range(200):
+        start = generator.randrange(0, 23 * 60)
+        table.add_row({"slot": Interval(at(start), at(start + generator.randrange(0, 60)))})
+
+    query = Interval(at(9 * 60), at(10 * 60 + 30))
+    expected = table.select(where=col("slot").overlaps(query)).to_list()
+
+    assert table.overlapping("slot", query).to_list() == expected
+    assert isinstance(table._indexes["slot"], IntervalIndex)
+
+    for index in range(0, 100, 3):
+        table.delete_row(index)
+    table.change_row(0, {"slot": Interval(at(9 * 60), at(9 * 60 + 10))})
+    table.add_row({"slot": Interval(at(10 * 60 + 30), at(11 * 60), lower_closed=False)})
+
+    index = table._indexes["slot"]
+    table._indexes.clear()
+    expected = table.select(where=col("slot").overlaps(query)).to_list()
+    table._indexes["slot"] = index
+    assert table.overlapping("slot", query).to_list() == expected
+
+    rows = table.containing("slot", at(14 * 60 + 5)).to_list()
+    assert all(row[0].lower_bound <= at(14 * 60 + 5) <= row[0].upper_bound for row in rows)
+
+
+def test_interval_overlap_respects_open_ends():
+    from interval import Interval
+    from models.column import TimeIntervalCol
+
+    table = Table("test")
+    table.add_column(TimeIntervalCol("slot"))
+    table.add_row({"slot": Interval(datetime.time(9), datetime.time(10), upper_closed=False)})
+    table.add_row({"slot": Interval(datetime.time(10), datetime.time(11))})
+
+    assert table.containing("slot", datetime.time(10), ["slot"]).count() == 1
+    assert table.containing("slot", datetime.time(9, 30)).count() == 1
+    assert table.containing("slot", datetime.time(12)).count() == 0
@@ -0,0 +1,84 @@
+import datetime
+
+import pytest
+from interval import Interval
+
+from models.column import IntCol, StringCol, TimeIntervalCol
+from models.database import Database
+from models.join import join_method
+
+
+def make_db() -> Database:
+    db = Database("test_db")
+    people = db.add_table("people")
+    people.add_column(IntCol("id"))
+    people.add_column(StringCol("name"))
+    people.add_rows([[3, "c"], [1, "a"], [2, "b"], [4, "d"]])
+    orders = db.add_table("orders")
+    orders.add_column(IntCol("person"))
+    orders.add_column(IntCol("amount"))
+    orders.add_rows([[1, 10], [2, 20], [1, 30], [5, 50]])
+    return db
+
+
+def rows(batches) -> list:
+    return [row for batch in batches for row in batch]
+
+
+def test_hash_join():
+    db = make_db()
+
+    assert join_method(db.get_table("people"), db.get_table("orders"), ("id", "person")) == "hash"
+    assert rows(db.join("people", "orders", on=("id", "person"))) == [
+        [1, "a", 1, 10], [1, "a", 1, 30], [2, "b", 2, 20]
+    ]
+    assert rows(db.join("people", "orders", on=("id", "person"), how="left")) == [
+        [3, "c", None, None],
+        [1, "a", 1, 10],
+        [1, "a", 1, 30],
+        [2, "b", 2, 20],
+        [4, "d", None, None],
+    ]
+    with pytest.raises(ValueError):
+        db.join("people", "orders", on=("name", "person"))
+    with pytest.raises(ValueError):
+        db.join("people", "orders", on=("id", "person"), how="outer")
+
+
+def test_merge_join_streams_batches_by_key():
+    db = make_db()
+    db.get_table("people").create_index("id", "sorted")
+    db.get_table("orders").create_index("person", "sorted")
+    db.get_table("people").delete_rows([2])
+
+    assert join_method(db.get_table("people"), db.get_table("orders"), ("id", "person")) == "merge"
+    batches = list(db.join("people", "orders", on=("id", "person"), how="left", batch_size=2))
+    assert batches == [
+        [[1, "a", 1, 10], [1, "a", 1, 30]],
+        [[3, "c", None, None], [4, "d", None, None]],
+    ]
+
+
+def test_interval_join():
+    db = Database("test_db")
+    shifts = db.add_table("shifts")
+    shifts.add_column(StringCol("who"))
+    shifts.add_column(TimeIntervalCol("slot"))
+    calls = db.add_table("calls")
+    calls.add_column(IntCol("call"))
+    calls.add_column(TimeIntervalCol("slot"))
+
+    def slot(start: int, stop: int) -> Interval:
+        return Interval(datetime.time(start), datetime.time(stop))
+
+    shifts.add_rows([["x", slot(8, 12)], ["y", slot(12, 18)]])
+    calls.add_rows([[1, slot(9, 10)], [2, slot(11, 13)], [3, slot(19, 20)]])
+
+    assert [
+        [who, call]
+        for who, _, call, _ in rows(db.join("shifts", "calls", on="slot", how="left"))
+    ] == [["x", 1], ["x", 2], ["y", 2]]
+    assert [
+        [call, who]
+        for call, _, who, _ in rows(db.join("calls", "shifts", on="slot", how="left"))
+    ] == [[1, "x"], [2, "x"], [2, "y"], [3, None]]
@@ -0,0 +1,83 @@
+import os.path
+
+import pytest
+
+from models.column import IntCol
+from models.db_manager import DBManager
+from models.query import col
+
+
+def make_db_manager() -> DBManager:
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test")
+    db_manager.add_column("test", IntCol("amount"))
+    return db_manager
+
+
+def test_metrics_count_operations(tmp_path):
+    db_manager = make_db_manager()
+    with pytest.raises(ValueError):
+        db_manager.stats()
+
+    metrics = db_manager.enable_metrics()
+    db_manager.add_rows("test", [[i] for i in range(2000)], columns=["amount"])
+    assert db_manager.select("test", ["amount"], where=col("amount") >= 1997) == [[1997], [1998], [1999]]
+    with pytest.raises(TypeError):
+        db_manager.add_row("test", {"amount": "a"})
+    path = os.path.join(tmp_path, "test.cdb")
+    db_manager.save_database(path)
+    db_manager.change_row("test", 0, {"amount": 100})
+    db_manager.save_database(path)
+
+    stats = db_manager.stats()
+    assert stats["operations"]["add_batch"]["count"] == 1
+    assert stats["operations"]["add_row"]["errors"] == 1
+    assert stats["operations"]["save_database"]["latency_buckets"]["+Inf"] == 2
+    assert (stats["rows_scanned"], stats["rows_returned"]) == (2000, 3)
+    assert stats["bytes_written"] > 0
+    # the second save only rewrites the block holding the changed row
+    assert stats["blocks_reused"] > 0
+    assert stats["blocks_written"] > 0
+    assert "pages" not in stats["caches"]
+
+    db_manager.disable_metrics()
+    db_manager.add_row("test", {"amount": 1})
+    assert "add_row" not in vars(db_manager)
+    assert metrics.stats()["operations"]["add_row"]["count"] == 1
+
+
+def test_metrics_count_column_and_index_fault_ins(tmp_path):
+    db_manager = make_db_manager()
+    db_manager.add_column("test", IntCol("count"))
+    db_manager.add_rows("test", [[i, i] for i in range(10)])
+    db_manager.create_index("test", "amount")
+    path = os.path.join(tmp_path, "test.cdb")
+    db_manager.save_database(path)
+    db_manager.open_database(path)
+    db_manager.enable_metrics()
+
+    assert db_manager.select("test", ["count"], where=col("amount") == 3) == [[3]]
+    assert db_manager.select("test", ["count"], where=col("amount") == 4) == [[4]]
+
+    caches = db_manager.stats()["caches"]
+    assert (caches["columns"]["hits"], caches["columns"]["misses"]) == (2, 2)
+    assert (caches["indexes"]["hits"], caches["indexes"]["misses"]) == (1, 1)
+
+
+def test_metrics_prometheus_dump_and_profiles(tmp_path):
+    db_manager = make_db_manager()
+    profiled = []
+    db_manager.enable_metrics(profile_every=2, on_profile=lambda name, _: profiled.append(name))
+    for i in range(3):
+        db_manager.add_row("test", {"amount": i})
+
+    path = os.path.join(tmp_path, "metrics.prom")
+    db_manager.write_metrics(path)
+    with open(path) as file:
+        text = file.read()
+
+    assert 'customdb_operation_seconds_count{operation="add_row"} 3' in text
+    assert 'customdb_operation_seconds_bucket{operation="add_row",le="+Inf"} 3' in text
+    assert "customdb_rows_returned_total 0" in text
+    assert profiled == ["add_row", "add_row"]
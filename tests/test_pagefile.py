@@ -0,0 +1,365 @@
+import datetime
+import os
+
+import interval
+import pytest
+
+from models.column import IntCol, RealCol, CharCol, StringCol, TimeCol, TimeIntervalCol
+from models.db_manager import DBManager
+from models.pagefile import PageFile
+from models.query import col
+
+
+@pytest.fixture
+def db_manager():
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    for column in (
+        IntCol("amount"),
+        RealCol("price"),
+        CharCol("class"),
+        StringCol("name"),
+        TimeCol("time"),
+        TimeIntervalCol("slot", interval.Interval(datetime.time(1), datetime.time(2))),
+    ):
+        db_manager.add_column("test_table", column)
+    for i in range(3000):
+        db_manager.add_row(
+            "test_table",
+            {
+                "amount": i,
+                "price": i / 2,
+                "class": "ABC"[i % 3],
+                "name": f"name {i}",
+                "time": datetime.time(i % 24, i % 60),
+            },
+        )
+    db_manager.create_index("test_table", "name")
+    return db_manager
+
+
+def test_save_and_open_round_trip(db_manager, tmp_path):
+    path = str(tmp_path / "test.cdb")
+    expected = db_manager.get_table("test_table").rows
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path)
+    table = opened.get_table("test_table")
+
+    assert table.columns == db_manager.get_table("test_table").columns
+    assert table.get_column_by_name("slot").default == interval.Interval(
+        datetime.time(1), datetime.time(2)
+    )
+    assert table.rows == expected
+    assert table.indexes == {"name": "hash"}
+    assert table._indexes["name"].lookup("name 7") == [7]
+
+
+def test_open_is_lazy(db_manager, tmp_path):
+    path = str(tmp_path / "test.cdb")
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path)
+    table = opened.get_table("test_table")
+
+    assert table.rows_count == 3000
+    assert not any(buffer.is_loaded for buffer in table._buffers)
+
+    assert table.get_row(5)[0] == 5
+    assert [buffer.is_loaded for buffer in table._buffers] == [True] + [False] * 5
+
+
+def test_incremental_save_writes_changed_pages_only(db_manager, tmp_path, monkeypatch):
+    path = str(tmp_path / "test.cdb")
+    db_manager.save_database(path)
+    db_manager.open_database(path)
+
+    written = []
+    original_write_pages = PageFile._write_pages
+
+    def write_pages(self, page, data):
+        written.append(page)
+        original_write_pages(self, page, data)
+
+    monkeypatch.setattr(PageFile, "_write_pages", write_pages)
+    db_manager.change_row("test_table", 0, {"amount": -1})
+    db_manager.save_database(path)
+
+    # one data page and the catalog
+    assert len(written) == 2
+
+    opened = DBManager()
+    opened.open_database(path)
+    assert opened.get_table("test_table").get_row(0)[0] == -1
+    assert opened.get_table("test_table").get_row(2999)[3] == "name 2999"
+
+
+def test_write_under_a_snapshot_saves_changed_pages_only(db_manager, tmp_path):
+    path = str(tmp_path / "test.cdb")
+    db_manager.save_database(path)
+    db_manager.open_database(path)
+    table = db_manager.get_table("test_table")
+    table.get_row(0)[0]  # loaded before the snapshot, so the write copies it
+    snapshot = table.snapshot()
+
+    db_manager.change_row("test_table", 0, {"amount": -1})
+    page_file = db_manager._page_file
+    written = page_file.bytes_written
+    db_manager.save_database(path)
+
+    assert table._buffers[0] is not snapshot._buffers[0]
+    # one data page, the catalog page and the header
+    assert page_file.bytes_written - written < 3 * page_file.page_size
+    opened = DBManager()
+    opened.open_database(path)
+    assert opened.get_table("test_table").get_row(0)[0] == -1
+
+
+def test_pages_are_reused_and_file_does_not_grow(db_manager, tmp_path):
+    path = tmp_path / "test.cdb"
+    db_manager.save_database(str(path))
+
+    for i in range(3):
+        db_manager.change_row("test_table", i * 1000, {"amount": -i})
+        db_manager.save_database(str(path))
+    size = path.stat().st_size
+
+    for i in range(3):
+        db_manager.change_row("test_table", i * 1000, {"amount": i})
+        db_manager.save_database(str(path))
+
+    assert path.stat().st_size <= size
+
+
+def test_interrupted_save_keeps_previous_version(db_manager, tmp_path, monkeypatch):
+    path = str(tmp_path / "test.cdb")
+    db_manager.save_database(path)
+
+    def fail(*args):
+        raise OSError("disk unplugged")
+
+    monkeypatch.setattr(PageFile, "_write_header", fail)
+    db_manager.change_row("test_table", 0, {"amount": -1})
+    with pytest.raises(OSError):
+        db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path)
+    assert opened.get_table("test_table").get_row(0)[0] == 0
+
+
+def test_pickle_export_and_import(db_manager, tmp_path):
+    path = str(tmp_path / "test.pkl")
+    db_manager.save_database(str(tmp_path / "test.cdb"))
+    db_manager.open_database(str(tmp_path / "test.cdb"))
+
+    db_manager.save_database(path, format="pickle")
+    opened = DBManager()
+    opened.open_database(path)
+
+    assert opened.get_table("test_table").rows == db_manager.get_table("test_table").rows
+
+    with pytest.raises(ValueError):
+        db_manager.save_database(path, format="csv")
+
+
+def test_open_with_mmap_is_zero_copy_and_read_only(db_manager, tmp_path):
+    from models.query import col
+
+    path = str(tmp_path / "test.cdb")
+    expected = db_manager.get_table("test_table").rows
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path, mmap=True)
+    table = opened.get_table("test_table")
+
+    assert table.rows == expected
+    assert isinstance(table._buffers[0]._data, memoryview)
+    assert table.column_view("amount")[10] == 10
+    assert table.select(["name"], where=col("amount") == 7).to_list() == [["name 7"]]
+
+    with pytest.raises(ValueError) as exception_info:
+        opened.add_row("test_table", {"amount": 1})
+    assert exception_info.value.args[0] == "Table 'test_table' is read-only!"
+
+    with pytest.raises(ValueError):
+        opened.save_database(path)
+
+
+def test_mmap_falls_back_to_copies_for_scattered_pages(db_manager, tmp_path):
+    path = str(tmp_path / "test.cdb")
+    db_manager.save_database(path)
+    db_manager.change_row("test_table", 0, {"amount": -1})
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path, mmap=True)
+    table = opened.get_table("test_table")
+
+    assert table.get_row(0)[0] == -1
+    assert not isinstance(table._buffers[0]._data, memoryview)
+    assert isinstance(table._buffers[1]._data, memoryview)
+
+    export = str(tmp_path / "export.pkl")
+    opened.save_database(export, format="pickle")
+    reopened = DBManager()
+    reopened.open_database(export)
+    reopened.add_row("test_table", {"amount": 1})
+    assert reopened.get_table("test_table").rows_count == 3001
+
+
+def test_deleted_rows_survive_save_and_open(tmp_path):
+    path = str(tmp_path / "test_db.cdb")
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_rows("test_table", [[i] for i in range(100)])
+    db_manager.create_index("test_table", "amount")
+    db_manager.delete_rows("test_table", list(range(0, 100, 2)))
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path)
+    table = opened.get_table("test_table")
+    assert table.rows_count == 50
+    assert table.get_row(0).id == 1
+    assert table.select(where=col("amount") == 4).to_list() == []
+    assert table.select(where=col("amount") == 5).to_list() == [[5]]
+
+
+def test_open_leaves_tombstones_and_indexes_on_disk(tmp_path, monkeypatch):
+    path = str(tmp_path / "test_db.cdb")
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_rows("test_table", [[i % 10] for i in range(100)])
+    db_manager.create_index("test_table", "amount", "sorted")
+    db_manager.delete_rows("test_table", [3, 13])
+    db_manager.save_database(path)
+
+    read = []
+    original_read_stream = PageFile._read_stream
+
+    def read_stream(self, record):
+        read.append(record)
+        return original_read_stream(self, record)
+
+    monkeypatch.setattr(PageFile, "_read_stream", read_stream)
+    opened = DBManager()
+    opened.open_database(path)
+    table = opened.get_table("test_table")
+    assert table.rows_count == 98
+    assert read == []
+
+    opened.add_row("test_table", {"amount": 3})
+    assert table._indexes["amount"].lookup(3) == [23, 33, 43, 53, 63, 73, 83, 93, 100]
+    opened.delete_row("test_table", 0)
+    assert table.select(where=col("amount") == 0).to_list()[0] == [0]
+    assert table.rows_count == 98
+
+
+def test_indexes_left_on_disk_survive_a_save_to_another_file(tmp_path):
+    path = str(tmp_path / "test_db.cdb")
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_rows("test_table", [[i % 10] for i in range(100)])
+    db_manager.create_index("test_table", "amount")
+    db_manager.delete_rows("test_table", [3, 13])
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path)
+    # the file the index would be built from is closed by the save
+    opened.save_database(str(tmp_path / "copy.cdb"))
+    index = opened.get_table("test_table")._indexes["amount"]
+    assert index.lookup(3) == [23, 33, 43, 53, 63, 73, 83, 93]
+
+
+def test_added_column_defaults_stay_unwritten(tmp_path):
+    path = str(tmp_path / "test_db.cdb")
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_rows("test_table", [[i] for i in range(10)])
+    db_manager.add_column("test_table", TimeCol("time", datetime.time(1)))
+    db_manager.add_row("test_table", {"amount": 10, "time": datetime.time(2)})
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path)
+    table = opened.get_table("test_table")
+    assert [row[2] for row in table.rows] == [datetime.time(1)] * 10 + [datetime.time(2)]
+    assert table._buffers[1].prefix == 10
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_dictionary_and_wide_char_columns_round_trip(tmp_path, mmap):
+    path = str(tmp_path / "test_db.cdb")
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", StringCol("city", dictionary=True))
+    db_manager.add_column("test_table", CharCol("class"))
+    db_manager.add_rows(
+        "test_table", [[f"city {i % 300}", "aж"[i % 2]] for i in range(1000)]
+    )
+    db_manager.save_database(path)
+
+    opened = DBManager()
+    opened.open_database(path, mmap=mmap)
+    table = opened.get_table("test_table")
+    assert table.get_column_by_name("city").dictionary
+    assert table.rows == db_manager.get_table("test_table").rows
+    assert table.select(["class"], where=col("city") == "city 299").to_list() == [["ж"]] * 3
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_compressed_save_and_open_round_trip(db_manager, tmp_path, codec):
+    plain, compressed = str(tmp_path / "plain.cdb"), str(tmp_path / "compressed.cdb")
+    expected = db_manager.get_table("test_table").rows
+    db_manager.save_database(plain)
+    db_manager.save_database(compressed, codec=codec)
+
+    assert os.path.getsize(compressed) < os.path.getsize(plain)
+    amounts = PageFile.open(compressed)._catalog["tables"][0]["columns"][0]["streams"][0]
+    assert {block[4] for block in amounts["blocks"]} == {f"rle+{codec}"}
+
+    for mmap in (False, True):
+        opened = DBManager()
+        opened.open_database(compressed, mmap=mmap)
+        assert opened.get_table("test_table").rows == expected
+
+
+def test_compressed_saves_rewrite_changed_blocks_only(db_manager, tmp_path):
+    path = str(tmp_path / "test.cdb")
+    db_manager.save_database(path, codec="zlib")
+    db_manager.change_row("test_table", 0, {"amount": -1})
+    page_file = db_manager._page_file
+    written = page_file.blocks_written
+    # the file keeps its codec
+    db_manager.checkpoint()
+
+    assert page_file.blocks_written - written == 1
+    opened = DBManager()
+    opened.open_database(path)
+    assert opened.get_table("test_table").get_row(0)[0] == -1
+    assert opened._page_file.codec == "zlib"
+
+
+def test_unknown_codec(db_manager, tmp_path):
+    with pytest.raises(ValueError) as exception_info:
+        db_manager.save_database(str(tmp_path / "test.cdb"), codec="gzip")
+    assert exception_info.value.args[0].startswith("Codec should be one of ['zlib', 'lzma'")
+
+    with pytest.raises(ValueError):
+        db_manager.save_database(str(tmp_path / "test.pkl"), format="pickle", codec="zlib")
+
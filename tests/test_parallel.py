@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+from interval import Interval
+
+from models.column import IntCol, StringCol, TimeCol, TimeIntervalCol
+from models import parallel
+from models.parallel import SharedTable, _attach, partitions
+from models.query import col
+from models.table import Table
+
+
+def make_table() -> Table:
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    table.add_rows([[i, f"name {i % 3}"] for i in range(100)])
+    table.add_column(TimeCol("time"))
+    table.add_column(TimeIntervalCol("slot"))
+    table.add_rows(
+        [
+            [i, "late", datetime.time(i % 24), Interval(datetime.time(1), datetime.time(2))]
+            for i in range(100, 130)
+        ]
+    )
+    table.delete_rows(range(0, 130, 7))
+    return table
+
+
+def test_partitions():
+    assert partitions(10, 3) == [(0, 4), (4, 8), (8, 10)]
+    assert partitions(2, 4) == [(0, 1), (1, 2)]
+    assert partitions(0, 4) == []
+
+
+def test_shared_table_reads_like_the_table():
+    table = make_table()
+    blocks = []
+
+    with SharedTable(table, ["slot", "name", "amount"]) as shared:
+        attached = _attach(shared.spec, blocks)
+        assert attached.rows == [[i, slot, name, amount] for i, amount, name, _, slot in table.rows]
+        del attached
+        for block in blocks:
+            block.close()
+
+
+def test_parallel_scans_match_serial_scans():
+    table = make_table()
+    where = (col("amount") > 20) & col("name").startswith("name")
+    aggs = {"amount": ["count", "sum", "min", "max"], "slot": ["duration"]}
+
+    assert table.select(where=where, parallelism=3).to_list() == table.select(where=where).to_list()
+    assert table.aggregate(["name"], aggs, parallelism=2) == table.aggregate(["name"], aggs)
+    assert table.aggregate([("time", "hour")], aggs, where, parallelism=4) == table.aggregate(
+        [("time", "hour")], aggs, where
+    )
+    with pytest.raises(ValueError):
+        table.select(parallelism=0)
+
+
+def test_sharing_leaves_the_live_table_writable(monkeypatch):
+    table = make_table()
+    snapshot = table.snapshot()
+    shared_memory = parallel.shared_memory.SharedMemory
+
+    def create_while_writing(*args, **kwargs):
+        # the writer appends while a stream is being shared
+        table.add_row({"amount": 1})
+        return shared_memory(*args, **kwargs)
+
+    monkeypatch.setattr(parallel.shared_memory, "SharedMemory", create_while_writing)
+    with SharedTable(snapshot, ["amount", "time"]) as shared:
+        assert shared.spec["rows"] == snapshot._rows_count
+
@@ -0,0 +1,125 @@
+import datetime
+
+import pytest
+
+from models import query
+from models.column import IntCol, RealCol, CharCol, StringCol, TimeCol
+from models.query import col
+from models.table import Table
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def table(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(query, "np", None)
+    elif query.np is None:
+        pytest.skip("numpy is not installed")
+
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(RealCol("price"))
+    table.add_column(CharCol("class"))
+    table.add_column(StringCol("name"))
+    table.add_column(TimeCol("time"))
+    for amount, name in enumerate(["anna", "bob", "alex", "carl", "amy"]):
+        table.add_row(
+            {
+                "amount": amount * 10,
+                "price": amount * 1.5,
+                "class": name[0].upper(),
+                "name": name,
+                "time": datetime.time(amount + 8),
+            }
+        )
+    return table
+
+
+def test_select_all(table):
+    assert table.select(["amount"]).to_list() == [[0], [10], [20], [30], [40]]
+
+
+def test_select_with_combined_predicate(table):
+    result = table.select(
+        ["name", "amount"],
+        where=(col("amount") > 10) & col("name").startswith("a"),
+    )
+
+    assert result.to_list() == [["alex", 20], ["amy", 40]]
+
+
+def test_select_or_not_and_isin(table):
+    where = (col("class") == "B") | ~col("amount").isin([0, 10, 20])
+    assert table.select(["name"], where=where).to_list() == [["bob"], ["carl"], ["amy"]]
+
+
+def test_select_time_range(table):
+    where = col("time").between(datetime.time(9), datetime.time(10, 30))
+    assert table.select(["name"], where=where).to_list() == [["bob"], ["alex"]]
+
+
+def test_select_order_by_and_limit(table):
+    result = table.select(["name"], order_by="name", descending=True, limit=2)
+    assert result.to_list() == [["carl"], ["bob"]]
+
+    result = table.select(["name"], where=col("price") >= 1.5, limit=2)
+    assert result.to_list() == [["bob"], ["alex"]]
+    assert result.count() == 2
+
+
+def test_select_is_lazy(table):
+    result = table.select(["amount"], where=col("amount") >= 30)
+    table.add_row({"amount": 50})
+
+    assert result.to_list() == [[30], [40], [50]]
+
+
+def test_select_unknown_column(table):
+    with pytest.raises(KeyError) as exception_info:
+        table.select(["missing"])
+
+    assert exception_info.value.args[0] == "No column with name 'missing' found in table!"
+
+
+def test_order_by_and_overlaps_on_stored_times(table):
+    from interval import Interval
+    from models.column import TimeIntervalCol
+
+    def slot(start, stop, **closed):
+        return Interval(datetime.time(start), datetime.time(stop), **closed)
+
+    slots = Table("slots")
+    slots.add_column(TimeIntervalCol("slot"))
+    slots.add_column(TimeCol("time"))
+    for start, stop, closed in [(9, 12, {}), (8, 10, {}), (12, 13, {"lower_closed": False})]:
+        slots.add_row({"slot": slot(start, stop, **closed), "time": datetime.time(stop)})
+
+    assert table.select(["name"], order_by="time", descending=True, limit=2).to_list() == [
+        ["amy"], ["carl"]
+    ]
+    assert [row[0].lower_bound.hour for row in slots.select(["slot"], order_by="slot")] == [
+        8, 9, 12
+    ]
+    where = col("slot").overlaps(slot(10, 12))
+    assert slots.select(["time"], where=where).to_list() == [
+        [datetime.time(12)], [datetime.time(10)]
+    ]
+
+
+@pytest.mark.parametrize("engine", ["numpy", "python"])
+def test_equality_on_dictionary_codes(engine, monkeypatch):
+    if engine == "python":
+        monkeypatch.setattr(query, "np", None)
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("city", dictionary=True))
+    table.add_rows([[i, ["kyiv", "lviv", "odesa"][i % 3]] for i in range(9)])
+
+    def amounts(where):
+        return [row[0] for row in table.select(["amount"], where=where)]
+
+    assert amounts(col("city") == "lviv") == [1, 4, 7]
+    assert amounts((col("city") != "kyiv") & (col("amount") < 5)) == [1, 2, 4]
+    assert amounts(col("city").isin(["odesa", "rivne"])) == [2, 5, 8]
+    assert amounts(col("city") == "rivne") == []
+    assert len(amounts(col("city") != "rivne")) == 9
+    assert amounts(col("city") > "l") == [1, 2, 4, 5, 7, 8]
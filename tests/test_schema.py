@@ -0,0 +1,39 @@
+import pickle
+
+import pytest
+
+from models.column import IntCol, StringCol
+from models.schema import Schema
+from models.table import Table
+
+
+def test_schema_lookups_follow_changes():
+    schema = Schema([IntCol("amount"), StringCol("name")])
+
+    assert schema.position("name") == 1
+    assert schema.column("amount").type == "int"
+
+    schema.rename("name", "title")
+    schema.add(IntCol("count"))
+    schema.reorder([schema.column("count"), schema.column("title"), schema.column("amount")])
+
+    assert schema.names == ("count", "title", "amount")
+    assert schema.name_set == {"count", "title", "amount"}
+    assert schema.positions == {"count": 0, "title": 1, "amount": 2}
+    with pytest.raises(KeyError):
+        schema.position("name")
+
+
+def test_table_schema_survives_snapshot_and_pickle():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    snapshot = table.snapshot()
+
+    table.rename_column("name", "title")
+    table.change_columns([1, 0])
+
+    assert snapshot._schema.positions == {"amount": 0, "name": 1}
+    copied = pickle.loads(pickle.dumps(table))
+    assert copied._schema.positions == {"title": 0, "amount": 1}
+    assert copied.get_column_by_name("amount").type == "int"
@@ -0,0 +1,109 @@
+import datetime
+import threading
+
+import pytest
+from interval import Interval
+
+from models.column import CharCol, IntCol, StringCol, TimeCol, TimeIntervalCol
+from models.db_manager import DBManager
+from server.client import RemoteDB
+from server.main import create_daemon
+from server.service import DBService, build_where
+
+
+@pytest.fixture
+def service():
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    return DBService(db_manager)
+
+
+@pytest.fixture
+def remote(service):
+    daemon, uri = create_daemon(service._db_manager, port=0, name="test_db")
+    thread = threading.Thread(target=daemon.requestLoop, daemon=True)
+    thread.start()
+    with RemoteDB(uri) as remote:
+        yield remote
+    daemon.shutdown()
+    thread.join()
+
+
+def test_execute_batches_consecutive_rows(service, monkeypatch):
+    batches = []
+    add_batch = service._db_manager.add_batch
+    monkeypatch.setattr(
+        service._db_manager,
+        "add_batch",
+        lambda table_name, rows: batches.append(len(rows)) or add_batch(table_name, rows),
+    )
+
+    results = service.execute(
+        [
+            ["add_table", ["test_table"]],
+            ["add_column", ["test_table", IntCol("amount")]],
+            *(["add_row", ["test_table", {"amount": i}]] for i in range(1, 4)),
+            ["delete_row", ["test_table", 0]],
+            ["add_row", ["test_table", {"amount": 4}]],
+        ]
+    )
+
+    assert results == ["test_table", IntCol("amount"), None, None, None, [1], None]
+    assert batches == [3, 1]
+    with pytest.raises(ValueError):
+        service.execute([["open_database", ["/etc/passwd"]]])
+    with pytest.raises(ValueError):
+        service.execute([["save_database", ["/tmp/owned.pkl", "pickle"]]])
+    with pytest.raises(ValueError):
+        service.execute([["commit", [[["open_database", ["/etc/passwd"]]]]]])
+
+
+def test_build_where():
+    where = build_where(["and", [">", "amount", 1], ["not", ["isin", "name", ["a"]]]])
+
+    assert where.column_names() == {"amount", "name"}
+    with pytest.raises(ValueError):
+        build_where(["like", "name", "a%"])
+
+
+def test_remote_batch_and_columnar_select(remote):
+    slot = Interval(datetime.time(9), datetime.time(10), upper_closed=False)
+    with remote.batch() as batch:
+        batch.add_table("test_table")
+        for column in (
+            IntCol("amount"),
+            CharCol("class"),
+            StringCol("name"),
+            TimeCol("time"),
+            TimeIntervalCol("slot"),
+        ):
+            batch.add_column("test_table", column)
+        for i in range(1, 101):
+            batch.add_row(
+                "test_table",
+                {
+                    "amount": i,
+                    "class": "AB"[i % 2],
+                    "name": f"name {i}",
+                    "time": datetime.time(i % 24),
+                    "slot": slot,
+                },
+            )
+
+    assert len(batch.results) == 106
+    assert remote.rows_count("test_table") == 100
+    columns = remote.select_columns(
+        "test_table", where=["and", [">", "amount", 97], ["==", "class", "B"]]
+    )
+    assert columns == {
+        "amount": [99],
+        "class": ["B"],
+        "name": ["name 99"],
+        "time": [datetime.time(3)],
+        "slot": [slot],
+    }
+    assert remote.select("test_table", ["amount"], order_by="amount", descending=True, limit=2) == [
+        [100],
+        [99],
+    ]
+    assert remote.delete_row("test_table", 0)[0] == 1
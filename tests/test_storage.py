@@ -0,0 +1,115 @@
+import datetime
+
+import interval
+import pytest
+
+from models.storage import (
+    IntBuffer,
+    RealBuffer,
+    CharBuffer,
+    StringBuffer,
+    DictionaryBuffer,
+    TimeBuffer,
+    IntervalBuffer,
+    PaddedBuffer,
+)
+
+
+# fmt: off
+@pytest.mark.parametrize(
+    "buffer_class, values",
+    [
+        (IntBuffer, [1, -2, 3]),
+        (RealBuffer, [1.5, -2.0, 3.25]),
+        (CharBuffer, ["a", "é", "z"]),
+        (StringBuffer, ["John", "", "Сніг"]),
+        (DictionaryBuffer, ["John", "", "Сніг"]),
+        (TimeBuffer, [datetime.time(0, 0), datetime.time(12, 23, 34, 5), datetime.time(23, 59, 59)]),
+        (
+            IntervalBuffer,
+            [
+                interval.Interval(datetime.time(1), datetime.time(2)),
+                interval.Interval(datetime.time(3), datetime.time(4), lower_closed=False),
+                interval.Interval(datetime.time(5), datetime.time(6), upper_closed=False),
+            ],
+        ),
+    ],
+)
+# fmt: on
+def test_buffer_round_trip(buffer_class, values):
+    buffer = buffer_class()
+    buffer.extend(values[:2])
+    buffer.append(values[2])
+
+    assert len(buffer) == 3
+    assert list(buffer) == values
+    assert [buffer[i] for i in range(3)] == values
+
+    buffer[0] = values[2]
+    del buffer[1]
+
+    assert list(buffer) == [values[2], values[2]]
+
+
+def test_string_buffer_reclaims_overwritten_values():
+    buffer = StringBuffer()
+    buffer.extend(["x" * 1000] * 10)
+
+    for i in range(10):
+        buffer[i] = "y"
+
+    assert list(buffer) == ["y"] * 10
+    assert len(buffer._blob) < 10 * 1000
+
+
+def test_char_buffer_widens_for_larger_code_points():
+    buffer = CharBuffer()
+    buffer.extend(["a", "é"])
+    assert buffer._data.typecode == "B"
+
+    buffer.append("ж")
+    assert buffer._data.typecode == "H"
+    buffer[0] = "😀"
+
+    assert buffer._data.typecode == "I"
+    assert list(buffer) == ["😀", "é", "ж"]
+
+
+def test_dictionary_buffer_stores_each_value_once():
+    buffer = DictionaryBuffer()
+    buffer.extend(["x", "y", "x"])
+    buffer[2] = "z"
+
+    assert buffer.dictionary == ["x", "y", "z"]
+    assert list(buffer.codes(0, 3)) == [0, 1, 2]
+    assert list(buffer.take_codes([2, 0])) == [2, 0]
+    assert buffer.code("y") == 1 and buffer.code("w") is None
+
+    buffer.extend(f"v{i}" for i in range(300))
+    assert buffer._codes.typecode == "H"
+
+    loaded = DictionaryBuffer()
+    loaded.use_typecodes([stream.typecode for stream in buffer.streams()[:1]])
+    loaded.load_streams([bytes(stream) for stream in buffer.streams()])
+    assert list(loaded) == list(buffer)
+    assert loaded.code("z") == 2
+
+
+@pytest.mark.parametrize("inner_class", [IntBuffer, StringBuffer])
+def test_padded_buffer_reads_defaults_before_its_values(inner_class):
+    default, value = (0, 7) if inner_class is IntBuffer else ("", "x")
+    buffer = PaddedBuffer(inner_class(), 3, default)
+    buffer.extend([value, value])
+
+    assert len(buffer) == 5
+    assert buffer.values(2, 5) == [default, value, value]
+    assert list(buffer.scan(1, 4)) == [default, default, value]
+    assert list(buffer.take([4, 0])) == [value, default]
+    assert buffer.raw(1) == default
+
+    buffer[1] = value
+    assert buffer.prefix == 0
+    assert list(buffer) == [default, value, default, value, value]
+
+    buffer.truncate(2)
+    assert list(buffer) == [default, value]
@@ -1,8 +1,13 @@
 import datetime
+from array import array
+import threading
 
 import pytest
+from interval import Interval
 
-from models.column import IntCol, StringCol, CharCol, TimeCol, TimeIntervalCol
+from models.column import IntCol, RealCol, StringCol, CharCol, TimeCol, TimeIntervalCol
+from models.query import col
+from models.storage import PaddedBuffer
 from models.table import Table
 
 
@@ -125,3 +130,310 @@ def test_delete_row():
 
     with pytest.raises(IndexError):
         table.delete_row(10)
+
+
+def test_row_is_view_over_table():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    row = table.add_row({"amount": 10, "name": "a"})
+
+    table.change_row(0, {"name": "b"})
+    assert row.values == [10, "b"]
+
+    table.change_columns([1, 0])
+    assert row.values == ["b", 10]
+    assert table.rows == [[0, "b", 10]]
+
+
+def test_deleted_row_keeps_its_values():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_row({"amount": 10})
+    table.add_row({"amount": 20})
+
+    deleted = table.delete_row(0)
+
+    assert deleted.values == [10]
+    assert table.get_row(0).values == [20]
+
+
+def test_add_row_out_of_storage_range():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+
+    with pytest.raises(TypeError):
+        table.add_row({"name": "a", "amount": 2 ** 64})
+
+    assert table.rows_count == 0
+    assert table.rows == []
+
+
+def test_add_rows_in_batches():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name", "none"))
+    table.create_index("amount", "sorted")
+
+    assert table.add_rows(({"amount": i} for i in range(5)), batch_size=2) == 5
+    assert table.add_rows([("e", 5), ("f", 6)], columns=["name", "amount"]) == 2
+
+    assert table.rows[4:] == [[4, 4, "none"], [5, 5, "e"], [6, 6, "f"]]
+    assert table.select(where=col("amount") >= 4).count() == 3
+
+
+def test_add_rows_rejects_a_whole_invalid_batch():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+
+    with pytest.raises(TypeError):
+        table.add_rows([[1, "a"], [2, "b"], [3, "c"], ["4", "d"]], batch_size=2)
+    with pytest.raises(ValueError):
+        table.add_rows([[1]])
+
+    assert table.rows == [[0, 1, "a"], [1, 2, "b"]]
+
+
+def test_add_rows_parses_text():
+    table = Table("test")
+    table.add_column(TimeCol("time"))
+    table.add_column(TimeIntervalCol("slot"))
+
+    table.add_rows([["12:30:00", "(09:00:00..17:00:00]"], ["", ""]], parse=True)
+
+    assert table.get_row(0).values == [
+        datetime.time(12, 30),
+        Interval(datetime.time(9), datetime.time(17), lower_closed=False),
+    ]
+    assert table.get_row(1).values == [TimeCol.DEFAULT, TimeIntervalCol.DEFAULT]
+
+
+def test_render_pages_line_up():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    table.add_rows([[i, "x" * (i % 7)] for i in range(20)])
+
+    full = table.render().splitlines()
+    page = table.render(offset=5, limit=3).splitlines()
+
+    assert page == full[:2] + full[7:10]
+    assert table.render(offset=30, limit=3).splitlines() == full[:2]
+
+
+def test_render_strips_cells_like_tabulate():
+    table = Table("test")
+    table.add_column(StringCol("name"))
+    table.add_column(CharCol("class"))
+    table.add_rows([["  a ", "x"], ["b", " "]])
+
+    assert table.render().splitlines()[2:] == [
+        "|            0 | a              | x             |",
+        "|            1 | b              |               |",
+    ]
+
+
+def test_render_layout_follows_changes():
+    table = Table("test")
+    table.add_column(StringCol("name"))
+    table.add_row({"name": "a"})
+    version = table.version
+    table.render()
+
+    table.add_row({"name": "a much longer name"})
+    assert table.version == version + 1
+    assert table.render().splitlines()[-1] == "|            1 | a much longer name |"
+
+    table.delete_row(1)
+    assert table.render().splitlines()[-1] == "|            0 | a              |"
+
+
+def test_render_layout_is_updated_in_place():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(RealCol("price"))
+    table.add_column(StringCol("name"))
+    table.add_rows([[i, i / 4, "x" * (i % 5)] for i in range(12)])
+    table.render()
+    layout = table._layout
+
+    def fresh_render():
+        table._layout = None
+        rendered = table.render()
+        table._layout = layout
+        return rendered
+
+    for change in (
+        lambda: table.change_row(3, {"name": "a much longer name", "price": 12345.125}),
+        lambda: table.change_row(3, {"name": "", "price": 0.5}),
+        lambda: table.delete_row(11),
+        lambda: table.rename_column("name", "a much longer header"),
+        lambda: table.change_columns([2, 0, 1]),
+        lambda: table.add_column(RealCol("rate", 2.5)),
+    ):
+        change()
+        assert table._layout is layout
+        assert table.render() == fresh_render()
+
+
+def test_snapshot_is_isolated_from_writes():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    table.add_rows([[i, f"name {i}"] for i in range(5)])
+    table.create_index("amount", "sorted")
+    snapshot = table.snapshot()
+
+    table.add_row({"amount": 10, "name": "new"})
+    table.change_row(0, {"amount": 100})
+    table.delete_row(1)
+    table.rename_column("name", "title")
+    table.change_columns([1, 0])
+
+    assert snapshot.rows == [[i, i, f"name {i}"] for i in range(5)]
+    assert snapshot.columns == ["index: int", "amount: int", "name: string"]
+    assert snapshot.select(["amount"], where=col("amount") >= 3).to_list() == [[3], [4]]
+    assert table.select(["amount"], where=col("amount") >= 3).to_list() == [
+        [100], [3], [4], [10]
+    ]
+    with pytest.raises(ValueError):
+        snapshot.add_row({"amount": 1})
+
+
+def test_snapshot_keeps_index_of_renamed_column():
+    table = Table("test")
+    table.add_column(IntCol("a"))
+    table.add_rows([[1], [2]])
+    table.create_index("a", "hash")
+    snapshot = table.snapshot()
+
+    table.rename_column("a", "b")
+    table.change_row(0, {"b": 3})
+
+    assert snapshot.select(["a"], where=col("a") == 1).to_list() == [[1]]
+    assert table.select(["b"], where=col("b") == 3).to_list() == [[3]]
+    assert snapshot._indexes["a"].column_name == "a"
+
+
+def test_writes_copy_nothing_without_live_snapshots():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_row({"amount": 1})
+    buffer = table._buffers[0]
+
+    table.select().to_list()
+    table.change_row(0, {"amount": 2})
+    assert table._buffers[0] is buffer
+
+    snapshot = table.snapshot()
+    table.add_row({"amount": 3})
+    assert table._buffers[0] is buffer
+    table.change_row(0, {"amount": 4})
+    assert table._buffers[0] is not buffer
+    assert snapshot.rows == [[0, 2]]
+
+
+def test_concurrent_readers_see_consistent_tables():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(IntCol("double"))
+    table.create_index("amount", "hash")
+    table.add_rows([[i, 2 * i] for i in range(1000)])
+    errors = []
+
+    def read():
+        try:
+            for _ in range(50):
+                for amount, double in table.select(["amount", "double"]):
+                    assert double == 2 * amount
+        except Exception as error:  # surfaced in the main thread
+            errors.append(error)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(500):
+        table.delete_row(0)
+        table.add_row({"amount": 1000 + i, "double": 2000 + 2 * i})
+        table.change_row(i % 100, {"amount": i, "double": 2 * i})
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+
+
+def test_deleted_rows_keep_ids_until_compact():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_rows([[i] for i in range(10)])
+    table.create_index("amount", "sorted")
+    last = table.get_row(9)
+
+    assert table.delete_rows([2, 5, 7]) == 3
+    table.delete_row(0)
+
+    assert table.rows_count == 6
+    assert table.rows == [[0, 1], [1, 3], [2, 4], [3, 6], [4, 8], [5, 9]]
+    assert last.id == 9 and last.values == [9]
+    assert table.row_id(2) == 4
+    assert table.select(["amount"], where=col("amount") >= 5).to_list() == [[6], [8], [9]]
+    assert table.select(["amount"], where=col("amount") < 4, limit=2).to_list() == [[1], [3]]
+    assert table.render(offset=1, limit=2).splitlines()[2:] == [
+        "|            1 |             3 |",
+        "|            2 |             4 |",
+    ]
+    with pytest.raises(IndexError):
+        table.delete_rows([5])
+
+    assert table.compact() == 4
+    assert table.rows == [[0, 1], [1, 3], [2, 4], [3, 6], [4, 8], [5, 9]]
+    assert table.row_id(2) == 2
+    assert table._indexes["amount"].lookup(9) == [5]
+
+
+def test_snapshot_does_not_see_later_deletes():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_rows([[i] for i in range(5)])
+    snapshot = table.snapshot()
+
+    table.delete_rows([1, 3])
+
+    assert snapshot.rows_count == 5
+    assert [row[1] for row in snapshot.rows] == [0, 1, 2, 3, 4]
+    assert [row[1] for row in table.rows] == [0, 2, 4]
+
+
+def test_column_added_to_filled_table_reads_default():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_rows([[i] for i in range(3)])
+    snapshot = table.snapshot()
+
+    table.add_column(StringCol("name", "none"))
+    table.add_row({"amount": 3, "name": "d"})
+    table.create_index("name")
+    table.change_row(1, {"name": "b"})
+
+    assert table.rows == [[0, 0, "none"], [1, 1, "b"], [2, 2, "none"], [3, 3, "d"]]
+    assert table.select(["amount"], where=col("name") == "none").to_list() == [[0], [2]]
+    assert snapshot.rows == [[0, 0], [1, 1], [2, 2]]
+
+    table.add_column(IntCol("count"))
+    assert table.compact() == 0
+    assert type(table._buffers[2]) is not PaddedBuffer
+    assert [row[3] for row in table.rows] == [0, 0, 0, 0]
+
+
+def test_add_columnar():
+    table = Table("test")
+    table.add_column(IntCol("amount"))
+    table.add_column(StringCol("name"))
+    table.add_row({"amount": 1, "name": "a"})
+
+    assert table.add_columnar({"amount": array("q", [2, 3]), "name": ["b", "c"]}) == 2
+    assert table.rows == [[0, 1, "a"], [1, 2, "b"], [2, 3, "c"]]
+    with pytest.raises(ValueError):
+        table.add_columnar({"amount": [1], "name": ["a", "b"]})
@@ -0,0 +1,209 @@
+import datetime
+import os
+import threading
+
+import interval
+import pytest
+
+from models.column import IntCol, StringCol, TimeCol, TimeIntervalCol
+from models.db_manager import DBManager
+from models.wal import WriteAheadLog, read_records
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+    db_manager.add_table("test_table")
+    db_manager.add_column("test_table", IntCol("amount"))
+    db_manager.add_column("test_table", StringCol("name"))
+    path = str(tmp_path / "test_db.cdb")
+    db_manager.save_database(path)
+    db_manager.close()
+    return path
+
+
+def crash(db_manager):
+    """Drop the manager without saving, like a killed process would."""
+    db_manager._wal._file.close()
+
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / "log.wal")
+    slot = interval.Interval(datetime.time(1), datetime.time(2, 30), upper_closed=False)
+    args = (
+        "table",
+        {"a": 1, "b": 2 ** 70, "c": 1.5, "d": None, "e": True},
+        [datetime.time(3, 4, 5, 6), slot, "ж"],
+        TimeCol("time", datetime.time(7)),
+    )
+    wal = WriteAheadLog(path)
+    assert wal.append("add_row", args) == 1
+    wal.close()
+
+    [(lsn, operation, logged_args)] = read_records(path)
+    assert (lsn, operation) == (1, "add_row")
+    assert logged_args[:3] == [args[0], args[1], list(args[2])]
+    assert logged_args[2][1].upper_closed is False
+    assert logged_args[3].name == "time" and logged_args[3].default == datetime.time(7)
+
+
+def test_torn_tail_ends_replay(tmp_path):
+    path = str(tmp_path / "log.wal")
+    wal = WriteAheadLog(path)
+    for i in range(3):
+        wal.append("add_row", ("table", {"amount": i}))
+    wal.close()
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 3)
+
+    assert [lsn for lsn, _, _ in read_records(path)] == [1, 2]
+
+
+def test_mutations_survive_a_crash(db_path):
+    db_manager = DBManager()
+    db_manager.open_database(db_path)
+    db_manager.enable_wal()
+    db_manager.add_row("test_table", {"amount": 1, "name": "first"})
+    db_manager.add_row("test_table", {"amount": 2, "name": "second"})
+    db_manager.change_row("test_table", 0, {"amount": 10})
+    db_manager.delete_row("test_table", 1)
+    db_manager.add_column("test_table", TimeIntervalCol("slot"))
+    db_manager.create_index("test_table", "amount", "sorted")
+    crash(db_manager)
+
+    recovered = DBManager()
+    recovered.open_database(db_path)
+    table = recovered.get_table("test_table")
+    assert [row[1:3] for row in table.rows] == [[10, "first"]]
+    assert table.columns == ["index: int", "amount: int", "name: string", "slot: time interval"]
+    assert table.indexes == {"amount": "sorted"}
+
+
+def test_records_after_a_torn_tail_survive_the_next_crash(db_path):
+    db_manager = DBManager()
+    db_manager.open_database(db_path)
+    db_manager.enable_wal()
+    db_manager.add_row("test_table", {"amount": 1, "name": "first"})
+    db_manager.add_row("test_table", {"amount": 2, "name": "second"})
+    crash(db_manager)
+    wal_path = db_path + ".wal"
+    with open(wal_path, "r+b") as file:
+        file.truncate(os.path.getsize(wal_path) - 3)
+
+    recovered = DBManager()
+    recovered.open_database(db_path)
+    recovered.enable_wal()
+    recovered.add_row("test_table", {"amount": 3, "name": "third"})
+    crash(recovered)
+
+    reopened = DBManager()
+    reopened.open_database(db_path)
+    assert [row[1] for row in reopened.get_table("test_table").rows] == [1, 3]
+
+
+def test_checkpoint_empties_the_log(db_path):
+    db_manager = DBManager()
+    db_manager.open_database(db_path)
+    db_manager.enable_wal()
+    db_manager.add_row("test_table", {"amount": 1, "name": "first"})
+    db_manager.checkpoint()
+    assert os.path.getsize(db_path + ".wal") == 0
+
+    db_manager.add_row("test_table", {"amount": 2, "name": "second"})
+    crash(db_manager)
+
+    recovered = DBManager()
+    recovered.open_database(db_path)
+    assert [row[1] for row in recovered.get_table("test_table").rows] == [1, 2]
+
+
+def test_records_older_than_the_last_save_are_skipped(db_path):
+    db_manager = DBManager()
+    db_manager.open_database(db_path)
+    db_manager.enable_wal()
+    db_manager.add_row("test_table", {"amount": 1, "name": "first"})
+    with open(db_path + ".wal", "rb") as file:
+        log = file.read()
+    db_manager.save_database(db_path)
+    db_manager.close()
+    # a crash right after the save, before the log was emptied
+    with open(db_path + ".wal", "wb") as file:
+        file.write(log)
+
+    recovered = DBManager()
+    recovered.open_database(db_path)
+    assert recovered.get_table("test_table").rows_count == 1
+
+
+def test_mmap_readers_see_the_last_checkpoint(db_path):
+    db_manager = DBManager()
+    db_manager.open_database(db_path)
+    db_manager.enable_wal()
+    db_manager.add_row("test_table", {"amount": 1, "name": "first"})
+
+    reader = DBManager()
+    reader.open_database(db_path, mmap=True)
+    assert reader.get_table("test_table").rows_count == 0
+    reader.close()
+    db_manager.close()
+
+
+def test_enable_wal_needs_a_page_file():
+    db_manager = DBManager()
+    db_manager.create_database("test_db")
+
+    with pytest.raises(ValueError):
+        db_manager.enable_wal()
+
+
+def test_concurrent_writers_share_fsyncs(db_path, monkeypatch):
+    fsyncs = []
+    original_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), original_fsync(fd)))
+
+    db_manager = DBManager()
+    db_manager.open_database(db_path)
+    db_manager.enable_wal(fsync_every=50)
+
+    def write(offset):
+        for i in range(100):
+            db_manager.add_row("test_table", {"amount": offset + i, "name": "x"})
+
+    threads = [threading.Thread(target=write, args=(i * 100,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db_manager._wal.sync()
+    crash(db_manager)
+
+    assert len(fsyncs) <= 9
+    recovered = DBManager()
+    recovered.open_database(db_path)
+    assert sorted(row[1] for row in recovered.get_table("test_table").rows) == list(range(400))
+
+
+def test_commit_waits_for_a_sync_in_progress(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / "test.wal"))
+    lsn = wal.append("add_table", ["test_table"])
+    # another thread took the record out of the queue and is still writing it
+    wal._io_lock.acquire()
+    with wal._lock:
+        data, wal._pending = wal._pending, bytearray()
+        wal._pending_count = 0
+
+    def finish_sync() -> None:
+        wal._file.write(data)
+        wal._file.flush()
+        wal.durable_lsn = lsn
+        wal._io_lock.release()
+
+    timer = threading.Timer(0.05, finish_sync)
+    timer.start()
+    wal.commit(lsn)
+
+    assert wal.durable_lsn >= lsn
+    timer.join()
+    wal.close()
+
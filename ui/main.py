@@ -39,6 +39,12 @@ layout = [
         sg.Listbox([], size=(12, 15), key="-TABLE-LIST-", enable_events=True),
         sg.Multiline(key="-TABLE-DATA-", size=(80, 16), font=("Andale Mono", 15)),
     ],
+    [
+        sg.Push(),
+        sg.Button("< Prev"),
+        sg.Text(key="-PAGE-"),
+        sg.Button("Next >"),
+    ],
     [
         sg.Button("Add Table"),
         sg.Button("Delete Table"),
@@ -66,7 +72,9 @@ def parse_value(val, type_: str):
 
 
 DB_MANAGER = DBManager()
-LOCAL_DATA = {"selected_table": ""}
+# only one page of rows is rendered, and only when it changed
+PAGE_SIZE = 100
+LOCAL_DATA = {"selected_table": "", "page": 0, "rendered": None, "tables": None}
 
 window = sg.Window("DBMS", layout)
 
@@ -186,6 +194,13 @@ while True:
         elif event == "-TABLE-LIST-":  # select table
             if values["-TABLE-LIST-"]:
                 LOCAL_DATA["selected_table"] = values["-TABLE-LIST-"][0]
+                LOCAL_DATA["page"] = 0
+
+        elif event == "< Prev":
+            LOCAL_DATA["page"] = max(LOCAL_DATA["page"] - 1, 0)
+
+        elif event == "Next >":
+            LOCAL_DATA["page"] += 1
 
         elif event == "Save DB":
             event, values = save_db_view()
@@ -205,13 +220,30 @@ while True:
         # update view
         if should_re_render:
             window["-CURRENT-DB-"].update(DB_MANAGER.db.name)
-            window["-TABLE-LIST-"].update(list(DB_MANAGER.db.tables))
+            tables = list(DB_MANAGER.db.tables)
+            if tables != LOCAL_DATA["tables"]:
+                window["-TABLE-LIST-"].update(tables)
+                LOCAL_DATA["tables"] = tables
 
             if LOCAL_DATA["selected_table"]:
                 table = DB_MANAGER.get_table(LOCAL_DATA["selected_table"])
-                window["-TABLE-DATA-"].update(str(table))
-            else:
+                last_page = max(table.rows_count - 1, 0) // PAGE_SIZE
+                LOCAL_DATA["page"] = min(LOCAL_DATA["page"], last_page)
+                rendered = (id(table), table.name, table.version, LOCAL_DATA["page"])
+                if rendered != LOCAL_DATA["rendered"]:
+                    offset = LOCAL_DATA["page"] * PAGE_SIZE
+                    window["-TABLE-DATA-"].update(
+                        f"Table: {table.name}\n" + table.render(offset, PAGE_SIZE)
+                    )
+                    window["-PAGE-"].update(
+                        f"Rows {min(offset + 1, table.rows_count)}-"
+                        f"{min(offset + PAGE_SIZE, table.rows_count)} of {table.rows_count}"
+                    )
+                    LOCAL_DATA["rendered"] = rendered
+            elif LOCAL_DATA["rendered"] is not None:
                 window["-TABLE-DATA-"].update("")
+                window["-PAGE-"].update("")
+                LOCAL_DATA["rendered"] = None
             window["-ERRORS-"].update("")
 
     except Exception as e: